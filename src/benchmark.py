@@ -0,0 +1,369 @@
+"""
+Benchmarks de las etapas con más coste del modelo, con resultados en JSON.
+
+Casos:
+- haversine: distancias municipios x hospitales con haversine_vectorizado.
+- haversine_candidatos: haversine_vectorizado sobre los pares municipio x candidato
+  en el radio de cobertura, los que recalcula matriz_tiempos_vuelo (el uso de
+  haversine con más coste del pipeline).
+- cobertura: matriz de tiempos de vuelo y de cobertura a tiempo máximo.
+- cobertura_cuerda, cobertura_cuerda32: la misma matriz de cobertura por producto
+  escalar de vectores unitarios (CoberturaCuerda) en float64 y float32.
+- distancias_bloques, distancias_bloques32: los mismos pares que 'haversine' con
+  reducir_distancias (distancia mínima, hospital más cercano y bits de los que
+  están en el radio operativo) por bloques, en float64 y float32.
+- busqueda_local: mejora iterativa desde la solución inicial.
+- accidentes: asignar_accidentes_a_municipios con el archivo de accidentes.
+- dificultad: limpieza de coordenadas y puntuación de dificultad de acceso.
+- mapas: los cuatro mapas de folium (en una carpeta temporal, sin pool).
+
+Cada caso se mide con el registro real (escala 'cyl') y con registros más
+grandes hechos repitiendo el de Castilla y León en una rejilla de copias
+desplazadas, de modo que la densidad de municipios (y de pares en el radio de
+cobertura) es la real: 'nacional' (8131 municipios), '10x' y '100x'. Cada copia
+tiene sus propias regiones lógicas, así que también hay una base por región en
+cada copia. El archivo de accidentes se repite una vez por copia.
+
+Con --sintetico las escalas mayores que 'cyl' usan en su lugar instancias de
+helipuertos/sintetico.py (municipios agrupados, con sus propios accidentes).
+
+Con --memoria cada caso se ejecuta una vez más con tracemalloc y se guarda su
+pico de memoria.
+
+Los resultados se guardan en un JSON con la versión (commit) y el entorno, y
+--comparar imprime el cociente frente a otro JSON para ver regresiones entre
+commits; si algún caso es más lento que la tolerancia, el programa termina con
+código 1.
+
+Uso (desde src/):
+
+    python benchmark.py --salida bench_$(git rev-parse --short HEAD).json
+    python benchmark.py --escalas cyl 10x --casos cobertura busqueda_local \\
+        --comparar bench_anterior.json
+
+'100x' necesita varios GB de memoria en cobertura y búsqueda local, así que no
+entra en las escalas por defecto.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from helipuertos import graficos
+from helipuertos.cobertura import CoberturaCuerda, matriz_cobertura, matriz_tiempos_vuelo, pares_en_radio
+from helipuertos.distancias import REDUCCIONES, haversine_vectorizado, reducir_distancias
+from helipuertos.modelo import PARAMETROS_VUELO_POR_DEFECTO, solucion_inicial
+from helipuertos.optimizacion import alternativas_por_region, mejora_iterativa
+from helipuertos.pipeline import calcular_metricas, evaluar_candidatos, optimizar, puntuar
+from helipuertos.sintetico import generar_instancia
+from procesar_accidentes import COLUMNAS_ACCIDENTES, TIPOS_ACCIDENTES, asignar_accidentes_a_municipios
+from procesar_transplates_hospitales_dificil_acceso import calcular_hospitales_dificultad
+
+ARCHIVO_REGISTRO = '../data/registro-de-municipios-de-castilla-y-leon.csv'
+ARCHIVO_ACCIDENTES = '../data/accidentalidad-por-carreteras.csv'
+#Número de municipios de cada escala (None = el registro tal cual).
+ESCALAS = {'cyl': None, 'nacional': 8131, '10x': 22480, '100x': 224800}
+ESCALAS_POR_DEFECTO = ['cyl', '10x']
+#Desplazamiento en grados entre copias del registro (algo más que lo que ocupa Castilla y León).
+PASO_LONGITUD = 5.5
+PASO_LATITUD = 3.5
+#Un caso es una regresión si su tiempo mínimo crece más que esta fracción.
+TOLERANCIA_REGRESION = 0.10
+
+
+def escalar_registro(df, n_municipios):
+    """
+    Registro de n_municipios filas repitiendo 'df' en una rejilla de copias.
+
+    Cada copia se desplaza PASO_LONGITUD grados al este y, por filas de la
+    rejilla, PASO_LATITUD al sur; la columna 'Copia' indica de qué copia es cada fila.
+    """
+    if n_municipios is None:
+        return df.assign(Copia=0)
+    copias = -(-n_municipios // len(df))
+    columnas_rejilla = int(np.ceil(np.sqrt(copias)))
+    k = np.repeat(np.arange(copias), len(df))
+    escalado = pd.concat([df] * copias, ignore_index=True)
+    escalado['Longitud'] = escalado['Longitud'].to_numpy() + PASO_LONGITUD * (k % columnas_rejilla)
+    escalado['Latitud'] = escalado['Latitud'].to_numpy() - PASO_LATITUD * (k // columnas_rejilla)
+    escalado['Copia'] = k
+    return escalado.iloc[:n_municipios].reset_index(drop=True)
+
+
+def registro_sintetico(n_municipios, semilla=0):
+    """(registro, accidentes) de una instancia sintética (una sola 'copia')."""
+    instancia = generar_instancia(n_municipios, semilla)
+    return instancia['registro'].assign(Copia=0), instancia['accidentes']
+
+
+def preparar_instancia(df, accidentes=None):
+    """
+    Registro puntuado, con una región lógica por región y copia, y sus candidatos.
+
+    accidentes: tabla de accidentes del caso 'accidentes' (None = el archivo real
+    repetido una vez por copia).
+    """
+    parametros = dict(PARAMETROS_VUELO_POR_DEFECTO)
+    puntuado = puntuar(df)
+    copia = puntuado['Copia'].to_numpy()
+    puntuado['Region_Logica'] = np.where(copia == 0, puntuado['Region_Logica'],
+                                         puntuado['Region_Logica'] + ' #' + copia.astype(str))
+    radio = (parametros['VELOCIDAD_HELICOPTERO'] * parametros['TIEMPO_COBERTURA_MAX']) / 60
+    puntuado, candidates = evaluar_candidatos(puntuado, radio)
+    return {'df_original': df, 'df': puntuado, 'candidates': candidates, 'parametros': parametros,
+            'accidentes': accidentes}
+
+
+def _optimizado(inst):
+    """Resultado de optimizar (se calcula una vez por instancia)."""
+    if 'resultado' not in inst:
+        p = inst['parametros']
+        inst['resultado'] = optimizar(inst['df'], inst['candidates'], p['VELOCIDAD_HELICOPTERO'],
+                                      p['TIEMPO_COBERTURA_MAX'])
+    return inst['resultado']
+
+
+def caso_haversine(inst):
+    df = inst['df']
+    hosp = df[df['Tiene_Hospital'] == 1]
+    lon, lat = df['Longitud'].values[:, None], df['Latitud'].values[:, None]
+    return lambda: haversine_vectorizado(lon, lat, hosp['Longitud'].values[None, :],
+                                         hosp['Latitud'].values[None, :])
+
+
+def caso_haversine_candidatos(inst):
+    p = inst['parametros']
+    df, cand = inst['df'], inst['candidates']
+    lon_d, lat_d = df['Longitud'].values, df['Latitud'].values
+    lon_c, lat_c = cand['Longitud'].values, cand['Latitud'].values
+    #Los pares se buscan fuera de la medición, como hace el KD-tree en pares_en_radio.
+    filas, columnas, _ = pares_en_radio(lon_d, lat_d, lon_c, lat_c,
+                                        (p['VELOCIDAD_HELICOPTERO'] * p['TIEMPO_COBERTURA_MAX']) / 60)
+    coords = (lon_d[filas], lat_d[filas], lon_c[columnas], lat_c[columnas])
+    return lambda: haversine_vectorizado(*coords)
+
+
+def _caso_distancias_bloques(precision):
+    def caso(inst):
+        p = inst['parametros']
+        df = inst['df']
+        hosp = df[df['Tiene_Hospital'] == 1]
+        radio_operativo = (p['VELOCIDAD_HELICOPTERO'] * p['TIEMPO_COBERTURA_MAX']) / 60
+        coords = (df['Longitud'].values, df['Latitud'].values, hosp['Longitud'].values, hosp['Latitud'].values)
+        return lambda: reducir_distancias(*coords, REDUCCIONES, umbral=radio_operativo, precision=precision)
+    return caso
+
+
+def caso_cobertura(inst):
+    p = inst['parametros']
+    df, cand = inst['df'], inst['candidates']
+    coords = (df['Longitud'].values, df['Latitud'].values, cand['Longitud'].values, cand['Latitud'].values)
+    return lambda: matriz_cobertura(matriz_tiempos_vuelo(*coords, p['VELOCIDAD_HELICOPTERO'],
+                                                         p['TIEMPO_COBERTURA_MAX']))
+
+
+def _caso_cobertura_cuerda(precision):
+    def caso(inst):
+        p = inst['parametros']
+        df, cand = inst['df'], inst['candidates']
+        coords = (df['Longitud'].values, df['Latitud'].values, cand['Longitud'].values, cand['Latitud'].values)
+        return lambda: CoberturaCuerda(*coords, p['VELOCIDAD_HELICOPTERO'], precision).matriz(
+            p['TIEMPO_COBERTURA_MAX'])
+    return caso
+
+
+def caso_busqueda_local(inst):
+    df, cand = inst['df'], inst['candidates']
+    cobertura = _optimizado(inst)['matriz_cobertura']
+    inicial = solucion_inicial(cand, df['Region_Logica'].unique())
+    alternativas_region = alternativas_por_region(cand['Region_Logica'].values)
+    alternativas = [alternativas_region[cand['Region_Logica'].iloc[idx]] for idx in inicial]
+    scores = df['Score_Prioridad'].values
+    return lambda: mejora_iterativa(cobertura, scores, list(inicial), alternativas)
+
+
+def caso_accidentes(inst):
+    accidentes = inst['accidentes']
+    if accidentes is None:
+        accidentes = pd.read_csv(ARCHIVO_ACCIDENTES, sep=';', usecols=COLUMNAS_ACCIDENTES,
+                                 dtype=TIPOS_ACCIDENTES)
+        copias = int(inst['df_original']['Copia'].max()) + 1
+        accidentes = pd.concat([accidentes] * copias, ignore_index=True)
+    municipios = inst['df_original'][['Municipio', 'Provincia']]
+    return lambda: asignar_accidentes_a_municipios(municipios, accidentes)
+
+
+def caso_dificultad(inst):
+    df = inst['df_original'][['Municipio', 'Provincia', 'Longitud', 'Latitud']]
+    return lambda: calcular_hospitales_dificultad(df)
+
+
+def caso_mapas(inst):
+    resultado = _optimizado(inst)
+    bases = calcular_metricas(inst['df'], inst['candidates'], resultado,
+                              inst['parametros']['TIEMPO_ACCION_IDEAL'])['bases_finales']
+
+    def mapas():
+        with tempfile.TemporaryDirectory() as directorio, contextlib.redirect_stdout(io.StringIO()):
+            graficos.generar_mapas(inst['df'], bases, inst['parametros'], directorio, n_procesos=1)
+    return mapas
+
+
+CASOS = {
+    'haversine': caso_haversine,
+    'haversine_candidatos': caso_haversine_candidatos,
+    'distancias_bloques': _caso_distancias_bloques(np.float64),
+    'distancias_bloques32': _caso_distancias_bloques(np.float32),
+    'cobertura': caso_cobertura,
+    'cobertura_cuerda': _caso_cobertura_cuerda(np.float64),
+    'cobertura_cuerda32': _caso_cobertura_cuerda(np.float32),
+    'busqueda_local': caso_busqueda_local,
+    'accidentes': caso_accidentes,
+    'dificultad': caso_dificultad,
+    'mapas': caso_mapas,
+}
+
+
+def medir(funcion, repeticiones):
+    """Tiempos (s) de 'repeticiones' llamadas a funcion()."""
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return tiempos
+
+
+def pico_memoria(funcion):
+    """Pico de memoria (MB) de una llamada a funcion(), medido con tracemalloc."""
+    tracemalloc.start()
+    try:
+        funcion()
+        return tracemalloc.get_traced_memory()[1] / 2**20
+    finally:
+        tracemalloc.stop()
+
+
+def _commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def entorno():
+    """Versión del código y del entorno en el que se ha medido."""
+    return {
+        'commit': _commit(),
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'plataforma': platform.platform(),
+        'nucleos': os.cpu_count(),
+    }
+
+
+def ejecutar_benchmarks(casos, escalas, repeticiones=3, ruta_registro=ARCHIVO_REGISTRO, sintetico=False,
+                        memoria=False):
+    """
+    Mide cada caso en cada escala y devuelve la lista de resultados.
+
+    Cada resultado es un diccionario con caso, escala, n_municipios, n_candidatos,
+    tiempos_s, min_s y mediana_s. La preparación de cada caso (carga, puntuación,
+    matrices que necesita) no entra en el tiempo. sintetico: las escalas mayores
+    que 'cyl' se generan con helipuertos/sintetico.py en lugar de repetir el registro.
+    memoria: añade 'pico_memoria_mb' con una ejecución más bajo tracemalloc (fuera de los tiempos).
+    """
+    base = pd.read_csv(ruta_registro)
+    resultados = []
+    for escala in escalas:
+        if sintetico and ESCALAS[escala] is not None:
+            inst = preparar_instancia(*registro_sintetico(ESCALAS[escala]))
+        else:
+            inst = preparar_instancia(escalar_registro(base, ESCALAS[escala]))
+        for caso in casos:
+            funcion = CASOS[caso](inst)
+            tiempos = medir(funcion, repeticiones)
+            resultados.append({
+                'caso': caso,
+                'escala': escala,
+                'sintetico': bool(sintetico and ESCALAS[escala] is not None),
+                'n_municipios': len(inst['df']),
+                'n_candidatos': len(inst['candidates']),
+                'tiempos_s': tiempos,
+                'min_s': min(tiempos),
+                'mediana_s': float(np.median(tiempos)),
+            })
+            if memoria:
+                resultados[-1]['pico_memoria_mb'] = pico_memoria(funcion)
+            pico = f"  pico {resultados[-1]['pico_memoria_mb']:8.1f} MB" if memoria else ""
+            print(f"{caso:<20} {escala:<9} {len(inst['df']):>8} municipios  "
+                  f"mín {min(tiempos):8.3f} s  mediana {np.median(tiempos):8.3f} s{pico}")
+    return resultados
+
+
+def comparar(resultados, anteriores, tolerancia=TOLERANCIA_REGRESION):
+    """Imprime el cociente de tiempos mínimos frente a otro benchmark y devuelve las regresiones."""
+    clave = lambda r: (r['caso'], r['escala'], r.get('sintetico', False))
+    previos = {clave(r): r for r in anteriores['resultados']}
+    commit = anteriores['entorno'].get('commit')
+    regresiones = []
+    for r in resultados:
+        previo = previos.get(clave(r))
+        if previo is None:
+            continue
+        cociente = r['min_s'] / previo['min_s'] if previo['min_s'] > 0 else float('inf')
+        marca = ''
+        if cociente > 1 + tolerancia:
+            marca = '  <- más lento'
+            regresiones.append((r['caso'], r['escala'], cociente))
+        print(f"{r['caso']:<20} {r['escala']:<9} {previo['min_s']:8.3f} s -> {r['min_s']:8.3f} s "
+              f"(x{cociente:.2f} frente a {commit}){marca}")
+    return regresiones
+
+
+def _argumentos():
+    parser = argparse.ArgumentParser(description="Benchmarks de las etapas del modelo de helipuertos.")
+    parser.add_argument('--casos', nargs='+', choices=list(CASOS), default=list(CASOS), help="casos a medir")
+    parser.add_argument('--escalas', nargs='+', choices=list(ESCALAS), default=ESCALAS_POR_DEFECTO,
+                        help="tamaños de instancia")
+    parser.add_argument('--repeticiones', type=int, default=3, help="repeticiones de cada caso")
+    parser.add_argument('--registro', default=ARCHIVO_REGISTRO, help="csv del registro de municipios")
+    parser.add_argument('--sintetico', action='store_true',
+                        help="instancias sintéticas (helipuertos/sintetico.py) en las escalas mayores")
+    parser.add_argument('--memoria', action='store_true', help="mide también el pico de memoria (tracemalloc)")
+    parser.add_argument('--salida', default='benchmark.json', help="JSON de resultados")
+    parser.add_argument('--comparar', default=None, help="JSON de un benchmark anterior")
+    return parser.parse_args()
+
+
+def main():
+    args = _argumentos()
+    resultados = ejecutar_benchmarks(args.casos, args.escalas, args.repeticiones, args.registro,
+                                     args.sintetico, args.memoria)
+    with open(args.salida, 'w', encoding='utf-8') as f:
+        json.dump({'entorno': entorno(), 'resultados': resultados}, f, indent=2, ensure_ascii=False)
+    print(f"Resultados guardados en: {args.salida}")
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            regresiones = comparar(resultados, json.load(f))
+        if regresiones:
+            print(f"{len(regresiones)} casos más lentos que el benchmark anterior")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
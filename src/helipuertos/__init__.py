@@ -0,0 +1,6 @@
+"""
+Utilidades compartidas del modelo de ubicación de helipuertos sanitarios.
+
+Los scripts de src/ (codigo_a_entregar.py, code.py) importan de aquí las
+piezas del modelo que necesitan ser reutilizadas o probadas por separado.
+"""
@@ -0,0 +1,4 @@
+"""Permite ejecutar el pipeline con `python -m helipuertos` (ver helipuertos/pipeline.py)."""
+from helipuertos.pipeline import main
+
+main()
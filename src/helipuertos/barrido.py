@@ -0,0 +1,194 @@
+"""
+Barrido de escenarios sobre pesos, velocidad y umbrales de tiempo.
+
+Las distancias geodésicas municipio x municipio (dentro del mayor radio de
+todos los escenarios) y al hospital más cercano se calculan una sola vez. Cada
+escenario solo recalcula el score con sus pesos, los candidatos viables con su
+radio operativo y la cobertura dividiendo las distancias ya calculadas por su
+velocidad, y después ejecuta la mejora iterativa. Los escenarios se reparten en
+un pool de procesos y el resultado es una única tabla.
+
+Uso desde la línea de comandos (desde src/):
+
+    python -m helipuertos.barrido ../data/registro-de-municipios-de-castilla-y-leon.csv \\
+        --velocidad 200 240 --tiempo-max 20 30 --w-dificultad 0.3 0.43 \\
+        --salida barrido.csv
+"""
+import argparse
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from helipuertos.cache import CacheMatrices, con_cache
+from helipuertos.cobertura import MARGEN_CUERDA, matriz_distancias_radio
+from helipuertos.instalaciones import indice_instalaciones
+from helipuertos.modelo import (COLUMNAS_MODELO, PARAMETROS_VUELO_POR_DEFECTO, PESOS_POR_DEFECTO,
+                                asignar_regiones, calcular_score_prioridad, preparar_columnas,
+                                seleccionar_candidatos, solucion_inicial)
+from helipuertos.optimizacion import alternativas_por_region, mejora_iterativa
+from helipuertos.pipeline import OPCIONES_PARAMETROS, cargar_datos
+
+#Estado compartido por los escenarios (en cada proceso trabajador).
+_ESTADO = {}
+
+
+def escenarios_rejilla(rejilla):
+    """
+    Producto cartesiano de una rejilla {parametro: [valores]}.
+
+    Los parámetros que no aparecen toman su valor por defecto. Devuelve una
+    lista de diccionarios con todos los parámetros de cada escenario.
+    """
+    base = {**PESOS_POR_DEFECTO, **PARAMETROS_VUELO_POR_DEFECTO}
+    desconocidos = set(rejilla) - set(base)
+    if desconocidos:
+        raise ValueError(f"Parámetros desconocidos en la rejilla: {sorted(desconocidos)}")
+    nombres = list(rejilla)
+    return [{**base, **dict(zip(nombres, valores))}
+            for valores in itertools.product(*(rejilla[n] for n in nombres))]
+
+
+def preparar_barrido(df, radio_max_km, cache=None):
+    """
+    Calcula una sola vez todo lo que no depende del escenario.
+
+    'df' es la tabla de municipios ya pasada por preparar_columnas y asignar_regiones.
+    Devuelve un diccionario con la matriz dispersa de distancias municipio x municipio
+    hasta radio_max_km y la distancia al hospital más cercano.
+    Si se pasa una CacheMatrices, las matrices se leen de disco cuando ya existen.
+    """
+    lon = df['Longitud'].values.astype(float)
+    lat = df['Latitud'].values.astype(float)
+    #Un poco más de radio para que el filtro exacto por tiempo de cada escenario no pierda pares.
+    radio_busqueda = radio_max_km * (1 + MARGEN_CUERDA)
+    distancias = con_cache(cache, 'distancias_municipios', (lon, lat), {'radio_km': radio_busqueda},
+                           lambda: sparse.csc_matrix(matriz_distancias_radio(lon, lat, lon, lat, radio_busqueda)))
+    return {
+        'df': df,
+        'distancias': sparse.csc_matrix(distancias),
+        'min_dist_hosp': indice_instalaciones(df, 'Tiene_Hospital').distancia_minima(lon, lat),
+    }
+
+
+def evaluar_escenario(escenario, estado=None):
+    """
+    Optimiza un escenario y devuelve una fila de resultados (diccionario).
+
+    Sigue los mismos pasos que codigo_a_entregar.py con los parámetros del escenario.
+    """
+    estado = estado or _ESTADO
+    inicio = time.perf_counter()
+    df = estado['df']
+    velocidad = escenario['VELOCIDAD_HELICOPTERO']
+    tiempo_max = escenario['TIEMPO_COBERTURA_MAX']
+    tiempo_ideal = escenario['TIEMPO_ACCION_IDEAL']
+    radio_operativo = (velocidad * tiempo_max) / 60
+
+    scores = calcular_score_prioridad(df, escenario).values
+    df_esc = df.assign(Score_Prioridad=scores)
+    hospital_ok = (estado['min_dist_hosp'] <= radio_operativo) | (df['Tiene_Hospital'].values == 1)
+    candidates, posiciones = seleccionar_candidatos(df_esc, hospital_ok)
+
+    #Tiempos de vuelo a los candidatos a partir de las distancias ya calculadas (CSC).
+    dist_cand = estado['distancias'][:, posiciones]
+    tiempos = dist_cand.copy()
+    tiempos.data = (dist_cand.data / velocidad) * 60
+    cubre_max = tiempos.copy()
+    cubre_max.data = (tiempos.data <= tiempo_max).astype(np.int8)
+    cubre_max.eliminate_zeros()
+
+    regiones = df['Region_Logica'].unique()
+    solucion = solucion_inicial(candidates, regiones)
+    alternativas_region = alternativas_por_region(candidates['Region_Logica'].values)
+    alternativas = [alternativas_region[candidates['Region_Logica'].iloc[idx]] for idx in solucion]
+    solucion, _ = mejora_iterativa(cubre_max, scores, solucion, alternativas)
+
+    #Métricas de cobertura a tiempo máximo e ideal.
+    tiempos_sol = tiempos[:, solucion]
+    en_max = tiempos_sol.copy()
+    en_max.data = (tiempos_sol.data <= tiempo_max).astype(np.int8)
+    en_ideal = tiempos_sol.copy()
+    en_ideal.data = (tiempos_sol.data <= tiempo_ideal).astype(np.int8)
+    cubiertos_max = np.asarray(en_max.sum(axis=1)).ravel() > 0
+    cubiertos_ideal = np.asarray(en_ideal.sum(axis=1)).ravel() > 0
+
+    poblacion = df['Población'].values
+    total_score = scores.sum()
+    total_pob = poblacion.sum()
+    bases = candidates.iloc[solucion].sort_values('Region_Logica')
+    return {
+        **escenario,
+        'n_candidatos': len(candidates),
+        'score_cubierto_max': scores[cubiertos_max].sum(),
+        'pct_score_max': scores[cubiertos_max].sum() / total_score,
+        'pct_poblacion_max': poblacion[cubiertos_max].sum() / total_pob,
+        'score_cubierto_ideal': scores[cubiertos_ideal].sum(),
+        'pct_score_ideal': scores[cubiertos_ideal].sum() / total_score,
+        'pct_poblacion_ideal': poblacion[cubiertos_ideal].sum() / total_pob,
+        'bases': ' | '.join(bases['Municipio']),
+        'tiempo_s': time.perf_counter() - inicio,
+    }
+
+
+def _iniciar_trabajador(estado):
+    _ESTADO.update(estado)
+
+
+def barrido_escenarios(df, rejilla, n_procesos=None, cache=None):
+    """
+    Ejecuta todos los escenarios de la rejilla y devuelve un DataFrame con una fila por escenario.
+
+    df: tabla de municipios tal y como se lee del csv.
+    rejilla: {parametro: [valores]} con claves de PESOS_POR_DEFECTO o PARAMETROS_VUELO_POR_DEFECTO.
+    n_procesos: procesos del pool (None = todos los núcleos; 1 = sin pool).
+    cache: CacheMatrices opcional para reutilizar las distancias entre ejecuciones.
+    """
+    escenarios = escenarios_rejilla(rejilla)
+    df = asignar_regiones(preparar_columnas(df))
+    radio_max = max((e['VELOCIDAD_HELICOPTERO'] * e['TIEMPO_COBERTURA_MAX']) / 60 for e in escenarios)
+    estado = preparar_barrido(df, radio_max, cache=cache)
+
+    if n_procesos is None:
+        n_procesos = os.cpu_count() or 1
+    if n_procesos == 1 or len(escenarios) == 1:
+        filas = [evaluar_escenario(e, estado) for e in escenarios]
+    else:
+        #El estado se envía una vez a cada proceso, no con cada escenario.
+        with ProcessPoolExecutor(max_workers=n_procesos, initializer=_iniciar_trabajador,
+                                 initargs=(estado,)) as pool:
+            tam_lote = max(1, len(escenarios) // (4 * n_procesos))
+            filas = list(pool.map(evaluar_escenario, escenarios, chunksize=tam_lote))
+    return pd.DataFrame(filas)
+
+
+def _argumentos():
+    parser = argparse.ArgumentParser(description="Barrido de escenarios del modelo de helipuertos.")
+    parser.add_argument('csv', help="registro de municipios (.csv o .parquet)")
+    parser.add_argument('--salida', default='barrido_escenarios.csv', help="csv de resultados")
+    parser.add_argument('--procesos', type=int, default=None, help="procesos del pool (por defecto, todos)")
+    parser.add_argument('--cache', default=None, help="carpeta de caché en disco de las distancias")
+    for opcion, parametro in OPCIONES_PARAMETROS.items():
+        parser.add_argument(opcion, dest=parametro, type=float, nargs='+',
+                            help=f"valores de {parametro} a barrer")
+    args = parser.parse_args()
+    rejilla = {p: getattr(args, p) for p in OPCIONES_PARAMETROS.values() if getattr(args, p) is not None}
+    return args, rejilla
+
+
+def main():
+    args, rejilla = _argumentos()
+    df = cargar_datos(args.csv, COLUMNAS_MODELO)
+    inicio = time.perf_counter()
+    cache = CacheMatrices(args.cache, archivo_fuente=args.csv) if args.cache else None
+    resultados = barrido_escenarios(df, rejilla, n_procesos=args.procesos, cache=cache)
+    resultados.to_csv(args.salida, index=False)
+    print(f"{len(resultados)} escenarios en {time.perf_counter() - inicio:.1f} s -> '{args.salida}'")
+
+
+if __name__ == '__main__':
+    main()
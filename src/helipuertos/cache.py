@@ -0,0 +1,135 @@
+"""
+Caché en disco de matrices de distancias y tiempos.
+
+Las mismas coordenadas producen siempre las mismas matrices, así que se guardan
+como ficheros .npy y en las ejecuciones siguientes se abren con memoria mapeada
+(np.load(..., mmap_mode='r')) en lugar de recalcular haversine.
+
+Cada entrada se identifica por un hash de los arrays de coordenadas y de los
+parámetros (radio, velocidad, filtro de candidatos...). Además, si se indica un
+archivo fuente (el csv de municipios), se guarda su huella y la caché se vacía
+automáticamente cuando el archivo cambia.
+"""
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+from scipy import sparse
+
+#Se incrementa si cambia el formato de las entradas guardadas.
+VERSION_CACHE = 1
+
+
+def huella_archivo(ruta):
+    """sha256 del contenido de un archivo."""
+    h = hashlib.sha256()
+    with open(ruta, 'rb') as f:
+        for bloque in iter(lambda: f.read(1 << 20), b''):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+def clave_cache(nombre, arrays, parametros=None):
+    """Hash que identifica una matriz por su nombre, los arrays de entrada y los parámetros."""
+    h = hashlib.sha256()
+    h.update(f"{VERSION_CACHE}:{nombre}".encode())
+    for arr in arrays:
+        arr = np.ascontiguousarray(arr, dtype=float)
+        h.update(str(arr.shape).encode())
+        h.update(arr.tobytes())
+    h.update(json.dumps(parametros or {}, sort_keys=True, default=str).encode())
+    return f"{nombre}-{h.hexdigest()[:24]}"
+
+
+class CacheMatrices:
+    """
+    Caché de matrices (densas, CSR o CSC) en un directorio.
+
+    directorio: carpeta donde se guardan las entradas (se crea si no existe).
+    archivo_fuente: si se indica, la caché se invalida cuando cambia su contenido.
+    """
+
+    def __init__(self, directorio, archivo_fuente=None):
+        self.directorio = directorio
+        os.makedirs(directorio, exist_ok=True)
+        if archivo_fuente is not None:
+            self._comprobar_fuente(archivo_fuente)
+
+    def _comprobar_fuente(self, archivo_fuente):
+        """Vacía la caché si el archivo fuente no es el mismo que la generó."""
+        ruta_meta = os.path.join(self.directorio, 'fuente.json')
+        huella = huella_archivo(archivo_fuente)
+        anterior = None
+        if os.path.exists(ruta_meta):
+            with open(ruta_meta, encoding='utf-8') as f:
+                anterior = json.load(f).get('sha256')
+        if anterior != huella:
+            self.vaciar()
+            with open(ruta_meta, 'w', encoding='utf-8') as f:
+                json.dump({'archivo': os.path.basename(archivo_fuente), 'sha256': huella}, f)
+
+    def vaciar(self):
+        """Borra todas las entradas de la caché."""
+        for nombre in os.listdir(self.directorio):
+            ruta = os.path.join(self.directorio, nombre)
+            if os.path.isdir(ruta):
+                shutil.rmtree(ruta)
+
+    def _cargar(self, ruta):
+        with open(os.path.join(ruta, 'meta.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta['tipo'] == 'densa':
+            return np.load(os.path.join(ruta, 'matriz.npy'), mmap_mode='r')
+        partes = {p: np.load(os.path.join(ruta, f'{p}.npy'), mmap_mode='r')
+                  for p in ('data', 'indices', 'indptr')}
+        clase = sparse.csr_matrix if meta['tipo'] == 'csr' else sparse.csc_matrix
+        #Se reutilizan los arrays mapeados sin copiarlos (los dtypes ya son los suyos).
+        return clase((partes['data'], partes['indices'], partes['indptr']),
+                     shape=tuple(meta['forma']), copy=False)
+
+    def _guardar(self, ruta, matriz):
+        temporal = ruta + '.tmp'
+        if os.path.isdir(temporal):
+            shutil.rmtree(temporal)
+        os.makedirs(temporal)
+        if sparse.issparse(matriz):
+            #Se conserva el formato (CSR o CSC) con el que se va a usar la matriz.
+            if matriz.format not in ('csr', 'csc'):
+                matriz = sparse.csr_matrix(matriz)
+            for parte in ('data', 'indices', 'indptr'):
+                np.save(os.path.join(temporal, f'{parte}.npy'), getattr(matriz, parte))
+            meta = {'tipo': matriz.format, 'forma': list(matriz.shape)}
+        else:
+            np.save(os.path.join(temporal, 'matriz.npy'), np.asarray(matriz))
+            meta = {'tipo': 'densa', 'forma': list(np.shape(matriz))}
+        with open(os.path.join(temporal, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        #Renombrado atómico: otra ejecución nunca ve una entrada a medio escribir.
+        try:
+            os.replace(temporal, ruta)
+        except OSError:
+            #Otra ejecución la ha escrito a la vez; nos quedamos con la suya.
+            shutil.rmtree(temporal, ignore_errors=True)
+
+    def obtener(self, nombre, arrays, parametros, calcular):
+        """
+        Devuelve la matriz de la caché o la calcula con calcular() y la guarda.
+
+        nombre: tipo de matriz (por ejemplo 'tiempos_vuelo').
+        arrays: arrays de coordenadas de los que depende la matriz.
+        parametros: diccionario con el resto de parámetros que la determinan.
+        La matriz devuelta está mapeada en memoria y es de solo lectura.
+        """
+        ruta = os.path.join(self.directorio, clave_cache(nombre, arrays, parametros))
+        if not os.path.exists(os.path.join(ruta, 'meta.json')):
+            self._guardar(ruta, calcular())
+        return self._cargar(ruta)
+
+
+def con_cache(cache, nombre, arrays, parametros, calcular):
+    """Como CacheMatrices.obtener, pero si 'cache' es None simplemente llama a calcular()."""
+    if cache is None:
+        return calcular()
+    return cache.obtener(nombre, arrays, parametros, calcular)
@@ -0,0 +1,181 @@
+"""
+Construcción de matrices de cobertura dispersas mediante un índice espacial.
+
+En vez de calcular la matriz completa demanda x candidatos con haversine,
+se indexan los puntos como vectores unitarios 3D en un KD-tree y solo se
+consultan los pares que caen dentro del radio. Las distancias de esos pares
+se recalculan con haversine, por lo que el resultado coincide exactamente con
+aplicar el umbral sobre la matriz densa. Memoria y tiempo crecen con el número
+de pares cubiertos y no con N x M.
+
+Cuando solo hace falta saber qué pares se cubren (no su tiempo), CoberturaCuerda
+lo decide sin trigonometría por par: con vectores unitarios, d <= R equivale a
+producto escalar >= cos(R / radio de la tierra), así que la cobertura de un bloque
+de filas es un producto de matrices y una comparación. Solo los pares cuyo
+producto cae en el margen de redondeo del umbral se deciden con haversine, y el
+resultado es el mismo que el de matriz_cobertura(matriz_tiempos_vuelo(...)).
+"""
+import numpy as np
+from scipy import sparse
+from scipy.spatial import cKDTree
+
+from helipuertos.distancias import (RADIO_TIERRA_KM, a_vectores_unitarios, cuerda_equivalente,
+                                    haversine_vectorizado)
+
+#Margen relativo sobre la cuerda para no perder pares en el borde por redondeo;
+#el filtro exacto se hace después con haversine.
+MARGEN_CUERDA = 1e-9
+#Elementos (filas x candidatos) de cada bloque del producto escalar en CoberturaCuerda.
+ELEMENTOS_BLOQUE_CUERDA = 2**22
+#Margen sobre el umbral del producto escalar, en épsilons de la precisión usada;
+#acota de sobra el error de redondeo de los vectores y del producto.
+EPSILONS_MARGEN_PRODUCTO = 64
+
+
+def pares_en_radio(lon_a, lat_a, lon_b, lat_b, radio_km, arbol_b=None):
+    """
+    Busca todos los pares (i, j) con el punto i de A y el punto j de B a menos de radio_km.
+
+    Devuelve (filas, columnas, distancias_km) con la distancia haversine de cada par.
+    Los pares se filtran con '<= radio_km' igual que se haría sobre la matriz densa.
+    arbol_b: KD-tree ya construido de los puntos de B (ver instalaciones.py).
+    """
+    radio_cuerda = float(cuerda_equivalente(radio_km)) * (1 + MARGEN_CUERDA)
+
+    arbol_a = cKDTree(a_vectores_unitarios(lon_a, lat_a))
+    if arbol_b is None:
+        arbol_b = cKDTree(a_vectores_unitarios(lon_b, lat_b))
+    pares = arbol_a.sparse_distance_matrix(arbol_b, radio_cuerda, output_type='ndarray')
+    filas = pares['i'].astype(np.int64)
+    columnas = pares['j'].astype(np.int64)
+
+    #Distancia exacta con la misma fórmula que la matriz densa.
+    dists = haversine_vectorizado(np.asarray(lon_a, dtype=float)[filas], np.asarray(lat_a, dtype=float)[filas],
+                                  np.asarray(lon_b, dtype=float)[columnas], np.asarray(lat_b, dtype=float)[columnas])
+    dentro = dists <= radio_km
+    return filas[dentro], columnas[dentro], dists[dentro]
+
+
+def _a_csr(filas, columnas, valores, forma):
+    """Crea una matriz CSR ordenada conservando los ceros explícitos (distancia 0)."""
+    orden = np.lexsort((columnas, filas))
+    filas, columnas, valores = filas[orden], columnas[orden], valores[orden]
+    indptr = np.zeros(forma[0] + 1, dtype=np.int64)
+    np.cumsum(np.bincount(filas, minlength=forma[0]), out=indptr[1:])
+    return sparse.csr_matrix((valores, columnas, indptr), shape=forma)
+
+
+def matriz_distancias_radio(lon_a, lat_a, lon_b, lat_b, radio_km):
+    """
+    Matriz CSR (len(A) x len(B)) con la distancia en km de los pares a menos de radio_km.
+
+    Los pares fuera del radio no se almacenan. Un par a distancia 0 se guarda como
+    cero explícito, así que la estructura de la matriz indica qué pares están en radio.
+    """
+    filas, columnas, dists = pares_en_radio(lon_a, lat_a, lon_b, lat_b, radio_km)
+    return _a_csr(filas, columnas, dists, (len(lon_a), len(lon_b)))
+
+
+def matriz_tiempos_vuelo(lon_dem, lat_dem, lon_cand, lat_cand, velocidad_kmh, tiempo_max_min):
+    """
+    Matriz CSR demanda x candidatos con el tiempo de vuelo en minutos de los pares
+    que se alcanzan en tiempo_max_min o menos.
+    """
+    radio_km = (velocidad_kmh * tiempo_max_min) / 60
+    #Buscamos con un radio ligeramente mayor y filtramos por tiempo, igual que la versión densa.
+    filas, columnas, dists = pares_en_radio(lon_dem, lat_dem, lon_cand, lat_cand,
+                                            radio_km * (1 + MARGEN_CUERDA))
+    tiempos = (dists / velocidad_kmh) * 60
+    dentro = tiempos <= tiempo_max_min
+    return _a_csr(filas[dentro], columnas[dentro], tiempos[dentro], (len(lon_dem), len(lon_cand)))
+
+
+def matriz_cobertura(tiempos, umbral=None):
+    """
+    Matriz de cobertura 0/1 (CSR int8) a partir de una matriz dispersa de tiempos.
+
+    Si se indica 'umbral', solo se conservan los pares con tiempo <= umbral.
+    """
+    tiempos = sparse.csr_matrix(tiempos)
+    if umbral is None:
+        datos = np.ones(tiempos.nnz, dtype=np.int8)
+    else:
+        datos = (tiempos.data <= umbral).astype(np.int8)
+    cobertura = sparse.csr_matrix((datos, tiempos.indices.copy(), tiempos.indptr.copy()), shape=tiempos.shape)
+    cobertura.eliminate_zeros()
+    return cobertura
+
+
+class CoberturaCuerda:
+    """
+    Cobertura demanda x candidatos por producto escalar de vectores unitarios.
+
+    Los vectores se calculan una vez y se pueden guardar en float32 (la mitad de
+    memoria y productos más rápidos); la precisión solo cambia cuántos pares se
+    comprueban con haversine, no el resultado.
+    """
+
+    def __init__(self, lon_dem, lat_dem, lon_cand, lat_cand, velocidad_kmh, precision=np.float64):
+        self.coords_dem = (np.asarray(lon_dem, dtype=float), np.asarray(lat_dem, dtype=float))
+        self.coords_cand = (np.asarray(lon_cand, dtype=float), np.asarray(lat_cand, dtype=float))
+        self.velocidad_kmh = velocidad_kmh
+        self.precision = np.dtype(precision)
+        self.vectores_dem = a_vectores_unitarios(*self.coords_dem).astype(self.precision)
+        #Traspuesta contigua: cada bloque es un producto (filas x 3) @ (3 x candidatos).
+        self.vectores_cand = np.ascontiguousarray(a_vectores_unitarios(*self.coords_cand).astype(self.precision).T)
+        self.margen = EPSILONS_MARGEN_PRODUCTO * float(np.finfo(self.precision).eps)
+
+    def matriz(self, tiempo_max_min):
+        """
+        Matriz de cobertura 0/1 (CSR int8) de los pares con tiempo de vuelo <= tiempo_max_min.
+
+        Los pares del margen se deciden con '(haversine / velocidad) * 60 <= tiempo_max_min',
+        la misma comparación que matriz_tiempos_vuelo, así que los empates en el
+        borde se resuelven igual.
+        """
+        n_dem, n_cand = len(self.vectores_dem), self.vectores_cand.shape[1]
+        angulo = min((self.velocidad_kmh * tiempo_max_min) / 60 / RADIO_TIERRA_KM, np.pi)
+        umbral = np.cos(angulo)
+        filas_bloque = max(1, ELEMENTOS_BLOQUE_CUERDA // max(n_cand, 1))
+        indptr = np.zeros(n_dem + 1, dtype=np.int64)
+        columnas = []
+        for inicio in range(0, n_dem, filas_bloque):
+            fin = min(inicio + filas_bloque, n_dem)
+            producto = self.vectores_dem[inicio:fin] @ self.vectores_cand
+            cubierto = producto >= umbral + self.margen
+            f_dudosa, c_dudosa = np.nonzero((producto > umbral - self.margen) & ~cubierto)
+            if len(f_dudosa):
+                filas_abs = f_dudosa + inicio
+                dists = haversine_vectorizado(self.coords_dem[0][filas_abs], self.coords_dem[1][filas_abs],
+                                              self.coords_cand[0][c_dudosa], self.coords_cand[1][c_dudosa])
+                dentro = (dists / self.velocidad_kmh) * 60 <= tiempo_max_min
+                cubierto[f_dudosa[dentro], c_dudosa[dentro]] = True
+            #np.nonzero recorre por filas, así que las columnas ya quedan en orden CSR.
+            f_bloque, c_bloque = np.nonzero(cubierto)
+            np.cumsum(np.bincount(f_bloque, minlength=fin - inicio), out=indptr[inicio + 1:fin + 1])
+            indptr[inicio + 1:fin + 1] += indptr[inicio]
+            columnas.append(c_bloque)
+        columnas = np.concatenate(columnas) if columnas else np.zeros(0, dtype=np.int64)
+        return sparse.csr_matrix((np.ones(len(columnas), dtype=np.int8), columnas, indptr),
+                                 shape=(n_dem, n_cand))
+
+
+def puntos_cubiertos(cobertura, indices_solucion):
+    """Devuelve un array booleano que indica qué puntos de demanda cubre alguna base de la solución."""
+    sub = cobertura[:, list(indices_solucion)]
+    return np.asarray(sub.sum(axis=1)).ravel() > 0
+
+
+def minimo_por_fila(matriz, valor_vacio=np.inf):
+    """
+    Mínimo de los valores almacenados en cada fila de una matriz CSR.
+
+    A diferencia de .min(axis=1), ignora los huecos (pares fuera de radio) y
+    devuelve 'valor_vacio' en las filas sin ningún par almacenado.
+    """
+    matriz = sparse.csr_matrix(matriz)
+    minimos = np.full(matriz.shape[0], valor_vacio, dtype=float)
+    con_datos = np.diff(matriz.indptr) > 0
+    if matriz.nnz:
+        minimos[con_datos] = np.minimum.reduceat(matriz.data, matriz.indptr[:-1][con_datos])
+    return minimos
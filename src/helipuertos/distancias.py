@@ -0,0 +1,130 @@
+"""
+Distancias geodésicas entre coordenadas en grados (longitud, latitud).
+"""
+import numpy as np
+
+#Radio medio de la tierra en km.
+RADIO_TIERRA_KM = 6371
+
+
+def haversine_vectorizado(lon1, lat1, lon2, lat2):
+    """Calcula la distancia geodésica en km entre coordenadas."""
+    # Los datos vienen en grados, por lo que usamos map() para convertir las 4 variables a radianes.
+    lon1, lat1, lon2, lat2 = map(np.radians, [lon1, lat1, lon2, lat2])
+    #calculo de diferencias
+    dlon = lon2 - lon1
+    dlat = lat2 - lat1
+    #Calculamos a que representa el cuadrado de la mitad de la longitud de la cuerda recta entre los puntos.
+    #Fórmula matemática: a = sin²(Δlat/2) + cos(lat1) * cos(lat2) * sin²(Δlon/2)
+    a = np.sin(dlat/2.0)**2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon/2.0)**2
+    #c es la distancia angular en radianes sobre la superficie de la esfera.
+    #Fórmula: c = 2 * arcsin(√a)
+    c = 2 * np.arcsin(np.sqrt(a))
+    #Multiplicamos la distancia angular c por el radio medio de la tierra.
+    #Para asi convertir los radianes a kilómetros.
+    return RADIO_TIERRA_KM * c
+
+
+def a_vectores_unitarios(lon, lat):
+    """Convierte coordenadas en grados a vectores unitarios 3D (x, y, z) sobre la esfera."""
+    lon = np.radians(np.asarray(lon, dtype=float))
+    lat = np.radians(np.asarray(lat, dtype=float))
+    cos_lat = np.cos(lat)
+    return np.column_stack([cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)])
+
+
+def cuerda_equivalente(distancia_km):
+    """Longitud de la cuerda (en la esfera unidad) correspondiente a una distancia geodésica."""
+    angulo = np.asarray(distancia_km, dtype=float) / RADIO_TIERRA_KM
+    return 2 * np.sin(np.minimum(angulo, np.pi) / 2)
+
+
+#Elementos (filas x columnas) de cada bloque de reducir_distancias: cada búfer
+#ocupa 512 KB en float64, así que los tres caben en la caché.
+ELEMENTOS_BLOQUE = 2**16
+REDUCCIONES = ('minimo', 'indice', 'cobertura')
+
+
+def reducir_distancias(lon_a, lat_a, lon_b, lat_b, reducciones=('minimo',), velocidad_kmh=None, umbral=None,
+                       precision=np.float64, elementos_bloque=ELEMENTOS_BLOQUE):
+    """
+    Reducciones por fila de la matriz de distancias A x B sin guardar la matriz.
+
+    Las filas de A se recorren en bloques de unos 'elementos_bloque' pares sobre
+    búferes reservados una sola vez, con las operaciones in situ, así que la
+    memoria de trabajo no crece con len(A). Las distancias son las de
+    haversine_vectorizado (en float64, idénticas bit a bit) o, con
+    velocidad_kmh, los tiempos de vuelo en minutos '(d / velocidad) * 60'.
+
+    reducciones: cualquiera de REDUCCIONES:
+        'minimo': distancia (o tiempo) al punto de B más cercano.
+        'indice': posición en B del más cercano (el primero en los empates, como np.argmin).
+        'cobertura': bits de los pares con valor <= umbral, empaquetados por fila con
+            np.packbits(bitorder='little'); np.unpackbits(..., axis=1, count=len(B),
+            bitorder='little') los recupera.
+    precision: np.float32 reduce a la mitad la memoria de los búferes, con un error
+        del orden de un metro.
+    Devuelve un diccionario con un array por reducción pedida.
+    """
+    desconocidas = set(reducciones) - set(REDUCCIONES)
+    if desconocidas:
+        raise ValueError(f"Reducciones desconocidas: {sorted(desconocidas)} (opciones: {', '.join(REDUCCIONES)})")
+    if 'cobertura' in reducciones and umbral is None:
+        raise ValueError("La reducción 'cobertura' necesita 'umbral'.")
+    lon_a, lat_a, lon_b, lat_b = (np.radians(np.asarray(x, dtype=float)).astype(precision, copy=False)
+                                  for x in (lon_a, lat_a, lon_b, lat_b))
+    cos_a, cos_b = np.cos(lat_a), np.cos(lat_b)
+    n, m = len(lon_a), len(lon_b)
+    if m == 0 and ('minimo' in reducciones or 'indice' in reducciones):
+        raise ValueError("No se puede reducir al más cercano sin puntos en B.")
+
+    salida = {}
+    if 'minimo' in reducciones:
+        salida['minimo'] = np.empty(n, dtype=precision)
+    if 'indice' in reducciones:
+        salida['indice'] = np.empty(n, dtype=np.int64)
+    if 'cobertura' in reducciones:
+        salida['cobertura'] = np.empty((n, (m + 7) // 8), dtype=np.uint8)
+    filas_bloque = max(1, min(n, elementos_bloque // max(m, 1)))
+    #Búferes del bloque: se reutilizan en todas las iteraciones.
+    termino_lat = np.empty((filas_bloque, m), dtype=precision)
+    termino_lon = np.empty((filas_bloque, m), dtype=precision)
+    cosenos = np.empty((filas_bloque, m), dtype=precision)
+    cubierto = np.empty((filas_bloque, m), dtype=bool) if 'cobertura' in reducciones else None
+
+    for inicio in range(0, n, filas_bloque):
+        fin = min(inicio + filas_bloque, n)
+        k = fin - inicio
+        d, t_lon, c = termino_lat[:k], termino_lon[:k], cosenos[:k]
+        #Mismo orden de operaciones que haversine_vectorizado:
+        #a = sin²(Δlat/2) + (cos(lat1) * cos(lat2)) * sin²(Δlon/2); d = R * (2 * arcsin(√a)).
+        np.subtract(lat_b, lat_a[inicio:fin, None], out=d)
+        np.divide(d, 2.0, out=d)
+        np.sin(d, out=d)
+        np.square(d, out=d)
+        np.subtract(lon_b, lon_a[inicio:fin, None], out=t_lon)
+        np.divide(t_lon, 2.0, out=t_lon)
+        np.sin(t_lon, out=t_lon)
+        np.square(t_lon, out=t_lon)
+        np.multiply(cos_a[inicio:fin, None], cos_b, out=c)
+        np.multiply(c, t_lon, out=t_lon)
+        np.add(d, t_lon, out=d)
+        np.sqrt(d, out=d)
+        np.arcsin(d, out=d)
+        np.multiply(d, 2, out=d)
+        np.multiply(d, RADIO_TIERRA_KM, out=d)
+        if velocidad_kmh is not None:
+            np.divide(d, velocidad_kmh, out=d)
+            np.multiply(d, 60, out=d)
+
+        if 'indice' in salida:
+            indices = np.argmin(d, axis=1)
+            salida['indice'][inicio:fin] = indices
+            if 'minimo' in salida:
+                salida['minimo'][inicio:fin] = d[np.arange(k), indices]
+        elif 'minimo' in salida:
+            np.min(d, axis=1, out=salida['minimo'][inicio:fin])
+        if 'cobertura' in salida:
+            np.less_equal(d, umbral, out=cubierto[:k])
+            salida['cobertura'][inicio:fin] = np.packbits(cubierto[:k], axis=1, bitorder='little')
+    return salida
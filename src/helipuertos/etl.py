@@ -0,0 +1,277 @@
+"""
+Grafo de etapas de la preparación de datos, con caché por contenido.
+
+Cada etapa declara las etapas de las que depende, los archivos fuente que lee,
+sus parámetros y las columnas que produce. Su función recibe los resultados de
+sus dependencias, las rutas y los parámetros como argumentos con nombre, y
+devuelve un DataFrame con las columnas clave (CLAVES) y las suyas. Una etapa
+sin columnas (columnas=None) devuelve en cambio un objeto que usan otras etapas
+(por ejemplo, el índice de nombres del registro): se calcula y se guarda en la
+caché una sola vez, pero no se une al registro.
+
+El resultado de cada etapa se guarda en disco identificado por un hash de:
+- el nombre, la versión y el código de la función de la etapa,
+- el contenido (sha256) de los módulos que la implementan (procesar_*.py,
+  helipuertos/nombres.py...), así que cambiar su código invalida la caché sin
+  tener que tocar la versión,
+- sus parámetros,
+- el contenido (sha256) de sus archivos fuente,
+- el contenido del resultado de cada etapa de la que depende.
+En la siguiente ejecución solo se recalculan las etapas cuyo hash ha cambiado, y
+si una etapa se recalcula pero da el mismo resultado, las que dependen de ella
+siguen saliendo de la caché.
+
+Las etapas que no dependen unas de otras se calculan a la vez en un pool de
+procesos, y al final unir_etapas junta sus columnas por CLAVES.
+"""
+import hashlib
+import importlib.util
+import inspect
+import json
+import os
+import pickle
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from helipuertos.cache import huella_archivo
+
+#Se incrementa si cambia el formato de las entradas guardadas.
+VERSION_ETL = 1
+#Columnas que identifican un municipio en el resultado de todas las etapas.
+CLAVES = ['Cod_Municipio', 'Cod_Provincia']
+
+
+def ruta_modulo(nombre):
+    """Archivo fuente de un módulo importable, sin importarlo."""
+    spec = importlib.util.find_spec(nombre)
+    if spec is None or not spec.origin or not os.path.exists(spec.origin):
+        raise ValueError(f"No se encuentra el código fuente del módulo {nombre!r}")
+    return spec.origin
+
+
+class Etapa:
+    """
+    Una etapa del grafo.
+
+    nombre: identificador (también es el nombre del argumento con el que reciben
+        su resultado las etapas que dependen de ella).
+    funcion: funcion(**dependencias, **archivos, **parametros) -> DataFrame.
+    columnas: columnas que produce; el resultado las lleva en este orden, con
+        CLAVES delante si no están en la lista. None si la etapa devuelve un
+        objeto para otras etapas en lugar de columnas.
+    depende_de: nombres de las etapas cuyo resultado necesita.
+    archivos: {argumento: ruta o lista de rutas (o None si es opcional y no se usa)}.
+    parametros: {argumento: valor} serializable en JSON.
+    modulos: nombres de los módulos con el código que hace el trabajo (las
+        funciones auxiliares a las que llama 'funcion'); su contenido entra en la clave.
+    version: se incrementa al cambiar algo que ni 'funcion' ni 'modulos' reflejan
+        (por ejemplo, un cambio de criterio en una librería externa).
+    """
+
+    def __init__(self, nombre, funcion, columnas, depende_de=(), archivos=None, parametros=None,
+                 modulos=(), version=1):
+        self.nombre = nombre
+        self.funcion = funcion
+        if columnas is None:
+            self.columnas = self.salida = None
+        else:
+            self.columnas = [c for c in columnas if c not in CLAVES]
+            self.salida = [c for c in CLAVES if c not in columnas] + list(columnas)
+        self.depende_de = list(depende_de)
+        self.archivos = dict(archivos or {})
+        self.parametros = dict(parametros or {})
+        self.modulos = list(modulos)
+        self.version = version
+
+    def __repr__(self):
+        return f"Etapa({self.nombre!r})"
+
+    def rutas(self):
+        """Todas las rutas de archivos fuente de la etapa."""
+        rutas = []
+        for valor in self.archivos.values():
+            if valor is None:
+                continue
+            rutas.extend(valor if isinstance(valor, (list, tuple)) else [valor])
+        return rutas
+
+    def clave(self, huellas_dependencias):
+        """Hash de todo lo que determina el resultado de la etapa."""
+        for ruta in self.rutas():
+            if not os.path.exists(ruta):
+                raise FileNotFoundError(f"Etapa '{self.nombre}': no existe el archivo fuente {ruta}")
+        try:
+            codigo = inspect.getsource(getattr(self.funcion, 'func', self.funcion))
+        except (OSError, TypeError):
+            codigo = getattr(self.funcion, '__qualname__', repr(self.funcion))
+        contenido = {
+            'version_etl': VERSION_ETL,
+            'nombre': self.nombre,
+            'version': self.version,
+            'codigo': hashlib.sha256(codigo.encode()).hexdigest(),
+            'columnas': self.salida,
+            'parametros': self.parametros,
+            'modulos': {nombre: huella_archivo(ruta_modulo(nombre)) for nombre in self.modulos},
+            'archivos': {arg: ([huella_archivo(r) for r in valor] if isinstance(valor, (list, tuple))
+                               else None if valor is None else huella_archivo(valor))
+                         for arg, valor in sorted(self.archivos.items())},
+            'dependencias': {dep: huellas_dependencias[dep] for dep in self.depende_de},
+        }
+        h = hashlib.sha256(json.dumps(contenido, sort_keys=True, default=str).encode())
+        return h.hexdigest()[:24]
+
+    def calcular(self, resultados):
+        """Ejecuta la función de la etapa y comprueba que devuelve sus columnas."""
+        entradas = {dep: resultados[dep] for dep in self.depende_de}
+        df = self.funcion(**entradas, **self.archivos, **self.parametros)
+        if self.salida is None:
+            return df
+        faltan = [c for c in self.salida if c not in df.columns]
+        if faltan:
+            raise ValueError(f"Etapa '{self.nombre}': faltan las columnas {faltan} en su resultado")
+        return df[self.salida].reset_index(drop=True)
+
+
+def orden_topologico(etapas):
+    """Las etapas en un orden en el que cada una va después de sus dependencias."""
+    por_nombre = {etapa.nombre: etapa for etapa in etapas}
+    if len(por_nombre) != len(etapas):
+        raise ValueError("Hay etapas con el mismo nombre")
+    orden, estado = [], {}
+
+    def visitar(nombre, camino):
+        if nombre not in por_nombre:
+            raise ValueError(f"La etapa '{camino[-1]}' depende de '{nombre}', que no está definida")
+        if estado.get(nombre) == 'hecha':
+            return
+        if estado.get(nombre) == 'en_curso':
+            raise ValueError(f"Dependencia circular: {' -> '.join(camino + [nombre])}")
+        estado[nombre] = 'en_curso'
+        for dep in por_nombre[nombre].depende_de:
+            visitar(dep, camino + [nombre])
+        estado[nombre] = 'hecha'
+        orden.append(por_nombre[nombre])
+
+    #Se respeta el orden declarado salvo donde una dependencia obliga a adelantar una etapa.
+    for etapa in etapas:
+        visitar(etapa.nombre, [])
+    return orden
+
+
+class CacheEtapas:
+    """
+    Resultados de etapas guardados en un directorio (un pickle por etapa y clave).
+
+    Junto a cada resultado se guarda el sha256 de su contenido, que es lo que
+    entra en la clave de las etapas que dependen de él. De cada etapa solo se
+    conserva la última entrada.
+    """
+
+    def __init__(self, directorio):
+        self.directorio = directorio
+        os.makedirs(directorio, exist_ok=True)
+
+    def _ruta(self, nombre, clave, extension):
+        return os.path.join(self.directorio, f"{nombre}-{clave}.{extension}")
+
+    def cargar(self, nombre, clave):
+        """(resultado, huella) de la entrada, o None si no está."""
+        ruta_meta = self._ruta(nombre, clave, 'json')
+        if not os.path.exists(ruta_meta):
+            return None
+        with open(ruta_meta, encoding='utf-8') as f:
+            huella = json.load(f)['sha256']
+        with open(self._ruta(nombre, clave, 'pkl'), 'rb') as f:
+            return pickle.load(f), huella
+
+    def guardar(self, nombre, clave, df):
+        """Guarda el resultado y devuelve su huella."""
+        datos = pickle.dumps(df, protocol=pickle.HIGHEST_PROTOCOL)
+        huella = hashlib.sha256(datos).hexdigest()
+        for extension, contenido, modo in (('pkl', datos, 'wb'),
+                                           ('json', json.dumps({'sha256': huella}), 'w')):
+            ruta = self._ruta(nombre, clave, extension)
+            #Renombrado atómico: el .json (que marca la entrada como completa) se escribe el último.
+            with open(ruta + '.tmp', modo) as f:
+                f.write(contenido)
+            os.replace(ruta + '.tmp', ruta)
+        for archivo in os.listdir(self.directorio):
+            if archivo.startswith(f"{nombre}-") and not archivo.startswith(f"{nombre}-{clave}."):
+                os.remove(os.path.join(self.directorio, archivo))
+        return huella
+
+
+def _calcular_en_proceso(etapa, entradas):
+    return etapa.calcular(entradas)
+
+
+def ejecutar_etapas(etapas, directorio_cache=None, forzar=(), n_procesos=None):
+    """
+    Ejecuta el grafo de etapas y devuelve ({nombre: resultado}, informe).
+
+    directorio_cache: carpeta de la caché (None = se calcula todo y no se guarda nada).
+    forzar: nombres de etapas que se recalculan aunque estén en caché.
+    n_procesos: procesos del pool (None = tantos como núcleos; 1 = sin pool). Cada
+        etapa se lanza en cuanto terminan sus dependencias, así que las etapas
+        independientes se calculan a la vez y el tiempo total es el del camino
+        más lento del grafo. Las funciones de las etapas tienen que poder
+        importarse desde otro proceso (funciones de módulo, no lambdas).
+    informe: lista de (etapa, 'caché' o 'calculada', segundos) en orden de finalización.
+    """
+    cache = CacheEtapas(directorio_cache) if directorio_cache else None
+    if n_procesos is None:
+        n_procesos = os.cpu_count() or 1
+    resultados, huellas, informe = {}, {}, []
+
+    def registrar(etapa, clave, df, estado, inicio):
+        resultados[etapa.nombre] = df
+        if estado == 'calculada' and cache is not None:
+            huellas[etapa.nombre] = cache.guardar(etapa.nombre, clave, df)
+        informe.append((etapa.nombre, estado, time.perf_counter() - inicio))
+
+    pendientes = orden_topologico(etapas)
+    en_curso = {}
+    pool = ProcessPoolExecutor(max_workers=n_procesos) if n_procesos > 1 else None
+    try:
+        while pendientes or en_curso:
+            #Se lanzan todas las etapas cuyas dependencias ya están; las que salen de la
+            #caché pueden liberar otras en la misma vuelta.
+            for etapa in [e for e in pendientes if all(d in resultados for d in e.depende_de)]:
+                pendientes.remove(etapa)
+                inicio = time.perf_counter()
+                clave = etapa.clave(huellas) if cache is not None else None
+                entrada = None
+                if cache is not None and etapa.nombre not in forzar:
+                    entrada = cache.cargar(etapa.nombre, clave)
+                if entrada is not None:
+                    huellas[etapa.nombre] = entrada[1]
+                    registrar(etapa, clave, entrada[0], 'caché', inicio)
+                elif pool is None:
+                    registrar(etapa, clave, etapa.calcular(resultados), 'calculada', inicio)
+                else:
+                    entradas = {dep: resultados[dep] for dep in etapa.depende_de}
+                    en_curso[pool.submit(_calcular_en_proceso, etapa, entradas)] = (etapa, clave, inicio)
+            if en_curso:
+                terminados, _ = wait(en_curso, return_when=FIRST_COMPLETED)
+                for futuro in terminados:
+                    etapa, clave, inicio = en_curso.pop(futuro)
+                    registrar(etapa, clave, futuro.result(), 'calculada', inicio)
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+    return resultados, informe
+
+
+def unir_etapas(resultados, nombres):
+    """
+    Une por CLAVES los resultados de las etapas 'nombres' sobre el de la primera (left join).
+
+    Si una columna sale en varias etapas se queda la de la última (por ejemplo, las
+    coordenadas limpias frente a las del registro sin limpiar).
+    """
+    unido = resultados[nombres[0]]
+    for nombre in nombres[1:]:
+        df = resultados[nombre]
+        repetidas = [c for c in df.columns if c not in CLAVES and c in unido.columns]
+        unido = unido.drop(columns=repetidas).merge(df, on=CLAVES, how='left')
+    return unido
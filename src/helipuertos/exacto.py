@@ -0,0 +1,146 @@
+"""
+Resolución exacta del MCLP como programa lineal entero (MILP) con HiGHS.
+
+Formulación (mismos datos que la heurística):
+
+    max  sum_i s_i * y_i
+    s.a. y_i <= sum_j a_ij * x_j      para cada punto de demanda i
+         sum_{j en r} x_j = 1         para cada región lógica r
+         x_j en {0, 1},  0 <= y_i <= 1
+
+x_j indica si se elige el candidato j e y_i si el punto de demanda i queda
+cubierto. Como se maximiza, y_i no necesita ser entera. La relajación lineal
+(x_j continuas) da una cota superior con la que medir el gap de la heurística.
+"""
+import time
+
+import numpy as np
+from scipy import sparse
+from scipy.optimize import Bounds, LinearConstraint, milp
+
+from helipuertos.optimizacion import mejora_iterativa, score_cubierto
+
+
+def _modelo_mclp(matriz_cobertura, scores_demanda, regiones_candidatos):
+    """
+    Construye los vectores y restricciones del MILP.
+
+    Solo se crean variables y_i para los puntos con score positivo que algún
+    candidato puede cubrir; el resto no cambia el óptimo.
+    """
+    cobertura = sparse.csr_matrix(matriz_cobertura, dtype=float)
+    scores_demanda = np.asarray(scores_demanda, dtype=float)
+    n_cand = cobertura.shape[1]
+
+    cubrible = (np.diff(cobertura.indptr) > 0) & (scores_demanda > 0)
+    cobertura = cobertura[cubrible]
+    scores = scores_demanda[cubrible]
+    n_dem = cobertura.shape[0]
+
+    #Variables: [x_1..x_M, y_1..y_N]; milp minimiza, así que cambiamos el signo.
+    c = np.concatenate([np.zeros(n_cand), -scores])
+
+    #y_i - sum_j a_ij x_j <= 0
+    a_cobertura = sparse.hstack([-cobertura, sparse.identity(n_dem, format='csr')], format='csr')
+    restr_cobertura = LinearConstraint(a_cobertura, -np.inf, 0)
+
+    #sum_{j en r} x_j = 1
+    regiones_candidatos = np.asarray(regiones_candidatos)
+    regiones, codigo_region = np.unique(regiones_candidatos, return_inverse=True)
+    a_region = sparse.csr_matrix(
+        (np.ones(n_cand), (codigo_region, np.arange(n_cand))),
+        shape=(len(regiones), n_cand + n_dem))
+    restr_region = LinearConstraint(a_region, 1, 1)
+
+    integralidad = np.concatenate([np.ones(n_cand), np.zeros(n_dem)])
+    return c, [restr_cobertura, restr_region], integralidad, n_cand
+
+
+def cota_relajacion_lineal(matriz_cobertura, scores_demanda, regiones_candidatos):
+    """Valor de la relajación lineal del MCLP: cota superior del score cubierto alcanzable."""
+    c, restricciones, _, _ = _modelo_mclp(matriz_cobertura, scores_demanda, regiones_candidatos)
+    res = milp(c, constraints=restricciones, bounds=Bounds(0, 1))
+    if res.x is None:
+        raise RuntimeError(f"No se pudo resolver la relajación lineal: {res.message}")
+    return -res.fun
+
+
+def resolver_mclp_exacto(matriz_cobertura, scores_demanda, regiones_candidatos,
+                         limite_tiempo=None, tolerancia_gap=0.0):
+    """
+    Resuelve el MCLP con una base por región de forma exacta con HiGHS.
+
+    regiones_candidatos: región lógica de cada columna de la matriz de cobertura.
+    limite_tiempo: segundos máximos de resolución (None = sin límite). Si se alcanza,
+        se devuelve la mejor solución encontrada y la cota dual del solver.
+    tolerancia_gap: gap relativo con el que el solver puede parar (0 = óptimo).
+    Devuelve un diccionario con 'solucion_indices', 'score', 'cota_superior',
+    'optimo' (True si se ha probado optimalidad) y 'tiempo_s'.
+    """
+    inicio = time.perf_counter()
+    c, restricciones, integralidad, n_cand = _modelo_mclp(
+        matriz_cobertura, scores_demanda, regiones_candidatos)
+    opciones = {'mip_rel_gap': tolerancia_gap}
+    if limite_tiempo is not None:
+        opciones['time_limit'] = limite_tiempo
+    res = milp(c, constraints=restricciones, integrality=integralidad,
+               bounds=Bounds(0, 1), options=opciones)
+    tiempo = time.perf_counter() - inicio
+    if res.x is None:
+        raise RuntimeError(f"El solver exacto no encontró solución: {res.message}")
+
+    solucion_indices = [int(j) for j in np.flatnonzero(res.x[:n_cand] > 0.5)]
+    #Recalculamos el score con la matriz para no arrastrar tolerancias del solver.
+    score = score_cubierto(matriz_cobertura, np.asarray(scores_demanda, dtype=float), solucion_indices)
+    cota = getattr(res, 'mip_dual_bound', None)
+    cota = -cota if cota is not None and np.isfinite(cota) else score
+    return {
+        'solucion_indices': solucion_indices,
+        'score': score,
+        'cota_superior': max(cota, score),
+        'optimo': res.status == 0,
+        'tiempo_s': tiempo,
+    }
+
+
+def gap_relativo(score, cota):
+    """Gap relativo (cota - score) / cota, 0 si la cota es nula."""
+    return (cota - score) / cota if cota > 0 else 0.0
+
+
+def comparar_motores(matriz_cobertura, scores_demanda, regiones_candidatos,
+                     solucion_inicial, alternativas, limite_tiempo=None):
+    """
+    Ejecuta la heurística de mejora iterativa y el solver exacto sobre la misma
+    instancia y devuelve un informe con tiempos, scores y gaps.
+
+    El gap de la heurística se mide frente al óptimo (o la mejor cota si el
+    solver agota el tiempo) y frente a la cota de la relajación lineal.
+    """
+    inicio = time.perf_counter()
+    solucion_heur, score_heur = mejora_iterativa(
+        matriz_cobertura, scores_demanda, solucion_inicial, alternativas)
+    tiempo_heur = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    cota_lp = cota_relajacion_lineal(matriz_cobertura, scores_demanda, regiones_candidatos)
+    tiempo_lp = time.perf_counter() - inicio
+
+    exacto = resolver_mclp_exacto(matriz_cobertura, scores_demanda, regiones_candidatos,
+                                  limite_tiempo=limite_tiempo)
+    return {
+        'n_demanda': matriz_cobertura.shape[0],
+        'n_candidatos': matriz_cobertura.shape[1],
+        'solucion_heuristica': solucion_heur,
+        'score_heuristica': score_heur,
+        'tiempo_heuristica_s': tiempo_heur,
+        'solucion_exacta': exacto['solucion_indices'],
+        'score_exacto': exacto['score'],
+        'optimo_probado': exacto['optimo'],
+        'tiempo_exacto_s': exacto['tiempo_s'],
+        'cota_lp': cota_lp,
+        'tiempo_lp_s': tiempo_lp,
+        'gap_heuristica': gap_relativo(score_heur, exacto['cota_superior']),
+        'gap_heuristica_lp': gap_relativo(score_heur, cota_lp),
+        'motor_mas_rapido': 'heuristica' if tiempo_heur <= exacto['tiempo_s'] else 'exacto',
+    }
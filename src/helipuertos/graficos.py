@@ -0,0 +1,237 @@
+"""
+Gráfico de pesos y mapas de cobertura (los que generaba code.py).
+
+matplotlib y folium se importan dentro de cada función, de modo que importar
+este módulo (o el pipeline) no los carga si no se pide ningún gráfico.
+
+Los municipios se dibujan como una única capa GeoJSON construida a partir de
+las columnas del DataFrame (sin iterrows) en lugar de un CircleMarker de folium
+por fila: el html pesa mucho menos y se genera mucho más rápido. Por defecto
+los puntos se dibujan en SVG, como en code.py; con canvas=True se dibujan en un
+único canvas, que sigue siendo fluido con decenas de miles de puntos, pero los
+marcadores se ven algo distintos (sin bordes nítidos al hacer zoom) y el clic
+se resuelve por la posición y no por el elemento.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from helipuertos.perfilado import SIN_PERFILADO
+
+
+#Centro aproximado de Castilla y León (Tordesillas/Valladolid).
+CENTRO_MAPA = [41.65, -4.72]
+ZOOM_MAPA = 8
+
+
+def _ruta(directorio, nombre_archivo):
+    """Ruta de salida; sin directorio se escribe en la carpeta actual."""
+    if directorio is None:
+        return nombre_archivo
+    os.makedirs(directorio, exist_ok=True)
+    return os.path.join(directorio, nombre_archivo)
+
+
+def generar_grafico_pesos(directorio=None, nombre_archivo='pesos_modelo_multicriterio.png'):
+    """
+    Genera y guarda un gráfico circular (pie chart) visualizando
+    la distribución de pesos de las variables del modelo.
+    """
+    import matplotlib.pyplot as plt
+
+    labels = [
+        'Accidentes Ctra.',
+        'Dificultad Acceso',
+        'Densidad Pob.',
+        'Centro Salud',
+        'Transplantes',
+        'Cobertura 4G'
+    ]
+    sizes = [0.20, 0.43, 0.15, 0.15, 0.02, 0.05] # Deben sumar 1.0
+
+    # Colores para diferenciar categorías
+    colors = ['#ff6666', '#ffcc99', '#99ff99', '#66b3ff', '#c2c2f0', '#ffb3e6']
+    explode = (0.05, 0.05, 0, 0, 0, 0)  # Destacar ligeramente las dos más importantes
+
+    plt.figure(figsize=(10, 7))
+    plt.pie(sizes, explode=explode, labels=labels, colors=colors,
+            autopct='%1.1f%%', shadow=True, startangle=140)
+
+    plt.title('Ponderación de Variables en el Índice de Prioridad (IP)', fontsize=14, fontweight='bold')
+    plt.axis('equal')  # Asegura que el pastel sea un círculo perfecto
+
+    ruta = _ruta(directorio, nombre_archivo)
+    plt.savefig(ruta, dpi=300, bbox_inches='tight')
+    print(f"Gráfico de pesos generado correctamente: {ruta}")
+    plt.close()
+    return ruta
+
+
+#El popup de cada punto es el texto que trae su propia 'feature' del GeoJSON.
+_POPUP_DESDE_PROPIEDADES = "function(feature, layer) { layer.bindPopup(feature.properties.popup); }"
+
+
+def _mapa_base(canvas=False):
+    import folium
+    #canvas=True: un canvas en lugar de un elemento SVG por punto.
+    return folium.Map(location=CENTRO_MAPA, zoom_start=ZOOM_MAPA, tiles='CartoDB positron',
+                      prefer_canvas=canvas)
+
+
+def geojson_municipios(demand, con_coordenadas=False):
+    """
+    FeatureCollection con un punto por municipio con coordenadas válidas.
+
+    Cada punto lleva en 'popup' el texto que se muestra al pulsarlo: nombre y
+    población y, si con_coordenadas, también longitud y latitud.
+    """
+    demand = demand[demand['Latitud'].notna() & demand['Longitud'].notna()]
+    lon = demand['Longitud'].to_numpy(dtype=float)
+    lat = demand['Latitud'].to_numpy(dtype=float)
+    popups = demand['Municipio'].astype(str) + ' (Pob: ' + demand['Población'].astype(str) + ')'
+    if con_coordenadas:
+        popups = (popups + ' Longitud:' + demand['Longitud'].astype(str) +
+                  ' Latitud:' + demand['Latitud'].astype(str))
+    return {
+        'type': 'FeatureCollection',
+        'features': [
+            {'type': 'Feature', 'geometry': {'type': 'Point', 'coordinates': [x, y]},
+             'properties': {'popup': texto}}
+            for x, y, texto in zip(lon.tolist(), lat.tolist(), popups.tolist())
+        ],
+    }
+
+
+def capas_compartidas(demand, bases_finales, parametros):
+    """
+    Datos de las capas que comparten los mapas, calculados una sola vez.
+
+    Devuelve un diccionario con los GeoJSON de municipios (sin y con coordenadas
+    en el popup y el subconjunto con Dificultad_Acceso_Norm > 0.5), las bases
+    elegidas como lista de diccionarios y los radios de cobertura en metros. Solo
+    contiene tipos básicos, así que se envía tal cual a los procesos trabajadores.
+    """
+    validos = demand[demand['Latitud'].notna() & demand['Longitud'].notna()]
+    con_coordenadas = geojson_municipios(validos, con_coordenadas=True)
+    dificil = (validos['Dificultad_Acceso_Norm'] > 0.5).to_numpy()
+    velocidad = parametros['VELOCIDAD_HELICOPTERO']
+    return {
+        'municipios': geojson_municipios(validos),
+        'municipios_coordenadas': con_coordenadas,
+        'municipios_dificil_acceso': {
+            'type': 'FeatureCollection',
+            'features': [f for f, d in zip(con_coordenadas['features'], dificil) if d],
+        },
+        'bases': bases_finales[['Municipio', 'Provincia', 'Latitud', 'Longitud']].to_dict('records'),
+        #Distancia recorrida en el tiempo dado, en metros (30 min a 240 km/h = 120 km).
+        'radio_max': (velocidad * (parametros['TIEMPO_COBERTURA_MAX'] / 60)) * 1000,
+        'radio_ideal': (velocidad * (parametros['TIEMPO_ACCION_IDEAL'] / 60)) * 1000,
+    }
+
+
+#Mapas de code.py: archivo -> (capa de municipios, círculos de cada base como
+#(radio, color, fill_opacity); None si el mapa no lleva bases).
+VARIANTES_MAPA = {
+    'mapa_cobertura_helicopteros.html': ('municipios', [('radio_max', 'red', 0.1)]),
+    'mapa_cobertura_helicopteros_15.html': ('municipios', [('radio_ideal', 'yellow', 0.2),
+                                                           ('radio_max', 'red', 0.05)]),
+    'mapa_cobertura_helicopteros_municipios.html': ('municipios_coordenadas', None),
+    'mapa_cobertura_helicopteros_municipios_difi_acceso.html': ('municipios_dificil_acceso', None),
+}
+
+#Capas compartidas en cada proceso trabajador (se rellena en _iniciar_trabajador).
+_ESTADO = {}
+
+
+def _capa_municipios(mapa, geojson):
+    """Puntos pequeños azules de fondo, uno por municipio."""
+    import folium
+    from folium.utilities import JsCode
+    folium.GeoJson(
+        geojson,
+        marker=folium.CircleMarker(radius=2, color='blue', fill=True, fill_color='blue', fill_opacity=0.4),
+        on_each_feature=JsCode(_POPUP_DESDE_PROPIEDADES),
+    ).add_to(mapa)
+
+
+def _capa_bases(mapa, bases, circulos):
+    """
+    Marcador rojo en cada base y sus círculos de cobertura.
+
+    circulos: lista de (radio_metros, color, fill_opacity) que se dibujan en ese orden.
+    """
+    import folium
+    for base in bases:
+        folium.Marker(
+            location=[base['Latitud'], base['Longitud']],
+            popup=folium.Popup(f"<b>BASE: {base['Municipio']}</b><br>Provincia: {base['Provincia']}", max_width=300),
+            tooltip=f"Base {base['Municipio']}",
+            icon=folium.Icon(color='red', icon='info-sign', prefix='glyphicon')
+        ).add_to(mapa)
+        for radio_metros, color, opacidad in circulos:
+            folium.Circle(
+                location=[base['Latitud'], base['Longitud']],
+                radius=radio_metros,
+                color=color,
+                fill=True,
+                fill_opacity=opacidad
+            ).add_to(mapa)
+
+
+def _escribir_mapa(nombre_archivo, directorio, capas=None, canvas=False):
+    """Compone una variante de VARIANTES_MAPA a partir de las capas compartidas y la guarda."""
+    capas = capas or _ESTADO
+    capa, circulos = VARIANTES_MAPA[nombre_archivo]
+    mapa = _mapa_base(canvas)
+    _capa_municipios(mapa, capas[capa])
+    if circulos is not None:
+        _capa_bases(mapa, capas['bases'], [(capas[radio], color, opacidad)
+                                           for radio, color, opacidad in circulos])
+    ruta = _ruta(directorio, nombre_archivo)
+    mapa.save(ruta)
+    return ruta
+
+
+def _iniciar_trabajador(capas):
+    _ESTADO.update(capas)
+
+
+def generar_mapas(demand, bases_finales, parametros, directorio=None, n_procesos=None,
+                  perfilador=SIN_PERFILADO, canvas=False):
+    """
+    Genera los cuatro mapas html de code.py y devuelve sus rutas.
+
+    - mapa_cobertura_helicopteros.html: bases con su radio a tiempo máximo.
+    - mapa_cobertura_helicopteros_15.html: radios a tiempo ideal y a tiempo máximo.
+    - mapa_cobertura_helicopteros_municipios.html: todos los municipios.
+    - mapa_cobertura_helicopteros_municipios_difi_acceso.html: municipios con
+      Dificultad_Acceso_Norm > 0.5.
+    parametros: VELOCIDAD_HELICOPTERO, TIEMPO_COBERTURA_MAX y TIEMPO_ACCION_IDEAL.
+    n_procesos: procesos del pool (None = uno por mapa hasta el número de núcleos;
+        1 = sin pool). Las capas se calculan una vez y cada mapa se escribe en su
+        proceso, así que el tiempo total es el del mapa más lento.
+    perfilador: Perfilador en el que se miden las capas y cada mapa. Con él los
+        mapas se escriben en este proceso, porque tracemalloc no ve los del pool.
+    canvas: dibuja los puntos en canvas (prefer_canvas de folium) en lugar de SVG;
+        conviene con muchos municipios.
+    """
+    with perfilador.etapa('capas_mapas'):
+        capas = capas_compartidas(demand, bases_finales, parametros)
+    nombres = list(VARIANTES_MAPA)
+    if n_procesos is None:
+        n_procesos = min(len(nombres), os.cpu_count() or 1)
+    if perfilador is not SIN_PERFILADO:
+        n_procesos = 1
+    if n_procesos == 1:
+        rutas = []
+        for nombre in nombres:
+            with perfilador.etapa(nombre):
+                rutas.append(_escribir_mapa(nombre, directorio, capas, canvas))
+    else:
+        #Las capas se envían una vez a cada proceso, no con cada mapa.
+        with ProcessPoolExecutor(max_workers=n_procesos, initializer=_iniciar_trabajador,
+                                 initargs=(capas,)) as pool:
+            rutas = list(pool.map(_escribir_mapa, nombres, [directorio] * len(nombres),
+                                  [None] * len(nombres), [canvas] * len(nombres)))
+    for ruta in rutas:
+        print(f"Mapa guardado correctamente como: '{ruta}'")
+    return rutas
@@ -0,0 +1,92 @@
+"""
+Índice espacial de instalaciones (hospitales, centros de trasplantes, centros de salud...).
+
+Las instalaciones se indexan una vez en un KD-tree sobre vectores unitarios 3D
+y después se consultan las k más cercanas o las que están dentro de un radio
+para cualquier conjunto de puntos, en O(log n) por consulta. La distancia de
+cuerda es creciente con la distancia geodésica, así que el orden del KD-tree es
+el mismo que el de haversine; las distancias devueltas se recalculan con
+haversine para que coincidan con las de la matriz densa.
+"""
+import numpy as np
+from scipy.spatial import cKDTree
+
+from helipuertos.cobertura import _a_csr, pares_en_radio
+from helipuertos.distancias import a_vectores_unitarios, haversine_vectorizado
+
+#Vecinos de más que se piden al KD-tree para reordenar con haversine los empates por redondeo.
+VECINOS_EXTRA = 2
+
+
+class IndiceInstalaciones:
+    """
+    KD-tree de un tipo de instalación.
+
+    lon, lat: coordenadas en grados de las instalaciones.
+    etiquetas: opcional, un identificador por instalación (por ejemplo, el municipio).
+    """
+
+    def __init__(self, lon, lat, etiquetas=None):
+        self.lon = np.asarray(lon, dtype=float)
+        self.lat = np.asarray(lat, dtype=float)
+        self.etiquetas = None if etiquetas is None else np.asarray(etiquetas)
+        self.arbol = cKDTree(a_vectores_unitarios(self.lon, self.lat)) if len(self.lon) else None
+
+    def __len__(self):
+        return len(self.lon)
+
+    def mas_cercanas(self, lon, lat, k=1):
+        """
+        Las k instalaciones más cercanas a cada punto.
+
+        Devuelve (distancias_km, indices), ambos de forma (n_puntos, k) y ordenados
+        de menor a mayor distancia. Si hay menos de k instalaciones, las columnas
+        que faltan tienen distancia inf e índice -1.
+        """
+        lon = np.asarray(lon, dtype=float)
+        lat = np.asarray(lat, dtype=float)
+        dists = np.full((len(lon), k), np.inf)
+        indices = np.full((len(lon), k), -1, dtype=np.int64)
+        if self.arbol is None or len(lon) == 0:
+            return dists, indices
+
+        k_busqueda = min(len(self), k + VECINOS_EXTRA)
+        _, vecinos = self.arbol.query(a_vectores_unitarios(lon, lat), k=k_busqueda)
+        vecinos = np.asarray(vecinos, dtype=np.int64).reshape(len(lon), k_busqueda)
+        exactas = haversine_vectorizado(lon[:, None], lat[:, None], self.lon[vecinos], self.lat[vecinos])
+        #Orden estable: a igual distancia gana la instalación que aparece antes, como con np.min.
+        orden = np.lexsort((vecinos, exactas), axis=1)[:, :k]
+        n = orden.shape[1]
+        dists[:, :n] = np.take_along_axis(exactas, orden, axis=1)
+        indices[:, :n] = np.take_along_axis(vecinos, orden, axis=1)
+        return dists, indices
+
+    def distancia_minima(self, lon, lat, valor_vacio=np.inf):
+        """Distancia en km a la instalación más cercana ('valor_vacio' si el índice está vacío)."""
+        if self.arbol is None:
+            return np.full(len(np.asarray(lon)), valor_vacio, dtype=float)
+        return self.mas_cercanas(lon, lat, k=1)[0][:, 0]
+
+    def en_radio(self, lon, lat, radio_km):
+        """
+        Matriz CSR (n_puntos x n_instalaciones) con la distancia de los pares a menos de radio_km.
+
+        Igual que matriz_distancias_radio, pero sin reconstruir el KD-tree de las instalaciones.
+        """
+        forma = (len(np.asarray(lon)), len(self))
+        if self.arbol is None:
+            vacio = np.array([], dtype=np.int64)
+            return _a_csr(vacio, vacio, np.array([], dtype=float), forma)
+        filas, columnas, dists = pares_en_radio(lon, lat, self.lon, self.lat, radio_km, arbol_b=self.arbol)
+        return _a_csr(filas, columnas, dists, forma)
+
+
+def indice_instalaciones(df, columna):
+    """
+    Índice de los municipios de 'df' que tienen la instalación indicada en 'columna' (valor > 0).
+
+    Por ejemplo 'Tiene_Hospital', 'Transplantes' o 'tiene_centro'. Las etiquetas son 'Municipio'.
+    """
+    con_instalacion = df[columna].fillna(0).values > 0
+    return IndiceInstalaciones(df['Longitud'].values[con_instalacion], df['Latitud'].values[con_instalacion],
+                               etiquetas=df['Municipio'].values[con_instalacion])
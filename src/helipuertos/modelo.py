@@ -0,0 +1,151 @@
+"""
+Preparación del modelo: normalización, índice de prioridad, regiones lógicas y
+selección de candidatos viables.
+
+Son los mismos pasos que ejecutaba codigo_a_entregar.py de arriba a abajo,
+separados en funciones para poder repetirlos con otros parámetros (pesos,
+velocidad, tiempos) sin volver a leer el CSV.
+"""
+import numpy as np
+
+from helipuertos.nombres import clave_nombre, claves_nombres
+
+#Columnas del csv que usa el modelo (si faltan se crean a 0).
+COLS_NECESARIAS = ['DENSIDADMM', 'Accidentes_Por_Carretera', 'Dificultad_Acceso',
+                   '4G', 'tiene_centro', 'Transplantes', 'Población', 'Tiene_Hospital']
+#Columnas del registro que lee el modelo (las que no hacen falta para exportar la solución).
+COLUMNAS_MODELO = ['Municipio', 'Provincia', 'Longitud', 'Latitud'] + COLS_NECESARIAS
+#Columnas que se normalizan con minmax.
+COLS_A_NORMALIZAR = ['DENSIDADMM', 'Accidentes_Por_Carretera', 'Dificultad_Acceso',
+                     '4G', 'tiene_centro', 'Transplantes']
+
+#Pesos del índice de prioridad por defecto (ver codigo_a_entregar.py).
+PESOS_POR_DEFECTO = {
+    'W_ACCIDENTES_CTRA': 0.25,
+    'W_DIFICULTAD': 0.43,
+    'W_DENSIDAD': 0.15,
+    'W_TIENE_CENTRO': 0.10,
+    'W_TRANSPLANTES': 0.02,
+    'W_4G': 0.05,
+}
+
+#Parámetros de vuelo por defecto (ver codigo_a_entregar.py).
+PARAMETROS_VUELO_POR_DEFECTO = {
+    'VELOCIDAD_HELICOPTERO': 240,
+    'TIEMPO_COBERTURA_MAX': 30,
+    'TIEMPO_ACCION_IDEAL': 15,
+}
+
+#Municipios de la comarca de El Bierzo (tiene su propia base). Por clave canónica marcan en el
+#registro los mismos 37 municipios que la comparación exacta de antes (CANDÍN no está en él).
+MUNICIPIOS_BIERZO = [
+    "ARGANZA", "BALBOA", "BARJAS", "BEMBIBRE", "BENUZA", "BERLANGA DEL BIERZO",
+    "BORRENES", "CABAÑAS RARAS", "CACABELOS", "CAMPONARAYA", "CANDÍN",
+    "CARRACEDELO", "CARUCEDO", "CASTROPODAME", "CONGOSTO", "CORULLÓN",
+    "CUBILLOS DEL SIL", "FABERO", "FOLGOSO DE LA RIBERA", "IGÜEÑA",
+    "MOLINASECA", "NOCEDA DEL BIERZO", "OENCIA", "PALACIOS DEL SIL",
+    "PÁRAMO DEL SIL", "PERANZANES", "PONFERRADA", "PRIARANZA DEL BIERZO",
+    "PUENTE DE DOMINGO FLÓREZ", "SANCEDO", "SOBRADO", "TORAL DE LOS VADOS",
+    "TORENO", "TORRE DEL BIERZO", "TRABADELO", "VEGA DE ESPINAREDA",
+    "VEGA DE VALCARCE", "VILLAFRANCA DEL BIERZO"
+]
+
+
+def preparar_columnas(df):
+    """
+    Rellena a 0 las columnas del modelo que falten o tengan nulos y añade
+    la versión normalizada minmax ('<col>_Norm') de cada columna a normalizar.
+
+    Las columnas conservan su tipo (booleanos, float32... del registro tipado);
+    las normalizadas se calculan siempre en float64.
+    """
+    df = df.copy()
+    for col in COLS_NECESARIAS:
+        if col not in df.columns:
+            df[col] = 0
+        elif df[col].isna().any():
+            df[col] = df[col].fillna(False if df[col].dtype.kind == 'b' else 0)
+    #Aunque el csv ya viene normalizado se vuelve a normalizar por si acaso.
+    for col in COLS_A_NORMALIZAR:
+        col_norm = col + '_Norm'
+        valores = df[col].astype(float)
+        min_val = valores.min()
+        max_val = valores.max()
+        if max_val - min_val == 0:
+            df[col_norm] = 0
+        else:
+            df[col_norm] = (valores - min_val) / (max_val - min_val)
+    return df
+
+
+def calcular_score_prioridad(df, pesos=None):
+    """
+    Índice de prioridad multicriterio a partir de las columnas normalizadas.
+
+    'pesos' es un diccionario con las claves de PESOS_POR_DEFECTO. Centro de
+    salud y 4G se ponderan por su valor inverso: es más prioritario donde no hay.
+    """
+    pesos = {**PESOS_POR_DEFECTO, **(pesos or {})}
+    return (
+        df['Accidentes_Por_Carretera_Norm'] * pesos['W_ACCIDENTES_CTRA'] +
+        df['Dificultad_Acceso_Norm'] * pesos['W_DIFICULTAD'] +
+        df['DENSIDADMM_Norm'] * pesos['W_DENSIDAD'] +
+        (1 - df['tiene_centro_Norm']) * pesos['W_TIENE_CENTRO'] +
+        df['Transplantes_Norm'] * pesos['W_TRANSPLANTES'] +
+        (1 - df['4G_Norm']) * pesos['W_4G']
+    )
+
+
+def asignar_regiones(df, municipios_bierzo=MUNICIPIOS_BIERZO):
+    """
+    Añade 'Municipio_Norm' (clave canónica del nombre), 'Es_Bierzo' y
+    'Region_Logica' (EL BIERZO, LEÓN (RESTO) o la provincia) y devuelve el
+    DataFrame resultante.
+
+    Hay una base por región, así que El Bierzo se separa del resto de León.
+    """
+    df = df.copy()
+    #Municipio_Norm es la clave canónica de helipuertos/nombres.py, la misma con la que se
+    #compara la pertenencia a El Bierzo, así que tildes o artículos no la cambian.
+    df['Municipio_Norm'] = claves_nombres(df['Municipio']).to_numpy()
+    claves_bierzo = {clave_nombre(m) for m in municipios_bierzo}
+    df['Es_Bierzo'] = df['Municipio_Norm'].isin(claves_bierzo).to_numpy().astype(int)
+    provincia = df['Provincia'].values
+    df['Region_Logica'] = np.where(df['Es_Bierzo'].values == 1, 'EL BIERZO',
+                                   np.where(provincia == 'LEÓN', 'LEÓN (RESTO)', provincia))
+    return df
+
+
+def seleccionar_candidatos(df, hospital_cercano_ok, pob_min=300, pob_max=10000):
+    """
+    Candidatos viables: población entre pob_min y pob_max (exclusivo) y hospital cercano.
+
+    Si alguna región se queda sin candidatos se añade su municipio con mayor
+    Score_Prioridad. Devuelve (candidates, posiciones): el DataFrame de candidatos
+    con índice 0..M-1 y, para cada candidato, la fila de 'df' de la que procede.
+    """
+    hospital_cercano_ok = np.asarray(hospital_cercano_ok, dtype=bool)
+    condicion = df['Población'].between(pob_min, pob_max, inclusive='neither').values & hospital_cercano_ok
+    posiciones = list(np.flatnonzero(condicion))
+
+    regiones_cand = set(df['Region_Logica'].values[posiciones])
+    for reg in df['Region_Logica'].unique():
+        if reg not in regiones_cand:
+            en_region = np.flatnonzero(df['Region_Logica'].values == reg)
+            #Municipio de la región con mayor score (el primero si hay empate).
+            posiciones.append(int(en_region[np.argmax(df['Score_Prioridad'].values[en_region])]))
+
+    posiciones = np.asarray(posiciones, dtype=np.int64)
+    return df.iloc[posiciones].reset_index(drop=True), posiciones
+
+
+def solucion_inicial(candidates, regiones):
+    """Índice del candidato con mayor Score_Prioridad de cada región (en el orden de 'regiones')."""
+    region_cand = candidates['Region_Logica'].values
+    scores = candidates['Score_Prioridad'].values.astype(float)
+    solucion = []
+    for reg in regiones:
+        cands_reg = np.flatnonzero(region_cand == reg)
+        #El primero con el score máximo, igual que idxmax().
+        solucion.append(int(cands_reg[np.argmax(scores[cands_reg])]))
+    return solucion
@@ -0,0 +1,189 @@
+"""
+Búsqueda local multiarranque con soluciones iniciales aleatorizadas (GRASP).
+
+La heurística de codigo_a_entregar.py siempre arranca del candidato con mayor
+Score_Prioridad de cada región y por tanto llega siempre al mismo óptimo local.
+Aquí se generan muchas soluciones iniciales greedy-aleatorizadas y cada una se
+mejora con mejora_iterativa en un pool de procesos.
+
+La matriz de cobertura (CSC), los scores y las submatrices traspuestas de cada
+posición (CSR, calculadas una sola vez en el proceso padre) se copian a memoria
+compartida; cada proceso trabajador los reconstruye como vistas de solo lectura,
+así que ni las tareas reciben una copia serializada de la matriz ni los
+trabajadores guardan una copia propia de las traspuestas.
+
+Nota: con el método 'spawn' (Windows) el script que llama a multiarranque debe
+proteger su código con `if __name__ == '__main__':`, porque los procesos
+hijos vuelven a importar el módulo principal.
+"""
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+from scipy import sparse
+
+from helipuertos.optimizacion import mejora_iterativa, traspuestas_por_posicion
+
+#Estado de cada proceso trabajador (se rellena en _iniciar_trabajador).
+_ESTADO = {}
+
+
+def solucion_grasp(matriz_cobertura, scores_demanda, alternativas, alfa, rng, traspuestas=None):
+    """
+    Construye una solución inicial greedy-aleatorizada (una base por posición).
+
+    Las posiciones se recorren en orden aleatorio. En cada una se calcula la
+    ganancia de score de cada alternativa respecto a lo ya cubierto y se elige
+    al azar entre las que están a menos de 'alfa' del mejor valor (lista
+    restringida de candidatos). alfa=0 es el greedy puro y alfa=1 es aleatorio.
+    """
+    if traspuestas is None:
+        traspuestas = traspuestas_por_posicion(matriz_cobertura, alternativas)
+    n_demanda = matriz_cobertura.shape[0]
+    cubierto = np.zeros(n_demanda, dtype=bool)
+    solucion = [None] * len(alternativas)
+    for i in rng.permutation(len(alternativas)):
+        alts = alternativas[i]
+        peso_libre = np.where(cubierto, 0.0, scores_demanda)
+        ganancias = np.asarray(traspuestas[i] @ peso_libre).ravel()
+        umbral = ganancias.max() - alfa * (ganancias.max() - ganancias.min())
+        rcl = np.flatnonzero(ganancias >= umbral)
+        elegido = int(alts[rng.choice(rcl)])
+        solucion[i] = elegido
+        cubierto |= matriz_cobertura[:, [elegido]].toarray().ravel() > 0
+    return solucion
+
+
+def _a_memoria_compartida(arrays):
+    """Copia cada array a un bloque de memoria compartida y devuelve (bloques, descriptor)."""
+    bloques, descriptor = [], {}
+    for nombre, arr in arrays.items():
+        arr = np.ascontiguousarray(arr)
+        shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+        np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)[...] = arr
+        bloques.append(shm)
+        descriptor[nombre] = (shm.name, arr.shape, arr.dtype.str)
+    return bloques, descriptor
+
+
+def _traspuestas_a_arrays(traspuestas):
+    """
+    Concatena las traspuestas (CSR) de todas las posiciones en arrays planos.
+
+    'tras_lim_nnz' y 'tras_lim_indptr' marcan dónde empieza cada posición en
+    data/indices y en indptr (el indptr de cada posición empieza en 0).
+    """
+    traspuestas = [sparse.csr_matrix(t) for t in traspuestas]
+    return {
+        'tras_data': np.concatenate([t.data for t in traspuestas]),
+        'tras_indices': np.concatenate([t.indices for t in traspuestas]),
+        'tras_indptr': np.concatenate([t.indptr for t in traspuestas]),
+        'tras_lim_nnz': np.cumsum([0] + [t.nnz for t in traspuestas]),
+        'tras_lim_indptr': np.cumsum([0] + [len(t.indptr) for t in traspuestas]),
+    }
+
+
+def _traspuestas_desde_arrays(vistas, n_demanda):
+    """Reconstruye las traspuestas de cada posición como vistas de los arrays planos."""
+    lim_nnz, lim_indptr = vistas['tras_lim_nnz'], vistas['tras_lim_indptr']
+    traspuestas = []
+    for i in range(len(lim_nnz) - 1):
+        a, b = lim_nnz[i], lim_nnz[i + 1]
+        data, indices = vistas['tras_data'][a:b], vistas['tras_indices'][a:b]
+        indptr = vistas['tras_indptr'][lim_indptr[i]:lim_indptr[i + 1]]
+        traspuesta = sparse.csr_matrix((data, indices, indptr), shape=(len(indptr) - 1, n_demanda))
+        #El constructor copia los trozos pequeños de un array mayor; se vuelven a poner las vistas.
+        traspuesta.data, traspuesta.indices, traspuesta.indptr = data, indices, indptr
+        traspuestas.append(traspuesta)
+    return traspuestas
+
+
+def _iniciar_trabajador(descriptor, forma, alternativas):
+    """Reconstruye en el proceso trabajador la matriz, los scores y las traspuestas desde memoria compartida."""
+    vistas, bloques = {}, []
+    for nombre, (shm_nombre, shape, dtype) in descriptor.items():
+        #Los trabajadores solo se conectan; el proceso padre libera los bloques.
+        shm = shared_memory.SharedMemory(name=shm_nombre)
+        bloques.append(shm)
+        vistas[nombre] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+    matriz = sparse.csc_matrix((vistas['data'], vistas['indices'], vistas['indptr']), shape=forma)
+    _ESTADO.update(
+        bloques=bloques,
+        matriz=matriz,
+        scores=vistas['scores'],
+        alternativas=alternativas,
+        traspuestas=_traspuestas_desde_arrays(vistas, forma[0]),
+    )
+
+
+def _ejecutar_arranque(semilla, alfa):
+    """Un arranque: solución GRASP + mejora iterativa. Devuelve (solucion, score)."""
+    rng = np.random.default_rng(semilla)
+    inicial = solucion_grasp(_ESTADO['matriz'], _ESTADO['scores'], _ESTADO['alternativas'],
+                             alfa, rng, traspuestas=_ESTADO['traspuestas'])
+    return mejora_iterativa(_ESTADO['matriz'], _ESTADO['scores'], inicial,
+                            _ESTADO['alternativas'], traspuestas=_ESTADO['traspuestas'])
+
+
+def multiarranque(matriz_cobertura, scores_demanda, alternativas, n_arranques=100,
+                  alfa=0.3, n_procesos=None, semilla=0):
+    """
+    Ejecuta 'n_arranques' búsquedas locales desde soluciones GRASP distintas.
+
+    n_procesos: procesos del pool (None = todos los núcleos; 1 = sin pool).
+    semilla: semilla base; el arranque k usa la semilla (semilla, k), por lo que
+        el resultado no depende del número de procesos.
+    Devuelve un diccionario con la mejor solución, su score, el score de cada
+    óptimo local, el número de óptimos locales distintos y los arranques por segundo.
+    """
+    matriz = sparse.csc_matrix(matriz_cobertura)
+    scores_demanda = np.asarray(scores_demanda, dtype=float)
+    alternativas = [np.asarray(alts, dtype=np.int64) for alts in alternativas]
+    semillas = [np.random.SeedSequence([semilla, k]) for k in range(n_arranques)]
+    if n_procesos is None:
+        n_procesos = os.cpu_count() or 1
+
+    inicio = time.perf_counter()
+    traspuestas = traspuestas_por_posicion(matriz, alternativas)
+    if n_procesos == 1:
+        #Mismo código que los trabajadores, sin pool ni memoria compartida.
+        _ESTADO.update(matriz=matriz, scores=scores_demanda, alternativas=alternativas,
+                       traspuestas=traspuestas)
+        try:
+            resultados = [_ejecutar_arranque(s, alfa) for s in semillas]
+        finally:
+            _ESTADO.clear()
+    else:
+        bloques, descriptor = _a_memoria_compartida({
+            'data': matriz.data, 'indices': matriz.indices,
+            'indptr': matriz.indptr, 'scores': scores_demanda,
+            **_traspuestas_a_arrays(traspuestas),
+        })
+        del traspuestas
+        try:
+            with ProcessPoolExecutor(max_workers=n_procesos, initializer=_iniciar_trabajador,
+                                     initargs=(descriptor, matriz.shape, alternativas)) as pool:
+                #Agrupamos arranques por tarea para que el coste de envío sea despreciable.
+                tam_lote = max(1, n_arranques // (4 * n_procesos))
+                resultados = list(pool.map(_ejecutar_arranque, semillas,
+                                           [alfa] * n_arranques, chunksize=tam_lote))
+        finally:
+            for shm in bloques:
+                shm.close()
+                shm.unlink()
+    tiempo = time.perf_counter() - inicio
+
+    scores_optimos = np.array([score for _, score in resultados])
+    mejor = int(np.argmax(scores_optimos))
+    distintas = {tuple(sorted(sol)) for sol, _ in resultados}
+    return {
+        'mejor_solucion': list(resultados[mejor][0]),
+        'mejor_score': scores_optimos[mejor],
+        'scores_optimos_locales': scores_optimos,
+        'soluciones': [sol for sol, _ in resultados],
+        'n_optimos_distintos': len(distintas),
+        'tiempo_s': tiempo,
+        'arranques_por_segundo': n_arranques / tiempo if tiempo > 0 else float('inf'),
+    }
@@ -0,0 +1,177 @@
+"""
+Cruce de nombres de municipio entre tablas con una única normalización.
+
+clave_nombre define la forma canónica de un nombre: sin tildes ni diéresis, en
+mayúsculas, con el artículo pospuesto delante ("ADRADA (LA)" y "Adrada, La" ->
+"LA ADRADA") y con la puntuación y los guiones como espacios. Todos los scripts
+usan la misma clave, así que un cruce no falla porque cada uno normalice a su
+manera.
+
+IndiceNombres se construye una vez con el registro de municipios (en
+preparar_datos.py es la etapa 'nombres', guardada en la caché de etapas) y traduce
+nombres (y, si se dan, provincias) a Cod_Municipio y Cod_Provincia:
+- camino exacto: las claves se calculan una vez por valor distinto y se buscan
+  todas a la vez en un índice de pandas;
+- camino difuso, solo para lo que no cruza: similitud de trigramas (Dice) con
+  un índice invertido trigrama -> municipios, dentro de la misma provincia.
+cruzar devuelve, para cada nombre, el municipio y cómo se ha cruzado, y
+resumen_cruce imprime los que se han quedado sin cruzar.
+"""
+import re
+import unicodedata
+from collections import Counter, defaultdict
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+#Similitud mínima de trigramas para aceptar un cruce difuso.
+SIMILITUD_MINIMA = 0.8
+_ARTICULO_POSPUESTO = re.compile(r"^(.*?)\s*[,(]\s*(EL|LA|LOS|LAS|LO)\s*\)?$")
+_PUNTUACION = re.compile(r"[,.;:()'\"/\-]")
+
+
+@lru_cache(maxsize=None)
+def clave_nombre(texto):
+    """Clave canónica de un nombre ("" si no es texto)."""
+    if not isinstance(texto, str):
+        return ""
+    texto = unicodedata.normalize('NFD', texto)
+    texto = ''.join(c for c in texto if not unicodedata.combining(c)).upper().strip()
+    texto = _ARTICULO_POSPUESTO.sub(r"\2 \1", texto)
+    return " ".join(_PUNTUACION.sub(" ", texto).split())
+
+
+def claves_nombres(serie):
+    """clave_nombre de cada elemento, calculada una sola vez por valor distinto."""
+    serie = pd.Series(serie)
+    valores = serie.dropna().unique()
+    return serie.map(dict(zip(valores, map(clave_nombre, valores)))).fillna("").astype(object)
+
+
+def _trigramas(clave):
+    texto = f"  {clave} "
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+class IndiceNombres:
+    """
+    Índice clave canónica -> municipio del registro.
+
+    municipios, provincias, cod_municipio, cod_provincia: columnas del registro
+    (una fila por municipio).
+    """
+
+    def __init__(self, municipios, provincias, cod_municipio, cod_provincia):
+        self.claves = claves_nombres(municipios).to_numpy()
+        self.claves_provincia = claves_nombres(provincias).to_numpy()
+        self.cod_municipio = np.asarray(cod_municipio)
+        self.cod_provincia = np.asarray(cod_provincia)
+        self._con_provincia = pd.MultiIndex.from_arrays([self.claves_provincia, self.claves])
+        self._sin_provincia = pd.Index(self.claves)
+        self._trigramas = None
+
+    @classmethod
+    def desde_registro(cls, df):
+        """Índice de un DataFrame con Municipio, Provincia, Cod_Municipio y Cod_Provincia."""
+        return cls(df['Municipio'], df['Provincia'], df['Cod_Municipio'], df['Cod_Provincia'])
+
+    def __len__(self):
+        return len(self.claves)
+
+    def _posiciones_exactas(self, claves, claves_provincia):
+        """Fila del registro de cada clave; -1 si no está y -2 si es ambigua."""
+        if claves_provincia is None:
+            indice, buscadas = self._sin_provincia, pd.Index(claves)
+        else:
+            indice, buscadas = self._con_provincia, pd.MultiIndex.from_arrays([claves_provincia, claves])
+        #Una clave repetida en el registro (mismo nombre en dos provincias) es ambigua.
+        repetida = indice.duplicated(keep=False)
+        filas_unicas = np.flatnonzero(~repetida)
+        encontrada = indice[~repetida].get_indexer(buscadas)
+        posiciones = np.full(len(buscadas), -1, dtype=np.int64)
+        posiciones[encontrada >= 0] = filas_unicas[encontrada[encontrada >= 0]]
+        if repetida.any():
+            posiciones[buscadas.isin(indice[repetida])] = -2
+        return posiciones
+
+    def _indice_trigramas(self):
+        if self._trigramas is None:
+            self._trigramas = defaultdict(list)
+            for fila, clave in enumerate(self.claves):
+                #En orden, para que el índice (y su pickle) no dependa del hash de las cadenas.
+                for trigrama in sorted(_trigramas(clave)):
+                    self._trigramas[trigrama].append(fila)
+        return self._trigramas
+
+    def preparar_difuso(self):
+        """Construye ya el índice de trigramas (antes de guardar el índice o enviarlo a otros procesos)."""
+        self._indice_trigramas()
+        return self
+
+    def _mejor_difusa(self, clave, clave_provincia, similitud_minima):
+        """(fila, similitud) del municipio más parecido, o (-1, mejor similitud) si no hay uno claro."""
+        trigramas = _trigramas(clave)
+        coincidencias = Counter()
+        for trigrama in trigramas:
+            coincidencias.update(self._indice_trigramas().get(trigrama, ()))
+        similitudes = []
+        for fila, comunes in coincidencias.items():
+            if clave_provincia is not None and self.claves_provincia[fila] != clave_provincia:
+                continue
+            similitudes.append((2 * comunes / (len(trigramas) + len(_trigramas(self.claves[fila]))), fila))
+        if not similitudes:
+            return -1, 0.0
+        similitudes.sort(reverse=True)
+        mejor, fila = similitudes[0]
+        #Se descarta si no llega al mínimo o si hay otro municipio igual de parecido.
+        if mejor < similitud_minima or (len(similitudes) > 1 and similitudes[1][0] == mejor):
+            return -1, mejor
+        return fila, mejor
+
+    def cruzar(self, nombres, provincias=None, difuso=True, similitud_minima=SIMILITUD_MINIMA):
+        """
+        Municipio del registro de cada nombre.
+
+        Devuelve un DataFrame alineado con 'nombres' con Cod_Municipio y Cod_Provincia
+        (nulos si no cruza), 'Fila' (posición en el registro o -1), 'Cruce'
+        ('exacto', 'difuso', 'ambiguo' o 'sin_cruce') y 'Similitud' (1 en los exactos).
+        """
+        claves = claves_nombres(nombres).to_numpy()
+        claves_provincia = None if provincias is None else claves_nombres(provincias).to_numpy()
+        filas = self._posiciones_exactas(claves, claves_provincia)
+        cruce = np.where(filas >= 0, 'exacto', np.where(filas == -2, 'ambiguo', 'sin_cruce')).astype(object)
+        similitud = np.where(filas >= 0, 1.0, 0.0)
+        if difuso:
+            #Los nombres repetidos se buscan una sola vez.
+            pendientes = {}
+            for i in np.flatnonzero(filas == -1):
+                if not claves[i]:
+                    continue
+                prov = None if claves_provincia is None else claves_provincia[i]
+                if (claves[i], prov) not in pendientes:
+                    pendientes[(claves[i], prov)] = self._mejor_difusa(claves[i], prov, similitud_minima)
+                filas[i], similitud[i] = pendientes[(claves[i], prov)]
+                if filas[i] >= 0:
+                    cruce[i] = 'difuso'
+        filas = np.where(filas >= 0, filas, -1)
+        return pd.DataFrame({
+            'Cod_Municipio': pd.array(self.cod_municipio, dtype='Int64').take(filas, allow_fill=True),
+            'Cod_Provincia': pd.array(self.cod_provincia, dtype='Int64').take(filas, allow_fill=True),
+            'Fila': filas,
+            'Cruce': cruce,
+            'Similitud': similitud,
+        }, index=pd.Series(nombres).index)
+
+
+def resumen_cruce(cruce, nombres, origen, max_nombres=20):
+    """Imprime cuántos nombres de 'origen' han cruzado y cuáles no (o son ambiguos o difusos)."""
+    nombres = pd.Series(nombres, index=cruce.index)
+    tipos = cruce['Cruce'].value_counts()
+    print(f"Cruce de nombres ({origen}): " +
+          ", ".join(f"{tipo} {tipos.get(tipo, 0)}" for tipo in ('exacto', 'difuso', 'ambiguo', 'sin_cruce')))
+    for tipo in ('difuso', 'ambiguo', 'sin_cruce'):
+        lista = nombres[cruce['Cruce'] == tipo].astype(str).unique()
+        if len(lista):
+            mas = f" (y {len(lista) - max_nombres} más)" if len(lista) > max_nombres else ""
+            print(f"  {tipo}: {', '.join(lista[:max_nombres])}{mas}")
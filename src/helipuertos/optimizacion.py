@@ -0,0 +1,132 @@
+"""
+Búsqueda local por intercambios (swap) para el MCLP con una base por región.
+
+En lugar de recalcular la cobertura completa para cada intercambio candidato,
+se mantiene un vector con el número de bases que cubren cada punto de demanda
+y el score cubierto acumulado. La ganancia de un intercambio sólo depende de
+los puntos que cubren la base saliente y la entrante.
+"""
+import numpy as np
+from scipy import sparse
+
+#Margen para considerar que un intercambio mejora el score y no es ruido de redondeo.
+TOLERANCIA_MEJORA = 1e-9
+
+
+def _conteo_cobertura(matriz_cobertura, indices_solucion):
+    """Número de bases de 'indices_solucion' que cubren cada punto de demanda."""
+    sub = matriz_cobertura[:, list(indices_solucion)]
+    return np.asarray(sub.sum(axis=1)).ravel().astype(np.int64)
+
+
+def _columna(matriz_cobertura, j):
+    """Columna j de la matriz de cobertura como vector denso."""
+    if sparse.issparse(matriz_cobertura):
+        return matriz_cobertura[:, [j]].toarray().ravel()
+    return np.asarray(matriz_cobertura[:, j]).ravel()
+
+
+def score_cubierto(matriz_cobertura, scores_demanda, indices_solucion):
+    """Calcula el score total sumando las prioridades de los puntos de demanda cubiertos."""
+    #Verifica si cada pueblo es cubierto por alguna base elegida.
+    cubierto_bool = _conteo_cobertura(matriz_cobertura, indices_solucion) > 0
+    #Suma los puntos de prioridad solo de los pueblos cubiertos.
+    return np.sum(scores_demanda[cubierto_bool])
+
+
+def alternativas_por_region(regiones_candidatos):
+    """
+    Agrupa los índices de los candidatos por región.
+
+    Devuelve un diccionario {region: array de índices de candidatos}.
+    """
+    regiones_candidatos = np.asarray(regiones_candidatos)
+    return {reg: np.flatnonzero(regiones_candidatos == reg)
+            for reg in dict.fromkeys(regiones_candidatos)}
+
+
+def traspuestas_por_posicion(matriz_cobertura, alternativas):
+    """
+    Submatriz traspuesta (alternativas x demanda) de cada posición.
+
+    Se puede calcular una vez y reutilizar en varias llamadas a mejora_iterativa
+    con las mismas alternativas (por ejemplo, en el multiarranque).
+    """
+    if sparse.issparse(matriz_cobertura):
+        #CSC para extraer columnas (candidatos) de forma eficiente.
+        matriz_cobertura = sparse.csc_matrix(matriz_cobertura)
+    return [matriz_cobertura[:, alts].T for alts in alternativas]
+
+
+def mejora_iterativa(matriz_cobertura, scores_demanda, solucion_inicial, alternativas,
+                     traspuestas=None, estadisticas=None):
+    """
+    Mejora iterativa por intercambios con estado de cobertura incremental.
+
+    matriz_cobertura: matriz demanda x candidatos (1 si el candidato cubre el punto),
+        densa o dispersa (scipy.sparse).
+    scores_demanda: prioridad de cada punto de demanda.
+    solucion_inicial: índice de candidato elegido en cada posición (una por región).
+    alternativas: para cada posición, array con los candidatos que pueden ocuparla.
+    traspuestas: resultado de traspuestas_por_posicion; se calcula si no se pasa.
+    estadisticas: lista opcional a la que se añade, por cada pasada sobre las
+        posiciones, un diccionario con 'pasada', 'intercambios_evaluados',
+        'mejoras' y 'score' (el score al acabar la pasada), precedidos de la
+        pasada 0 con el score inicial. No cambia el resultado.
+
+    Recorre las posiciones y sustituye cada base por la alternativa de su región
+    que más aumenta el score cubierto, hasta que ninguna posición mejora.
+    Devuelve (solucion_indices, score_actual).
+    """
+    solucion_indices = list(solucion_inicial)
+    scores_demanda = np.asarray(scores_demanda, dtype=float)
+    if sparse.issparse(matriz_cobertura):
+        #CSC para extraer columnas (candidatos) de forma eficiente.
+        matriz_cobertura = sparse.csc_matrix(matriz_cobertura)
+    #Submatriz traspuesta de cada región, calculada una sola vez.
+    if traspuestas is None:
+        traspuestas = traspuestas_por_posicion(matriz_cobertura, alternativas)
+
+    #Número de bases de la solución que cubren cada punto de demanda.
+    conteo = _conteo_cobertura(matriz_cobertura, solucion_indices)
+    #Score cubierto acumulado de la solución actual.
+    score_actual = scores_demanda[conteo > 0].sum()
+    if estadisticas is not None:
+        estadisticas.append({'pasada': 0, 'intercambios_evaluados': 0, 'mejoras': 0,
+                             'score': float(score_actual)})
+    n_alternativas = sum(len(alts) for alts in alternativas)
+
+    mejora = True
+    while mejora:
+        mejora = False
+        mejoras_pasada = 0
+        for i, alts in enumerate(alternativas):
+            idx_actual = solucion_indices[i]
+            col_actual = _columna(matriz_cobertura, idx_actual)
+
+            #Quitamos la base actual: los puntos que quedan a 0 son los que
+            #dependen solo de ella y los que ninguna otra base cubre.
+            conteo_sin_actual = conteo - col_actual
+            peso_descubierto = np.where(conteo_sin_actual == 0, scores_demanda, 0.0)
+
+            #Ganancia de cada alternativa = score de los descubiertos que cubre.
+            #La ganancia de la base actual es lo que se pierde al quitarla,
+            #así que la diferencia da el cambio neto del intercambio.
+            ganancias = np.asarray(traspuestas[i] @ peso_descubierto).ravel()
+            ganancia_actual = peso_descubierto[col_actual > 0].sum()
+            deltas = ganancias - ganancia_actual
+
+            mejor_pos = int(np.argmax(deltas))
+            if deltas[mejor_pos] > TOLERANCIA_MEJORA and alts[mejor_pos] != idx_actual:
+                idx_nuevo = int(alts[mejor_pos])
+                conteo = conteo_sin_actual + _columna(matriz_cobertura, idx_nuevo)
+                score_actual += deltas[mejor_pos]
+                solucion_indices[i] = idx_nuevo
+                mejora = True
+                mejoras_pasada += 1
+        if estadisticas is not None:
+            estadisticas.append({'pasada': estadisticas[-1]['pasada'] + 1,
+                                 'intercambios_evaluados': n_alternativas,
+                                 'mejoras': mejoras_pasada, 'score': float(score_actual)})
+
+    return solucion_indices, score_actual
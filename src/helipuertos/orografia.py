@@ -0,0 +1,216 @@
+"""
+Dificultad orográfica a partir de zonas poligonales y de un ráster de altitudes.
+
+Las zonas montañosas se leen de un GeoJSON (Polygon o MultiPolygon, en grados
+lon/lat) cuyas 'features' llevan la propiedad 'dificultad' y, opcionalmente,
+'nombre'. Como en la tabla de reglas de procesar_transplates_hospitales_dificil_acceso.py,
+el orden de las features es la prioridad: cada punto toma la dificultad de la
+primera zona que lo contiene.
+
+Los puntos se ordenan una vez por longitud, así que los candidatos de cada
+polígono (los que caen en su caja) salen con dos búsquedas binarias; solo para
+ellos se hace el test punto-en-polígono (paridad de cruces de un rayo),
+vectorizado sobre puntos y aristas por bloques de memoria acotada. Cada punto
+se comprueba solo hasta encontrar su primera zona.
+
+El ráster de altitud es opcional y se lee en formato ASCII grid de ESRI (.asc,
+texto plano, sin dependencias); se muestrea por la celda que contiene cada punto.
+"""
+import json
+
+import numpy as np
+
+#Dificultad de un punto fuera de todas las zonas (Meseta o Llano).
+DIFICULTAD_LLANO = 0.1
+#Tramos de altitud (metros, dificultad): se aplica el del umbral más alto alcanzado.
+TRAMOS_ALTITUD = [(1000, 0.8), (1400, 0.9), (1800, 1.0)]
+#Máximo de pares punto-arista por bloque del test punto-en-polígono.
+MAX_PARES_BLOQUE = 2_000_000
+
+
+def _anillos_a_aristas(anillos):
+    """Aristas (x1, y1, x2, y2) de todos los anillos (exterior y huecos) de un polígono."""
+    partes = []
+    for anillo in anillos:
+        xy = np.asarray(anillo, dtype=float)[:, :2]
+        if len(xy) < 3:
+            continue
+        #Se cierra el anillo si el GeoJSON no repite el primer vértice.
+        if not np.array_equal(xy[0], xy[-1]):
+            xy = np.vstack([xy, xy[:1]])
+        partes.append(np.hstack([xy[:-1], xy[1:]]))
+    return np.vstack(partes) if partes else np.empty((0, 4))
+
+
+def dentro_de_poligono(lon, lat, aristas):
+    """
+    Máscara de los puntos dentro del polígono dado por sus aristas (regla par-impar).
+
+    Con la regla par-impar los huecos (anillos interiores) quedan fuera sin
+    tratarlos aparte. Los puntos justo sobre el borde pueden caer a cualquier lado.
+    """
+    lon = np.asarray(lon, dtype=float)
+    lat = np.asarray(lat, dtype=float)
+    cruces = np.zeros(len(lon), dtype=np.int64)
+    if len(lon) == 0 or len(aristas) == 0:
+        return cruces.astype(bool)
+    bloque = max(1, MAX_PARES_BLOQUE // len(lon))
+    for inicio in range(0, len(aristas), bloque):
+        x1, y1, x2, y2 = aristas[inicio:inicio + bloque].T
+        #Aristas que cruzan la horizontal del punto y quedan a su derecha.
+        cruza = (y1 > lat[:, None]) != (y2 > lat[:, None])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            x_corte = x1 + (lat[:, None] - y1) * (x2 - x1) / (y2 - y1)
+        cruces += (cruza & (lon[:, None] < x_corte)).sum(axis=1)
+    return cruces % 2 == 1
+
+
+class ZonasOrograficas:
+    """
+    Zonas montañosas con su dificultad, en orden de prioridad.
+
+    zonas: lista de (nombre, poligonos, dificultad), donde cada polígono es una
+    lista de anillos [[lon, lat], ...] (el primero exterior, el resto huecos).
+    """
+
+    def __init__(self, zonas):
+        self.nombres = [nombre for nombre, _, _ in zonas]
+        self.dificultades = np.array([dificultad for _, _, dificultad in zonas], dtype=float)
+        #Un registro por polígono: zona a la que pertenece, caja y aristas.
+        self._zona, self._cajas, self._aristas = [], [], []
+        for i, (_, poligonos, _) in enumerate(zonas):
+            for anillos in poligonos:
+                aristas = _anillos_a_aristas(anillos)
+                if len(aristas) == 0:
+                    continue
+                xs, ys = aristas[:, [0, 2]], aristas[:, [1, 3]]
+                self._zona.append(i)
+                self._cajas.append((xs.min(), xs.max(), ys.min(), ys.max()))
+                self._aristas.append(aristas)
+
+    def __len__(self):
+        return len(self.nombres)
+
+    @classmethod
+    def desde_geojson(cls, ruta, propiedad='dificultad'):
+        """Lee las zonas de un GeoJSON (FeatureCollection de Polygon/MultiPolygon)."""
+        with open(ruta, encoding='utf-8') as f:
+            datos = json.load(f)
+        zonas = []
+        for i, feature in enumerate(datos['features']):
+            geometria, propiedades = feature['geometry'], feature.get('properties') or {}
+            if geometria['type'] == 'Polygon':
+                poligonos = [geometria['coordinates']]
+            elif geometria['type'] == 'MultiPolygon':
+                poligonos = geometria['coordinates']
+            else:
+                raise ValueError(f"Geometría no soportada en la zona {i}: {geometria['type']}")
+            if propiedad not in propiedades:
+                raise ValueError(f"La zona {i} no tiene la propiedad '{propiedad}'")
+            nombre = propiedades.get('nombre', propiedades.get('name', f'zona_{i}'))
+            zonas.append((nombre, poligonos, float(propiedades[propiedad])))
+        return cls(zonas)
+
+    def zona(self, lon, lat):
+        """Índice de la primera zona que contiene cada punto (-1 si ninguna)."""
+        lon = np.asarray(lon, dtype=float)
+        lat = np.asarray(lat, dtype=float)
+        resultado = np.full(len(lon), -1, dtype=np.int64)
+        #Índice espacial de los puntos: orden por longitud (los NaN quedan al final y no se consultan).
+        orden = np.argsort(lon, kind='stable')
+        lon_ordenada = lon[orden]
+        for i, (x_min, x_max, y_min, y_max), aristas in zip(self._zona, self._cajas, self._aristas):
+            desde = np.searchsorted(lon_ordenada, x_min, side='left')
+            hasta = np.searchsorted(lon_ordenada, x_max, side='right')
+            candidatos = orden[desde:hasta]
+            candidatos = candidatos[(resultado[candidatos] < 0) & (lat[candidatos] >= y_min) &
+                                    (lat[candidatos] <= y_max)]
+            if len(candidatos):
+                dentro = dentro_de_poligono(lon[candidatos], lat[candidatos], aristas)
+                resultado[candidatos[dentro]] = i
+        return resultado
+
+    def dificultad(self, lon, lat, valor_defecto=DIFICULTAD_LLANO):
+        """Dificultad de la primera zona que contiene cada punto ('valor_defecto' si ninguna)."""
+        #zona == -1 toma el último valor, que es 'valor_defecto'.
+        return np.append(self.dificultades, valor_defecto)[self.zona(lon, lat)]
+
+
+class RasterAltitud:
+    """
+    Rejilla regular de altitudes en metros.
+
+    valores: matriz (filas, columnas) con la fila 0 al norte; x0, y0: esquina
+    inferior izquierda (lon, lat) de la rejilla; tam_celda en grados.
+    """
+
+    def __init__(self, valores, x0, y0, tam_celda, sin_dato=None):
+        self.valores = np.asarray(valores, dtype=float)
+        if sin_dato is not None:
+            self.valores = np.where(self.valores == sin_dato, np.nan, self.valores)
+        self.x0, self.y0, self.tam_celda = float(x0), float(y0), float(tam_celda)
+
+    @classmethod
+    def desde_ascii(cls, ruta):
+        """Lee un ASCII grid de ESRI (cabecera ncols, nrows, xllcorner/xllcenter, ..., y la rejilla)."""
+        cabecera = {}
+        with open(ruta, encoding='utf-8') as f:
+            for linea in f:
+                partes = linea.split()
+                if not partes or not partes[0][0].isalpha():
+                    break
+                cabecera[partes[0].lower()] = float(partes[1])
+        valores = np.loadtxt(ruta, skiprows=len(cabecera), ndmin=2)
+        tam = cabecera['cellsize']
+        #Con xllcenter/yllcenter la referencia es el centro de la celda inferior izquierda.
+        x0 = cabecera['xllcorner'] if 'xllcorner' in cabecera else cabecera['xllcenter'] - tam / 2
+        y0 = cabecera['yllcorner'] if 'yllcorner' in cabecera else cabecera['yllcenter'] - tam / 2
+        if valores.shape != (int(cabecera['nrows']), int(cabecera['ncols'])):
+            raise ValueError(f"La rejilla de {ruta} no tiene el tamaño de la cabecera")
+        return cls(valores, x0, y0, tam, sin_dato=cabecera.get('nodata_value'))
+
+    def muestrear(self, lon, lat):
+        """Altitud de la celda que contiene cada punto (NaN fuera de la rejilla o sin dato)."""
+        lon = np.asarray(lon, dtype=float)
+        lat = np.asarray(lat, dtype=float)
+        filas_total, columnas_total = self.valores.shape
+        with np.errstate(invalid='ignore'):
+            columna = np.floor((lon - self.x0) / self.tam_celda)
+            fila = filas_total - 1 - np.floor((lat - self.y0) / self.tam_celda)
+            dentro = (columna >= 0) & (columna < columnas_total) & (fila >= 0) & (fila < filas_total)
+        altitud = np.full(len(lon), np.nan)
+        altitud[dentro] = self.valores[fila[dentro].astype(np.int64), columna[dentro].astype(np.int64)]
+        return altitud
+
+
+def dificultad_por_altitud(altitud, tramos=TRAMOS_ALTITUD, valor_defecto=DIFICULTAD_LLANO):
+    """Dificultad del tramo más alto cuya altitud mínima se alcanza ('valor_defecto' por debajo o sin dato)."""
+    tramos = sorted(tramos)
+    umbrales = np.array([umbral for umbral, _ in tramos], dtype=float)
+    valores = np.array([valor_defecto] + [dificultad for _, dificultad in tramos], dtype=float)
+    altitud = np.asarray(altitud, dtype=float)
+    #Número de umbrales alcanzados = posición en 'valores' (0 = por debajo de todos).
+    tramo = np.searchsorted(umbrales, altitud, side='right')
+    tramo[np.isnan(altitud)] = 0
+    return valores[tramo]
+
+
+def dificultad_orografica(lon, lat, zonas=None, raster=None, tramos=TRAMOS_ALTITUD,
+                          valor_defecto=DIFICULTAD_LLANO):
+    """
+    Dificultad orográfica de cada punto.
+
+    zonas: ZonasOrograficas (o ruta a un GeoJSON); raster: RasterAltitud (o ruta
+    a un .asc). Si se dan los dos se toma la mayor de las dos dificultades.
+    """
+    if isinstance(zonas, str):
+        zonas = ZonasOrograficas.desde_geojson(zonas)
+    if isinstance(raster, str):
+        raster = RasterAltitud.desde_ascii(raster)
+    dificultad = np.full(len(np.asarray(lon)), valor_defecto, dtype=float)
+    if zonas is not None:
+        dificultad = zonas.dificultad(lon, lat, valor_defecto)
+    if raster is not None:
+        dificultad = np.maximum(dificultad, dificultad_por_altitud(raster.muestrear(lon, lat), tramos,
+                                                                   valor_defecto))
+    return dificultad
@@ -0,0 +1,148 @@
+"""
+Medición por etapas de una ejecución del modelo: tiempo, CPU y memoria.
+
+Un Perfilador se pasa a las funciones del pipeline y cada una marca sus
+etapas con 'with perfilador.etapa(nombre):'. De cada etapa se guarda el tiempo
+real, el tiempo de CPU del proceso y, si se activa la memoria, el pico de
+memoria reservada durante la etapa (tracemalloc; numpy también registra ahí
+sus arrays). Las etapas se pueden anidar: el pico de una etapa incluye el de
+las que contiene.
+
+Además se pueden añadir series (por ejemplo, las estadísticas de cada pasada
+de la búsqueda local) con 'serie'. El resultado se guarda como JSON
+(guardar_json) o como traza de Chrome (guardar_traza_chrome), que se abre en
+chrome://tracing o en https://ui.perfetto.dev.
+
+Sin perfilador se usa SIN_PERFILADO, cuyas etapas no hacen nada, así que el
+código instrumentado no cuesta nada cuando no se mide.
+"""
+import contextlib
+import json
+import os
+import time
+import tracemalloc
+
+
+class Perfilador:
+    """
+    Registro de etapas y series de una ejecución.
+
+    memoria: mide el pico de memoria de cada etapa con tracemalloc (más lento,
+        sobre todo en código con muchos objetos de Python).
+    """
+
+    def __init__(self, memoria=True):
+        self.memoria = memoria
+        self.etapas = []
+        self.series = {}
+        self._pila = []
+        self._inicio = time.perf_counter()
+        self._arrancado_tracemalloc = False
+        if memoria and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._arrancado_tracemalloc = True
+
+    def _pico_actual(self):
+        return tracemalloc.get_traced_memory()[1] if self.memoria else 0
+
+    @contextlib.contextmanager
+    def etapa(self, nombre, **datos):
+        """Mide el bloque 'with' como una etapa; 'datos' se guardan con ella."""
+        if self._pila:
+            #El pico de la etapa que la contiene se guarda antes de reiniciarlo.
+            padre = self._pila[-1]
+            padre['pico'] = max(padre['pico'], self._pico_actual())
+        if self.memoria:
+            tracemalloc.reset_peak()
+        registro = {
+            'nombre': nombre,
+            'nivel': len(self._pila),
+            'inicio_s': time.perf_counter() - self._inicio,
+            'memoria_inicial': tracemalloc.get_traced_memory()[0] if self.memoria else 0,
+            'pico': 0,
+            **({'datos': datos} if datos else {}),
+        }
+        self._pila.append(registro)
+        cpu = time.process_time()
+        inicio = time.perf_counter()
+        try:
+            yield registro
+        finally:
+            registro['duracion_s'] = time.perf_counter() - inicio
+            registro['cpu_s'] = time.process_time() - cpu
+            self._pila.pop()
+            if self.memoria:
+                actual, pico = tracemalloc.get_traced_memory()
+                pico = max(registro.pop('pico'), pico)
+                registro['pico_memoria_mb'] = (pico - registro['memoria_inicial']) / 2**20
+                registro['memoria_neta_mb'] = (actual - registro.pop('memoria_inicial')) / 2**20
+                if self._pila:
+                    self._pila[-1]['pico'] = max(self._pila[-1]['pico'], pico)
+            else:
+                del registro['pico'], registro['memoria_inicial']
+            self.etapas.append(registro)
+
+    def serie(self, nombre, valores):
+        """Guarda una serie de valores (lista de diccionarios) con el instante actual."""
+        self.series[nombre] = {'instante_s': time.perf_counter() - self._inicio, 'valores': list(valores)}
+
+    def detener(self):
+        """Detiene tracemalloc si lo arrancó este perfilador."""
+        if self._arrancado_tracemalloc:
+            tracemalloc.stop()
+            self._arrancado_tracemalloc = False
+
+    def resumen(self):
+        """Etapas en orden de inicio y series, como un diccionario serializable."""
+        return {'etapas': sorted(self.etapas, key=lambda e: e['inicio_s']), 'series': self.series}
+
+    def guardar_json(self, ruta):
+        with open(ruta, 'w', encoding='utf-8') as f:
+            json.dump(self.resumen(), f, indent=2, ensure_ascii=False, default=float)
+        return ruta
+
+    def guardar_traza_chrome(self, ruta):
+        """
+        Guarda las etapas como eventos de duración del formato Trace Event de Chrome.
+
+        La memoria y las series numéricas van como contadores, así que se ven como
+        gráficas debajo de las etapas.
+        """
+        pid, tid = os.getpid(), 0
+        eventos = []
+        for e in self.etapas:
+            args = {k: v for k, v in e.items() if k not in ('nombre', 'inicio_s', 'duracion_s', 'nivel')}
+            eventos.append({'name': e['nombre'], 'cat': 'etapa', 'ph': 'X', 'pid': pid, 'tid': tid,
+                            'ts': e['inicio_s'] * 1e6, 'dur': e['duracion_s'] * 1e6, 'args': args})
+            if 'pico_memoria_mb' in e:
+                eventos.append({'name': 'pico_memoria_mb', 'ph': 'C', 'pid': pid, 'tid': tid,
+                                'ts': e['inicio_s'] * 1e6, 'args': {'MB': e['pico_memoria_mb']}})
+        for nombre, serie in self.series.items():
+            for k, valor in enumerate(serie['valores']):
+                numeros = {c: v for c, v in valor.items() if isinstance(v, (int, float))}
+                #Los puntos de la serie se separan 1 µs para que se vean en orden.
+                eventos.append({'name': nombre, 'ph': 'C', 'pid': pid, 'tid': tid,
+                                'ts': serie['instante_s'] * 1e6 + k, 'args': numeros})
+        with open(ruta, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': eventos, 'displayTimeUnit': 'ms'}, f, default=float)
+        return ruta
+
+    def imprimir(self):
+        """Tabla de etapas (sangradas según su anidamiento)."""
+        for e in self.resumen()['etapas']:
+            memoria = f"  pico {e['pico_memoria_mb']:8.1f} MB" if 'pico_memoria_mb' in e else ""
+            print(f"{'  ' * e['nivel']}{e['nombre']:<{56 - 2 * e['nivel']}} "
+                  f"{e['duracion_s']:8.3f} s  cpu {e['cpu_s']:8.3f} s{memoria}")
+
+
+class _SinPerfilado:
+    """Perfilador que no mide nada (el que se usa por defecto)."""
+
+    def etapa(self, nombre, **datos):
+        return contextlib.nullcontext()
+
+    def serie(self, nombre, valores):
+        pass
+
+
+SIN_PERFILADO = _SinPerfilado()
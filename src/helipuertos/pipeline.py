@@ -0,0 +1,346 @@
+"""
+Pipeline completo del modelo como funciones sin efectos secundarios.
+
+Carga -> índice de prioridad -> candidatos viables -> optimización -> métricas,
+los mismos pasos que ejecutaban codigo_a_entregar.py y code.py. Ninguna función
+imprime ni escribe archivos salvo imprimir_informe y guardar_solucion, así que el
+pipeline se puede llamar desde otros programas. Los motores exacto y multiarranque
+(scipy.optimize, pool de procesos) y las librerías de gráficos solo se importan
+cuando se usan.
+
+Uso desde la línea de comandos (desde src/):
+
+    python -m helipuertos ../data/registro-de-municipios-de-castilla-y-leon.csv \\
+        --motor heuristica --salida solucion_prioridad_optima.csv --mapas
+"""
+import argparse
+import time
+
+import pandas as pd
+
+from helipuertos import graficos
+from helipuertos.cache import CacheMatrices, con_cache
+from helipuertos.cobertura import CoberturaCuerda, matriz_cobertura, matriz_tiempos_vuelo, puntos_cubiertos
+from helipuertos.instalaciones import indice_instalaciones
+from helipuertos.modelo import (PARAMETROS_VUELO_POR_DEFECTO, asignar_regiones,
+                                calcular_score_prioridad, preparar_columnas,
+                                seleccionar_candidatos, solucion_inicial)
+from helipuertos.optimizacion import alternativas_por_region, mejora_iterativa
+from helipuertos.perfilado import SIN_PERFILADO, Perfilador
+from helipuertos.registro import a_tipos_numericos, leer_registro
+
+MOTORES = ('heuristica', 'exacto', 'multiarranque')
+
+#Opciones de la línea de comandos de cada parámetro del modelo (también las usa barrido.py).
+OPCIONES_PARAMETROS = {
+    '--velocidad': 'VELOCIDAD_HELICOPTERO',
+    '--tiempo-max': 'TIEMPO_COBERTURA_MAX',
+    '--tiempo-ideal': 'TIEMPO_ACCION_IDEAL',
+    '--w-accidentes': 'W_ACCIDENTES_CTRA',
+    '--w-dificultad': 'W_DIFICULTAD',
+    '--w-densidad': 'W_DENSIDAD',
+    '--w-centro': 'W_TIENE_CENTRO',
+    '--w-transplantes': 'W_TRANSPLANTES',
+    '--w-4g': 'W_4G',
+}
+
+#Distancia al hospital que se guarda si no hay ningún hospital en los datos.
+DISTANCIA_SIN_HOSPITAL = 9999.0
+
+
+def cargar_datos(ruta, columnas=None):
+    """
+    Lee el registro de municipios (csv o Parquet).
+
+    El Parquet conserva los tipos de registro.ESQUEMA_REGISTRO (categorías,
+    booleanos, float32) y el modelo trabaja con ellos; el csv se lee como siempre.
+    columnas: lista de columnas a leer (None = todas, que es lo que necesita
+    guardar_solucion; modelo.COLUMNAS_MODELO basta para optimizar).
+    """
+    if str(ruta).lower().endswith(('.parquet', '.pq')):
+        return leer_registro(ruta, columnas)
+    return pd.read_csv(ruta, usecols=columnas)
+
+
+def puntuar(df, pesos=None, perfilador=SIN_PERFILADO):
+    """
+    Normaliza las variables, calcula 'Score_Prioridad' y asigna las regiones lógicas.
+
+    Devuelve una copia de 'df'; los pesos que falten toman su valor por defecto.
+    perfilador: helipuertos.perfilado.Perfilador que mide las etapas (opcional;
+        también en el resto de funciones del pipeline).
+    """
+    with perfilador.etapa('normalizacion'):
+        #Rellenamos a 0 las columnas que falten o tengan nulos y normalizamos con minmax.
+        df = preparar_columnas(df)
+        #Centro de salud y 4G se ponderan por su valor inverso: es prioritario donde no hay.
+        df['Score_Prioridad'] = calcular_score_prioridad(df, pesos)
+    with perfilador.etapa('regiones'):
+        #10 regiones lógicas (una base en cada una): las provincias, separando EL BIERZO de LEÓN.
+        return asignar_regiones(df)
+
+
+def evaluar_candidatos(df, radio_operativo_km, perfilador=SIN_PERFILADO):
+    """
+    Marca los municipios con hospital en el radio operativo y selecciona los candidatos.
+
+    Añade a una copia de 'df' 'Distancia_Hospital_Min' (distancia al hospital más
+    cercano) y 'Hospital_Cercano_OK'. Devuelve (df, candidates).
+    """
+    with perfilador.etapa('distancia_hospital'):
+        df = df.copy()
+        #Índice espacial de hospitales: una consulta de vecino más cercano por municipio.
+        indice_hosp = indice_instalaciones(df, 'Tiene_Hospital')
+        df['Distancia_Hospital_Min'] = indice_hosp.distancia_minima(df['Longitud'].values, df['Latitud'].values,
+                                                                    valor_vacio=DISTANCIA_SIN_HOSPITAL)
+    with perfilador.etapa('filtro_candidatos'):
+        #Un candidato es viable si tiene hospital en el radio o en el mismo municipio.
+        df['Hospital_Cercano_OK'] = (df['Distancia_Hospital_Min'] <= radio_operativo_km) | (df['Tiene_Hospital'] == 1)
+        #Población entre 300 y 10000; si alguna región se queda sin candidatos se añade su mejor municipio.
+        candidates, _ = seleccionar_candidatos(df, df['Hospital_Cercano_OK'])
+    return df, candidates
+
+
+def optimizar(df, candidates, velocidad, tiempo_max, motor='heuristica', n_arranques=200, cache=None,
+              precision_cobertura=None, perfilador=SIN_PERFILADO):
+    """
+    Elige una base por región maximizando el score cubierto en 'tiempo_max' minutos.
+
+    motor: 'heuristica' (mejora iterativa), 'exacto' (MILP con HiGHS, que también
+    ejecuta la heurística e informa de su gap) o 'multiarranque' (mejora iterativa
+    desde n_arranques soluciones GRASP en paralelo).
+    precision_cobertura: None para calcular la matriz de tiempos de vuelo (y usar
+        la caché); 'float64' o 'float32' para calcular solo la cobertura por
+        producto escalar (CoberturaCuerda), que da la misma matriz sin los tiempos.
+    Devuelve un diccionario con 'solucion_indices', 'tiempos_min' (matriz dispersa
+    demanda x candidato, o None con precision_cobertura), 'cobertura_cuerda' (o
+    None), 'matriz_cobertura' y, según el motor, 'informe_motores'
+    o 'multiarranque'. Con perfilador, las pasadas de la mejora iterativa se
+    guardan en su serie 'busqueda_local'.
+    """
+    if motor not in MOTORES:
+        raise ValueError(f"Motor desconocido: {motor!r} (opciones: {', '.join(MOTORES)})")
+    #Tiempo de vuelo en minutos solo de los pares alcanzables en el tiempo máximo.
+    #La clave de la caché incluye las coordenadas de los candidatos, así que cambia con el filtro.
+    coords_pares = (df['Longitud'].values, df['Latitud'].values,
+                    candidates['Longitud'].values, candidates['Latitud'].values)
+    with perfilador.etapa('matriz_cobertura'):
+        tiempos_min = cuerda = None
+        if precision_cobertura is None:
+            tiempos_min = con_cache(cache, 'tiempos_vuelo', coords_pares,
+                                    {'velocidad': velocidad, 'tiempo_max': tiempo_max},
+                                    lambda: matriz_tiempos_vuelo(*coords_pares, velocidad, tiempo_max))
+            cobertura = matriz_cobertura(tiempos_min)
+        else:
+            #Solo la cobertura, sin trigonometría por par: no hace falta caché.
+            cuerda = CoberturaCuerda(*coords_pares, velocidad, precision_cobertura)
+            cobertura = cuerda.matriz(tiempo_max)
+    scores_demanda = df['Score_Prioridad'].values
+
+    #Solución inicial: el candidato con mayor score de cada región; las alternativas
+    #de cada posición son los candidatos de su misma región.
+    solucion = solucion_inicial(candidates, df['Region_Logica'].unique())
+    alternativas_region = alternativas_por_region(candidates['Region_Logica'].values)
+    alternativas = [alternativas_region[candidates['Region_Logica'].iloc[idx]] for idx in solucion]
+
+    resultado = {'tiempos_min': tiempos_min, 'cobertura_cuerda': cuerda, 'matriz_cobertura': cobertura}
+    with perfilador.etapa('busqueda_local', motor=motor):
+        if motor == 'exacto':
+            #Import perezoso: scipy.optimize solo hace falta con este motor.
+            from helipuertos.exacto import comparar_motores
+            informe = comparar_motores(cobertura, scores_demanda, candidates['Region_Logica'].values,
+                                       solucion, alternativas)
+            solucion = informe['solucion_exacta']
+            resultado['informe_motores'] = informe
+        elif motor == 'multiarranque':
+            from helipuertos.multiarranque import multiarranque
+            res_multi = multiarranque(cobertura, scores_demanda, alternativas, n_arranques=n_arranques)
+            solucion = res_multi['mejor_solucion']
+            resultado['multiarranque'] = res_multi
+        else:
+            #La búsqueda mantiene cuántas bases cubren cada punto de demanda, de modo que
+            #cada intercambio solo evalúa los puntos que cubren la base saliente y la entrante.
+            pasadas = [] if perfilador is not SIN_PERFILADO else None
+            solucion, _ = mejora_iterativa(cobertura, scores_demanda, solucion, alternativas,
+                                           estadisticas=pasadas)
+            if pasadas is not None:
+                perfilador.serie('busqueda_local', pasadas)
+    resultado['solucion_indices'] = list(solucion)
+    return resultado
+
+
+def calcular_metricas(df, candidates, resultado, tiempo_ideal, perfilador=SIN_PERFILADO):
+    """
+    Bases elegidas y score/población cubiertos en el tiempo máximo y en 'tiempo_ideal'.
+
+    'resultado' es el diccionario que devuelve optimizar().
+    """
+    with perfilador.etapa('metricas'):
+        solucion = resultado['solucion_indices']
+        scores = df['Score_Prioridad']
+        poblacion = df['Población']
+        cubiertos_max = puntos_cubiertos(resultado['matriz_cobertura'], solucion)
+        if resultado.get('cobertura_cuerda') is not None:
+            #Cubierto en tiempo ideal y en tiempo máximo, como al filtrar tiempos_min.
+            cobertura_ideal = resultado['cobertura_cuerda'].matriz(tiempo_ideal).multiply(resultado['matriz_cobertura'])
+        else:
+            cobertura_ideal = matriz_cobertura(resultado['tiempos_min'], tiempo_ideal)
+        cubiertos_ideal = puntos_cubiertos(cobertura_ideal, solucion)
+        return {
+            'bases_finales': candidates.iloc[solucion].copy().sort_values('Region_Logica'),
+            'score_cubierto_max': scores[cubiertos_max].sum(),
+            'pob_cubierta_max': poblacion[cubiertos_max].sum(),
+            'score_cubierto_ideal': scores[cubiertos_ideal].sum(),
+            'pob_cubierta_ideal': poblacion[cubiertos_ideal].sum(),
+            'total_score': scores.sum(),
+            'total_pob': poblacion.sum(),
+        }
+
+
+def ejecutar(ruta_csv, parametros=None, motor='heuristica', n_arranques=200, directorio_cache=None,
+             precision_cobertura=None, perfilador=SIN_PERFILADO):
+    """
+    Ejecuta el pipeline completo y devuelve un diccionario con todos los resultados.
+
+    parametros: pesos y parámetros de vuelo (claves de PESOS_POR_DEFECTO y de
+        PARAMETROS_VUELO_POR_DEFECTO); los que falten toman su valor por defecto.
+    directorio_cache: carpeta de la caché en disco de las matrices (None para no usarla).
+    precision_cobertura: cobertura por producto escalar ('float64' o 'float32'); ver optimizar.
+    perfilador: Perfilador en el que se miden las etapas (carga, normalizacion,
+        regiones, distancia_hospital, filtro_candidatos, matriz_cobertura,
+        busqueda_local y metricas).
+    """
+    parametros = {**PARAMETROS_VUELO_POR_DEFECTO, **(parametros or {})}
+    velocidad = parametros['VELOCIDAD_HELICOPTERO']
+    tiempo_max = parametros['TIEMPO_COBERTURA_MAX']
+    inicio = time.perf_counter()
+    #La caché se vacía automáticamente cuando cambia el csv.
+    cache = CacheMatrices(directorio_cache, archivo_fuente=ruta_csv) if directorio_cache else None
+
+    with perfilador.etapa('carga'):
+        df = cargar_datos(ruta_csv)
+    columnas_registro = list(df.columns)
+    df = puntuar(df, parametros, perfilador)
+    df, candidates = evaluar_candidatos(df, (velocidad * tiempo_max) / 60, perfilador)
+    resultado = optimizar(df, candidates, velocidad, tiempo_max, motor=motor,
+                          n_arranques=n_arranques, cache=cache, precision_cobertura=precision_cobertura,
+                          perfilador=perfilador)
+    metricas = calcular_metricas(df, candidates, resultado, parametros['TIEMPO_ACCION_IDEAL'], perfilador)
+    return {
+        **resultado,
+        **metricas,
+        'df': df,
+        'candidates': candidates,
+        'parametros': parametros,
+        'motor': motor,
+        'columnas_registro': columnas_registro,
+        'tiempo_s': time.perf_counter() - inicio,
+    }
+
+
+def imprimir_informe(res):
+    """
+    Imprime el resumen de la optimización con el formato de codigo_a_entregar.py.
+
+    Incluye los encabezados de las fases ('Evaluando viabilidad', 'Optimizando') en
+    el mismo orden que la salida original, aunque aquí se imprimen con todo ya calculado.
+    """
+    parametros = res['parametros']
+    print("--- Evaluando viabilidad de candidatos ---")
+    print(f"Total Candidatos Viables: {len(res['candidates'])}")
+    print(f"--- Optimizando ubicaciones (Base {parametros['TIEMPO_COBERTURA_MAX']:g} min) ---")
+    if 'informe_motores' in res:
+        informe = res['informe_motores']
+        print(f" > Heurística: score {informe['score_heuristica']:.4f} "
+              f"en {informe['tiempo_heuristica_s']:.3f} s")
+        print(f" > Exacto:     score {informe['score_exacto']:.4f} "
+              f"en {informe['tiempo_exacto_s']:.3f} s "
+              f"({'óptimo' if informe['optimo_probado'] else 'límite de tiempo'})")
+        print(f" > Cota relajación lineal: {informe['cota_lp']:.4f}")
+        print(f" > Gap heurística: {informe['gap_heuristica']:.4%} frente al óptimo, "
+              f"{informe['gap_heuristica_lp']:.4%} frente a la cota LP")
+        print(f" > Motor más rápido en esta instancia: {informe['motor_mas_rapido']}")
+    if 'multiarranque' in res:
+        res_multi = res['multiarranque']
+        optimos = res_multi['scores_optimos_locales']
+        print(f" > {len(optimos)} arranques en {res_multi['tiempo_s']:.2f} s "
+              f"({res_multi['arranques_por_segundo']:.1f} arranques/s)")
+        print(f" > Óptimos locales: mín {optimos.min():.4f}, media {optimos.mean():.4f}, "
+              f"máx {optimos.max():.4f} ({res_multi['n_optimos_distintos']} soluciones distintas)")
+
+    total_score, total_pop = res['total_score'], res['total_pob']
+    cols_mostrar = ['Municipio', 'Provincia', 'Region_Logica', 'Población', 'Score_Prioridad',
+                    'Distancia_Hospital_Min']
+    print("UBICACIÓN ÓPTIMA DE BASES ")
+    print(res['bases_finales'][cols_mostrar].round(3).to_string(index=False))
+    print(f"Métricas Globales (Total Score Prioridad: {total_score:.2f})")
+    print(f" > Cobertura Operativa ({parametros['TIEMPO_COBERTURA_MAX']:g} min):")
+    print(f"   - Score Prioridad Cubierto: {res['score_cubierto_max']:.2f} "
+          f"({res['score_cubierto_max']/total_score:.2%}) ")
+    print(f"   - Población Cubierta:       {res['pob_cubierta_max']:,.0f} ({res['pob_cubierta_max']/total_pop:.2%})")
+    print(f"\n > Cobertura Excelencia ({parametros['TIEMPO_ACCION_IDEAL']:g} min):")
+    print(f"   - Score Prioridad Cubierto: {res['score_cubierto_ideal']:.2f} "
+          f"({res['score_cubierto_ideal']/total_score:.2%})")
+    print(f"   - Población Cubierta:       {res['pob_cubierta_ideal']:,.0f} "
+          f"({res['pob_cubierta_ideal']/total_pop:.2%})")
+
+
+def guardar_solucion(res, ruta='solucion_prioridad_optima.csv'):
+    """Exporta las bases elegidas a csv (las columnas del registro, con los tipos del csv)."""
+    a_tipos_numericos(res['bases_finales'], res.get('columnas_registro', [])).to_csv(ruta, index=False)
+    return ruta
+
+
+def guardar_perfil(perfilador, ruta):
+    """Imprime las etapas medidas y las guarda en 'ruta' (traza de Chrome si acaba en .trace.json)."""
+    perfilador.detener()
+    perfilador.imprimir()
+    if str(ruta).endswith('.trace.json'):
+        perfilador.guardar_traza_chrome(ruta)
+    else:
+        perfilador.guardar_json(ruta)
+    print(f"Perfil guardado en '{ruta}'.")
+
+
+def _argumentos():
+    parser = argparse.ArgumentParser(description="Ubicación óptima de helipuertos sanitarios.")
+    parser.add_argument('csv', help="registro de municipios (.csv o .parquet)")
+    parser.add_argument('--motor', choices=MOTORES, default='heuristica', help="motor de optimización")
+    parser.add_argument('--arranques', type=int, default=200, help="arranques del motor multiarranque")
+    parser.add_argument('--cache', default=None, help="carpeta de caché en disco de las matrices")
+    parser.add_argument('--salida', default='solucion_prioridad_optima.csv', help="csv con las bases elegidas")
+    parser.add_argument('--graficos', action='store_true', help="genera el gráfico de pesos (matplotlib)")
+    parser.add_argument('--mapas', action='store_true', help="genera los mapas html (folium)")
+    parser.add_argument('--directorio-figuras', default=None, help="carpeta de gráficos y mapas")
+    parser.add_argument('--mapas-canvas', action='store_true',
+                        help="dibuja los puntos de los mapas en canvas en lugar de SVG (más fluido con "
+                             "muchos municipios)")
+    parser.add_argument('--precision-cobertura', choices=('float64', 'float32'), default=None,
+                        help="calcula solo la cobertura por producto escalar de vectores unitarios "
+                             "(mismo resultado, sin matriz de tiempos ni caché)")
+    parser.add_argument('--perfil', default=None,
+                        help="json con tiempo, CPU y pico de memoria de cada etapa (traza de Chrome "
+                             "si termina en .trace.json)")
+    for opcion, parametro in OPCIONES_PARAMETROS.items():
+        parser.add_argument(opcion, dest=parametro, type=float, help=f"valor de {parametro}")
+    args = parser.parse_args()
+    parametros = {p: getattr(args, p) for p in OPCIONES_PARAMETROS.values() if getattr(args, p) is not None}
+    return args, parametros
+
+
+def main():
+    args, parametros = _argumentos()
+    perfilador = Perfilador() if args.perfil else SIN_PERFILADO
+    res = ejecutar(args.csv, parametros, motor=args.motor, n_arranques=args.arranques,
+                   directorio_cache=args.cache, precision_cobertura=args.precision_cobertura,
+                   perfilador=perfilador)
+    imprimir_informe(res)
+    print(f"csv final '{guardar_solucion(res, args.salida)}' guardado ({res['tiempo_s']:.2f} s).")
+    if args.graficos:
+        graficos.generar_grafico_pesos(args.directorio_figuras)
+    if args.mapas:
+        graficos.generar_mapas(res['df'], res['bases_finales'], res['parametros'], args.directorio_figuras,
+                               perfilador=perfilador, canvas=args.mapas_canvas)
+    if args.perfil:
+        guardar_perfil(perfilador, args.perfil)
+
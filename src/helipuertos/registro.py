@@ -0,0 +1,112 @@
+"""
+Registro de municipios en formato columnar tipado (Parquet).
+
+El registro maestro se guarda en Parquet con tipos fijos: provincias y
+regiones como categorías, indicadores (0/1) como booleanos, códigos y
+población como enteros pequeños y las puntuaciones como float32. Leerlo no
+necesita interpretar texto, se pueden pedir solo las columnas que se usan y el
+modelo trabaja directamente con estos tipos. El csv queda como formato de
+exportación (a_tipos_numericos).
+
+Tolerancia de float32: unos 7 dígitos significativos (error relativo de cada
+puntuación menor que 6e-8). Las puntuaciones redondeadas (DECIMALES_FLOAT32) se
+recuperan exactas al exportar; DENSIDADMM y 4G, que no lo están, se exportan
+con su representación decimal más corta en float32. Score_Prioridad se calcula
+en float64 a partir de ellas y difiere del que da el csv en menos de 1e-7
+relativo, así que la solución solo puede cambiar si dos intercambios empatan a
+ese nivel.
+
+pyarrow solo se necesita al leer o escribir Parquet.
+"""
+import pandas as pd
+
+#Tipo de cada columna del registro (las que no aparecen se dejan como estén).
+ESQUEMA_REGISTRO = {
+    'Municipio': 'str',
+    'Cod_Municipio': 'int32',
+    'Provincia': 'category',
+    'Cod_Provincia': 'int16',
+    'Población': 'int32',
+    'Posición': 'str',
+    'Region_Logica': 'category',
+    'presencia_de_comercio': 'bool',
+    'Tiene_Hospital': 'bool',
+    'Transplantes': 'bool',
+    'tiene_centro': 'bool',
+    'Es_Bierzo': 'bool',
+    'Hospital_Cercano_OK': 'bool',
+    'Dificultad_Acceso': 'float32',
+    'Accidentes_Por_Carretera': 'float32',
+    'DENSIDADMM': 'float32',
+    '4G': 'float32',
+}
+#Decimales con los que se redondean al exportar las columnas float32 (recuperan el valor exacto).
+DECIMALES_FLOAT32 = {
+    'Dificultad_Acceso': 2,
+    'Accidentes_Por_Carretera': 4,
+}
+
+
+def _es_parquet(ruta):
+    return str(ruta).lower().endswith(('.parquet', '.pq'))
+
+
+def tipar_registro(df):
+    """Aplica ESQUEMA_REGISTRO a las columnas de 'df' que lo tengan y devuelve una copia."""
+    df = df.copy()
+    for col, tipo in ESQUEMA_REGISTRO.items():
+        if col not in df.columns:
+            continue
+        if tipo == 'bool':
+            #Con nulos se usa el booleano de pandas que los admite.
+            df[col] = df[col].astype('boolean' if df[col].isna().any() else bool)
+        else:
+            df[col] = df[col].astype(tipo)
+    return df
+
+
+def a_tipos_numericos(df, columnas=None):
+    """
+    Convierte las columnas tipadas a los tipos con los que se lee el csv.
+
+    Enteros a int64, booleanos a 0/1, categorías a texto y float32 a float64
+    (redondeado a sus decimales o, si no los tiene, a su decimal más corto). Es
+    lo que se usa para exportar a csv.
+    columnas: columnas que se convierten (None = todas).
+    """
+    df = df.copy()
+    for col in df.columns if columnas is None else [c for c in columnas if c in df.columns]:
+        tipo = df[col].dtype
+        if isinstance(tipo, pd.CategoricalDtype):
+            df[col] = df[col].astype(tipo.categories.dtype)
+        elif pd.api.types.is_bool_dtype(tipo):
+            df[col] = df[col].astype('Int64' if df[col].isna().any() else 'int64')
+        elif pd.api.types.is_integer_dtype(tipo) and tipo != 'int64':
+            df[col] = df[col].astype('int64')
+        elif tipo == 'float32':
+            if col in DECIMALES_FLOAT32:
+                df[col] = df[col].astype(float).round(DECIMALES_FLOAT32[col])
+            else:
+                df[col] = df[col].astype(str).astype(float)
+    return df
+
+
+def guardar_registro(df, ruta):
+    """Guarda el registro en Parquet tipado o, si la ruta acaba en .csv, como csv de exportación."""
+    if _es_parquet(ruta):
+        tipar_registro(df).to_parquet(ruta, index=False)
+    else:
+        a_tipos_numericos(df).to_csv(ruta, index=False)
+    return ruta
+
+
+def leer_registro(ruta, columnas=None):
+    """
+    Lee el registro (Parquet o csv) con los tipos de ESQUEMA_REGISTRO.
+
+    columnas: lista de columnas a leer (None = todas). En Parquet el resto ni se
+    lee del disco.
+    """
+    if _es_parquet(ruta):
+        return pd.read_parquet(ruta, columns=columnas)
+    return tipar_registro(pd.read_csv(ruta, usecols=columnas))
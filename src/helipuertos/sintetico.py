@@ -0,0 +1,344 @@
+"""
+Instancias sintéticas con el mismo esquema que los datos de Castilla y León.
+
+generar_instancia(n) crea un registro de municipios con las columnas de
+registro-de-municipios-de-castilla-y-leon.csv y los archivos fuente de la
+preparación de datos que le corresponden (registro sin limpiar, accidentes,
+demanda, centros sanitarios y códigos postales), así que sirve para el
+modelo, para las etapas de preparar_datos.py y para los mapas con miles o
+millones de municipios. Con la misma semilla se obtiene siempre la misma
+instancia.
+
+Cómo se construye:
+- las provincias son celdas de una rejilla con unos MUNICIPIOS_POR_PROVINCIA
+  municipios y la densidad real (KM2_POR_MUNICIPIO), así que los pares dentro
+  del radio de cobertura por municipio son como los reales;
+- los municipios se agrupan alrededor de la capital y de otros núcleos de su
+  provincia, con población log-normal (mediana y dispersión de los datos
+  reales) y capitales de decenas de miles de habitantes;
+- hospitales en las capitales y en los municipios grandes, trasplantes en las
+  capitales más pobladas;
+- la dificultad de acceso sigue la fórmula del script de hospitales (70 %
+  orografía por tramos de altitud de sierras aleatorias, 30 % distancia a la
+  capital);
+- cada accidente nombra uno o dos municipios en su descripción, y
+  Accidentes_Raw es el reparto de procesar_accidentes.py sobre esos accidentes.
+  Los nombres ("MUNICIPIO 000123") tienen todos la misma longitud, así que
+  ninguno contiene a otro y la búsqueda de nombres en las descripciones da
+  exactamente esos municipios.
+
+Las etapas de hospitales y dificultad de preparar_datos.py usan las listas y
+las zonas de Castilla y León, así que con una instancia sintética esas
+columnas salen distintas de las del registro generado.
+
+Uso (desde src/):
+
+    python -m helipuertos.sintetico --municipios 100000 --semilla 0 --directorio ../data/sintetico_100k
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from helipuertos.distancias import RADIO_TIERRA_KM, haversine_vectorizado
+from helipuertos.orografia import dificultad_por_altitud
+
+#Superficie media por municipio en Castilla y León (km²) y municipios por provincia.
+KM2_POR_MUNICIPIO = 42.0
+MUNICIPIOS_POR_PROVINCIA = 250
+#Población de los municipios (log-normal ajustada a los datos reales) y de las capitales.
+MEDIANA_POBLACION = 164
+DISPERSION_POBLACION = 1.44
+MEDIANA_POBLACION_CAPITAL = 60000
+POBLACION_HOSPITAL = 15000
+#Fracción de capitales (las más pobladas) con unidad de trasplantes.
+FRACCION_TRASPLANTES = 0.22
+#Núcleos por provincia (además de la capital) alrededor de los que se agrupan los municipios.
+NUCLEOS_POR_PROVINCIA = 3
+FRACCION_AGRUPADOS = 0.6
+#Sierras por provincia y altitud del llano (m).
+SIERRAS_POR_PROVINCIA = 2
+ALTITUD_LLANO = 750.0
+#Accidentes por municipio (los datos reales tienen 3962 para 2248 municipios).
+ACCIDENTES_POR_MUNICIPIO = 1.76
+#Latitud máxima (en valor absoluto) que puede ocupar la rejilla de provincias.
+LATITUD_MAXIMA = 70.0
+
+#Nombres de archivo de cada tabla (los de data/ y preparar_datos.py).
+ARCHIVOS_INSTANCIA = {
+    'registro': 'registro-de-municipios-de-castilla-y-leon.csv',
+    'sin_limpiar': 'registro-de-municipios_sin-limpiar.csv',
+    'accidentes': 'accidentalidad-por-carreteras.csv',
+    'demanda': 'datos_demanda_final_densidad_4g_scaled.csv',
+    'centros': 'centros-sanitarios-cyl.csv',
+    'codigos_postales': 'codigos_postales_municipales.csv',
+}
+COLUMNAS_REGISTRO = ['Municipio', 'Cod_Municipio', 'Provincia', 'Cod_Provincia', 'Población',
+                     'Longitud', 'Latitud', 'CoordenadaX', 'CoordenadaY', 'Posición',
+                     'presencia_de_comercio', 'Tiene_Hospital', 'Transplantes', 'Dificultad_Acceso',
+                     'Accidentes_Raw', 'Accidentes_Por_Carretera', 'tiene_centro', 'DENSIDADMM', '4G']
+COLUMNAS_SIN_LIMPIAR = ['Municipio', 'Cod_Municipio', 'Provincia', 'Cod_Provincia', 'Cod_INE', 'Población',
+                        'Mancomunidades', 'Entidades_Locales_Menores', 'Comarca', 'Longitud', 'Latitud',
+                        'CoordenadaX', 'CoordenadaY', 'Posición', 'presencia_de_comercio', 'Tiene_Hospital',
+                        'Transplantes', 'Dificultad_Acceso', 'Accidentes_Raw', 'Accidentes_Por_Carretera']
+COLUMNAS_ACCIDENTES = ['AÑO', 'NOMBRE', 'T.RED', 'DESCRIPCIÓN', 'LONG.', 'IMD', 'ASV', 'ACV',
+                       'MUERTOS', 'HERIDOS', 'IM', 'IP', 'IAT', 'IL', 'IG']
+TIPOS_RED = ['CL', 'CP', 'CTL', 'CIP', 'B']
+
+
+def _rejilla_provincias(n_provincias, lado_km, lon_centro, lat_centro):
+    """Esquina suroeste y tamaño en grados de la celda de cada provincia (rejilla casi cuadrada)."""
+    columnas = int(np.ceil(np.sqrt(n_provincias)))
+    filas = -(-n_provincias // columnas)
+    alto = lado_km / (np.pi * RADIO_TIERRA_KM / 180)
+    #Se centra la rejilla en lat_centro sin pasar de LATITUD_MAXIMA.
+    mitad = filas * alto / 2
+    lat_centro = float(np.clip(lat_centro, -LATITUD_MAXIMA + mitad, LATITUD_MAXIMA - mitad))
+    k = np.arange(n_provincias)
+    lat0 = lat_centro - mitad + (k // columnas) * alto
+    #El ancho en grados de longitud depende de la latitud de la fila.
+    ancho = alto / np.cos(np.radians(lat0 + alto / 2))
+    lon0 = lon_centro + (k % columnas - columnas / 2) * ancho
+    return lon0, lat0, ancho, np.full(n_provincias, alto)
+
+
+def _coordenadas_utm(lon, lat):
+    """Coordenadas X/Y aproximadas en metros (proyección plana local, como el huso 30 del registro)."""
+    metros_grado = np.pi * RADIO_TIERRA_KM * 1000 / 180
+    return (np.round(500000 + (lon + 3.0) * metros_grado * np.cos(np.radians(lat)), 2),
+            np.round(lat * metros_grado, 2))
+
+
+def _accidentes(rng, municipios, inicio_provincia, fin_provincia, provincia):
+    """
+    Tabla de accidentes y reparto de su peso por municipio (Accidentes_Raw).
+
+    La mitad de los accidentes van de un municipio a otro de su provincia y el
+    resto de un municipio a una carretera; los municipios con más población
+    tienen más accidentes.
+    """
+    n = len(municipios)
+    n_acc = max(1, int(round(ACCIDENTES_POR_MUNICIPIO * n)))
+    prob = np.sqrt(municipios['Población'].to_numpy(dtype=float))
+    a = rng.choice(n, size=n_acc, p=prob / prob.sum())
+    p = provincia[a]
+    b = inicio_provincia[p] + (rng.random(n_acc) * (fin_provincia[p] - inicio_provincia[p])).astype(np.int64)
+    dos = (rng.random(n_acc) < 0.5) & (b != a)
+
+    carretera = np.char.add(np.char.add('SR-', (100 + p % 900).astype(str)),
+                            rng.integers(1, 100, n_acc).astype(str))
+    nombres = municipios['Municipio'].to_numpy()
+    descripcion = np.where(dos, 'DE ' + nombres[a] + ' A ' + nombres[b],
+                           'DE ' + nombres[a] + ' A ' + carretera.astype(object))
+
+    acv = rng.poisson(rng.gamma(0.5, 5.6, n_acc))
+    heridos = rng.poisson(0.9 * acv)
+    muertos = rng.binomial(acv, 0.03)
+    accidentes = pd.DataFrame({
+        'AÑO': rng.integers(2016, 2024, n_acc),
+        'NOMBRE': carretera,
+        'T.RED': rng.choice(TIPOS_RED, n_acc),
+        'DESCRIPCIÓN': descripcion,
+        'LONG.': np.round(rng.lognormal(np.log(16), 0.7, n_acc), 2),
+        'IMD': np.round(rng.lognormal(np.log(420), 1.0, n_acc), 1),
+        'ASV': rng.poisson(3.0 * acv + 1).astype(float),
+        'ACV': acv.astype(float),
+        'MUERTOS': muertos.astype(float),
+        'HERIDOS': heridos.astype(float),
+    })
+    for col in ['IM', 'IP', 'IAT', 'IL', 'IG']:
+        accidentes[col] = np.round(rng.exponential(50.0, n_acc), 4)
+
+    #Mismo peso y mismo orden de suma que procesar_accidentes.py.
+    peso = heridos * 0.5 + muertos * 1.0 + acv * 0.3
+    peso = np.where(peso == 0, 0.1, peso)
+    divisor = np.where(dos, 2, 1)
+    acc = np.repeat(np.arange(n_acc), divisor)
+    muni = np.column_stack([a, b]).ravel()[np.column_stack([np.ones(n_acc, bool), dos]).ravel()]
+    raw = np.zeros(n)
+    np.add.at(raw, muni, peso[acc] / divisor[acc])
+    return accidentes, raw
+
+
+def _minmax(valores):
+    """Escalado a [0, 1] con las mismas operaciones que MinMaxScaler."""
+    rango = valores.max() - valores.min()
+    escala = 1.0 / (rango if rango != 0 else 1.0)
+    return valores * escala + (0 - valores.min() * escala)
+
+
+def generar_instancia(n_municipios, semilla=0, municipios_por_provincia=MUNICIPIOS_POR_PROVINCIA,
+                      lon_centro=-4.5, lat_centro=41.5):
+    """
+    Instancia sintética de n_municipios municipios.
+
+    Devuelve un diccionario con las tablas de ARCHIVOS_INSTANCIA: 'registro' (el
+    registro final, columnas COLUMNAS_REGISTRO), 'sin_limpiar', 'accidentes',
+    'demanda', 'centros' y 'codigos_postales'. Las provincias ('PROVINCIA 001', ...)
+    son las regiones lógicas del modelo (una base por provincia).
+    """
+    rng = np.random.default_rng(semilla)
+    n_prov = max(1, -(-n_municipios // municipios_por_provincia))
+    lado_km = np.sqrt(municipios_por_provincia * KM2_POR_MUNICIPIO)
+    lon0, lat0, ancho, alto = _rejilla_provincias(n_prov, lado_km, lon_centro, lat_centro)
+
+    #Reparto de municipios por provincia (contiguos; el primero de cada una es la capital).
+    por_provincia = np.full(n_prov, n_municipios // n_prov)
+    por_provincia[:n_municipios % n_prov] += 1
+    fin = np.cumsum(por_provincia)
+    inicio = fin - por_provincia
+    provincia = np.repeat(np.arange(n_prov), por_provincia)
+    capital = np.zeros(n_municipios, dtype=bool)
+    capital[inicio] = True
+
+    #Núcleos de cada provincia (el 0 es la capital) en coordenadas relativas a la celda.
+    nucleos = 0.15 + 0.7 * rng.random((n_prov, NUCLEOS_POR_PROVINCIA + 1, 2))
+    nucleos[:, 0] = 0.4 + 0.2 * rng.random((n_prov, 2))
+    elegido = rng.integers(0, NUCLEOS_POR_PROVINCIA + 1, n_municipios)
+    agrupado = rng.random(n_municipios) < FRACCION_AGRUPADOS
+    relativa = np.where(agrupado[:, None],
+                        nucleos[provincia, elegido] + rng.normal(0, 1 / 6, (n_municipios, 2)),
+                        rng.random((n_municipios, 2)))
+    relativa = np.clip(relativa, 0, 1)
+    relativa[capital] = nucleos[:, 0]
+    lon = np.round(lon0[provincia] + relativa[:, 0] * ancho[provincia], 6)
+    lat = np.round(lat0[provincia] + relativa[:, 1] * alto[provincia], 6)
+
+    poblacion = np.maximum(5, np.round(rng.lognormal(np.log(MEDIANA_POBLACION), DISPERSION_POBLACION,
+                                                     n_municipios))).astype(np.int64)
+    poblacion[capital] = np.clip(np.round(rng.lognormal(np.log(MEDIANA_POBLACION_CAPITAL), 0.6, n_prov)),
+                                 20000, 3_000_000).astype(np.int64)
+    hospital = capital | (poblacion >= POBLACION_HOSPITAL)
+    umbral_trasplantes = np.quantile(poblacion[capital], 1 - FRACCION_TRASPLANTES)
+    trasplantes = capital & (poblacion >= umbral_trasplantes)
+
+    #Dificultad: altitud de SIERRAS_POR_PROVINCIA sierras (campanas) por provincia y distancia a la capital.
+    centro_sierra = rng.random((n_prov, SIERRAS_POR_PROVINCIA, 2))
+    altura_sierra = rng.uniform(400, 1800, (n_prov, SIERRAS_POR_PROVINCIA))
+    radio_sierra = rng.uniform(0.08, 0.25, (n_prov, SIERRAS_POR_PROVINCIA))
+    d2 = ((relativa[:, None, :] - centro_sierra[provincia]) ** 2).sum(axis=2)
+    altitud = ALTITUD_LLANO + (altura_sierra[provincia] * np.exp(-d2 / (2 * radio_sierra[provincia] ** 2))).sum(axis=1)
+    geo = dificultad_por_altitud(altitud)
+    dist_capital = haversine_vectorizado(lon, lat, lon[inicio][provincia], lat[inicio][provincia])
+    dificultad = np.round(geo * 0.7 + np.minimum(dist_capital / 120.0, 1.0) * 0.3, 2)
+
+    nombres_prov = np.char.add('PROVINCIA ', np.char.zfill((np.arange(n_prov) + 1).astype(str),
+                                                           len(str(n_prov))))
+    cifras = len(str(n_municipios))
+    municipios = pd.DataFrame({
+        'Municipio': np.char.add('MUNICIPIO ', np.char.zfill((np.arange(n_municipios) + 1).astype(str),
+                                                             cifras)).astype(object),
+        'Cod_Municipio': np.arange(n_municipios) - inicio[provincia] + 1,
+        'Provincia': nombres_prov[provincia].astype(object),
+        'Cod_Provincia': provincia + 1,
+        'Población': poblacion,
+    })
+    accidentes, raw = _accidentes(rng, municipios, inicio, fin, provincia)
+
+    densidad = poblacion * rng.lognormal(0, 0.6, n_municipios)
+    sin_4g = rng.random(n_municipios) >= 0.55
+    cobertura_4g = np.clip(1 - sin_4g * rng.exponential(0.12, n_municipios) * 3 / np.log10(poblacion + 10), 0, 1)
+    tiene_centro = rng.random(n_municipios) < np.clip(0.6 + 0.12 * np.log10(poblacion), 0, 0.99)
+    x, y = _coordenadas_utm(lon, lat)
+
+    registro = municipios.assign(
+        Longitud=lon,
+        Latitud=lat,
+        CoordenadaX=x,
+        CoordenadaY=y,
+        Posición=pd.Series(lat).astype(str) + ', ' + pd.Series(lon).astype(str),
+        presencia_de_comercio=(poblacion >= 2000).astype(int),
+        Tiene_Hospital=hospital.astype(int),
+        Transplantes=trasplantes.astype(int),
+        Dificultad_Acceso=dificultad,
+        Accidentes_Raw=raw,
+        Accidentes_Por_Carretera=np.round(_minmax(raw), 4),
+        tiene_centro=tiene_centro.astype(int),
+        DENSIDADMM=_minmax(densidad),
+        **{'4G': np.round(cobertura_4g, 4)},
+    )[COLUMNAS_REGISTRO]
+
+    sin_limpiar = registro.assign(Cod_INE=registro['Cod_Provincia'] * 1000 + registro['Cod_Municipio'],
+                                  Mancomunidades='', Entidades_Locales_Menores='', Comarca='')
+    demanda = pd.DataFrame({
+        'PROVINCIA': registro['Provincia'].str.title(),
+        'NOMBRE_ACTUAL': registro['Municipio'].str.title(),
+        #La demanda real trae la densidad con coma decimal.
+        'DENSIDADMM': registro['DENSIDADMM'].astype(str).str.replace('.', ',', regex=False),
+        '4G': registro['4G'],
+    })
+
+    #Centros: uno o más por municipio con centro, con un código postal por municipio
+    #(compartido entre varios si hay más municipios que códigos).
+    codigo_postal = (1000 + np.arange(n_municipios)) % 100000
+    n_centros = np.where(tiene_centro, 1 + rng.poisson(poblacion / 4000), 0) + hospital
+    fila_centro = np.repeat(np.arange(n_municipios), n_centros)
+    orden = np.arange(len(fila_centro)) - np.repeat(np.cumsum(n_centros) - n_centros, n_centros)
+    tipo = np.where(orden > 0, 'Consultorio local',
+                    np.where(poblacion[fila_centro] >= 2000, 'Centro de Salud', 'Consultorio local'))
+    tipo = np.where(hospital[fila_centro] & (orden == n_centros[fila_centro] - 1), 'Hospital', tipo)
+    centros = pd.DataFrame({'Código postal': codigo_postal[fila_centro], 'Tipo de centro': tipo})
+    codigos_postales = pd.DataFrame({'codigo_postal': pd.Series(codigo_postal).astype(str).str.zfill(5),
+                                     'nombre': registro['Municipio'].str.title()})
+
+    return {
+        'registro': registro,
+        'sin_limpiar': sin_limpiar[COLUMNAS_SIN_LIMPIAR],
+        'accidentes': accidentes[COLUMNAS_ACCIDENTES],
+        'demanda': demanda,
+        'centros': centros,
+        'codigos_postales': codigos_postales,
+    }
+
+
+def generar_registro(n_municipios, semilla=0, **opciones):
+    """Solo el registro de municipios de generar_instancia."""
+    return generar_instancia(n_municipios, semilla, **opciones)['registro']
+
+
+def escribir_instancia(instancia, directorio, parquet=False):
+    """
+    Escribe las tablas de la instancia en 'directorio' con los nombres de ARCHIVOS_INSTANCIA.
+
+    Los separadores son los de los archivos reales (';' en el registro sin limpiar,
+    los accidentes y los centros). Con parquet=True el registro también se guarda
+    en Parquet tipado. Devuelve {tabla: ruta}.
+    """
+    os.makedirs(directorio, exist_ok=True)
+    rutas = {}
+    for tabla, archivo in ARCHIVOS_INSTANCIA.items():
+        rutas[tabla] = os.path.join(directorio, archivo)
+        sep = ';' if tabla in ('sin_limpiar', 'accidentes', 'centros') else ','
+        instancia[tabla].to_csv(rutas[tabla], sep=sep, index=False)
+    if parquet:
+        from helipuertos.registro import guardar_registro
+        rutas['parquet'] = guardar_registro(instancia['registro'],
+                                            os.path.splitext(rutas['registro'])[0] + '.parquet')
+    return rutas
+
+
+def _argumentos():
+    parser = argparse.ArgumentParser(description="Genera una instancia sintética de municipios.")
+    parser.add_argument('--municipios', type=int, required=True, help="número de municipios")
+    parser.add_argument('--semilla', type=int, default=0, help="semilla aleatoria")
+    parser.add_argument('--por-provincia', type=int, default=MUNICIPIOS_POR_PROVINCIA,
+                        help="municipios por provincia (región lógica)")
+    parser.add_argument('--directorio', required=True, help="carpeta de salida")
+    parser.add_argument('--parquet', action='store_true', help="guarda también el registro en Parquet")
+    return parser.parse_args()
+
+
+def main():
+    args = _argumentos()
+    instancia = generar_instancia(args.municipios, args.semilla, args.por_provincia)
+    rutas = escribir_instancia(instancia, args.directorio, parquet=args.parquet)
+    registro = instancia['registro']
+    print(f"{len(registro)} municipios en {registro['Provincia'].nunique()} provincias, "
+          f"{len(instancia['accidentes'])} accidentes, {len(instancia['centros'])} centros")
+    for tabla, ruta in rutas.items():
+        print(f"  {tabla:<17} {ruta}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""
+Búsqueda de nombres (de municipios) dentro de textos libres.
+
+BuscadorSubcadenas es un autómata de Aho-Corasick: se construye una vez con
+todos los nombres y encuentra en una sola pasada por el texto todos los que
+aparecen en él. Da el mismo resultado que comprobar `nombre in texto` para cada
+nombre, pero el coste depende de la longitud del texto y no del número de nombres.
+"""
+from collections import deque
+
+
+class BuscadorSubcadenas:
+    """
+    Autómata de Aho-Corasick sobre un diccionario {patron: valor}.
+
+    buscar(texto) devuelve los valores de todos los patrones que aparecen en
+    'texto' como subcadena (también solapados o contenidos en otro patrón), en el
+    orden en que se dieron los patrones.
+    """
+
+    def __init__(self, patrones):
+        self.valores = list(patrones.values())
+        #Estado 0 = raíz. Por estado: transiciones, enlace de fallo y patrones que terminan en él.
+        self._hijos = [{}]
+        self._fallo = [0]
+        self._salidas = [[]]
+        for orden, patron in enumerate(patrones):
+            estado = 0
+            for caracter in patron:
+                siguiente = self._hijos[estado].get(caracter)
+                if siguiente is None:
+                    siguiente = len(self._hijos)
+                    self._hijos.append({})
+                    self._fallo.append(0)
+                    self._salidas.append([])
+                    self._hijos[estado][caracter] = siguiente
+                estado = siguiente
+            self._salidas[estado].append(orden)
+
+        #Enlaces de fallo en anchura: el sufijo propio más largo que también es prefijo de algún patrón.
+        cola = deque(self._hijos[0].values())
+        while cola:
+            estado = cola.popleft()
+            for caracter, siguiente in self._hijos[estado].items():
+                cola.append(siguiente)
+                fallo = self._fallo[estado]
+                while fallo and caracter not in self._hijos[fallo]:
+                    fallo = self._fallo[fallo]
+                self._fallo[siguiente] = self._hijos[fallo].get(caracter, 0)
+                #Un estado también reconoce los patrones de su enlace de fallo.
+                self._salidas[siguiente] = self._salidas[siguiente] + self._salidas[self._fallo[siguiente]]
+
+    def __len__(self):
+        return len(self.valores)
+
+    def buscar(self, texto):
+        """Valores de los patrones contenidos en 'texto'."""
+        hijos, fallo, salidas = self._hijos, self._fallo, self._salidas
+        #Un patrón vacío está contenido en cualquier texto.
+        encontrados = set(salidas[0])
+        estado = 0
+        for caracter in texto:
+            while estado and caracter not in hijos[estado]:
+                estado = fallo[estado]
+            estado = hijos[estado].get(caracter, 0)
+            if salidas[estado]:
+                encontrados.update(salidas[estado])
+        return [self.valores[orden] for orden in sorted(encontrados)]
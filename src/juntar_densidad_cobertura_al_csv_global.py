@@ -1,34 +1,50 @@
 import pandas as pd
 
-# Cargar los archivos
-df_municipios = pd.read_csv('registro-de-municipios-de-castilla-y-leon.csv')
-df_demanda = pd.read_csv('datos_demanda_final_scaled.csv')
-
-# Normalizar nombres para asegurar el cruce (mayúsculas y espacios)
-df_municipios['Municipio_join'] = df_municipios['Municipio'].str.upper().str.strip()
-df_municipios['Provincia_join'] = df_municipios['Provincia'].str.upper().str.strip()
-
-df_demanda['Municipio_join'] = df_demanda['NOMBRE_ACTUAL'].str.upper().str.strip()
-df_demanda['Provincia_join'] = df_demanda['PROVINCIA'].str.upper().str.strip()
-
-# Convertir DENSIDADMM a numérico si es necesario (parece tener coma decimal)
-df_demanda['DENSIDADMM'] = df_demanda['DENSIDADMM'].astype(str).str.replace(',', '.').astype(float)
-
-# Realizar el merge (unión)
-# Usamos left join para mantener todos los registros de new_municipios
-df_final = pd.merge(
-    df_municipios,
-    df_demanda[['Municipio_join', 'Provincia_join', 'DENSIDADMM', '4G']],
-    on=['Municipio_join', 'Provincia_join'],
-    how='left'
-)
-
-# Eliminar columnas auxiliares usadas para el join
-df_final = df_final.drop(columns=['Municipio_join', 'Provincia_join'])
-
-# Guardar el resultado
-df_final.to_csv('registro-de-municipios-de-castilla-y-leon.csv', index=False)
-
-# Mostrar las primeras filas para verificar
-print(df_final.head())
-print(df_final.info())
+from helipuertos.nombres import IndiceNombres, resumen_cruce
+
+
+def unir_densidad_4g(df_municipios, df_demanda, indice=None):
+    """
+    Añade a los municipios 'DENSIDADMM' y '4G' cruzando por nombre de municipio y provincia.
+
+    indice: IndiceNombres del registro (se construye con df_municipios si no se pasa).
+    """
+    df_municipios = df_municipios.copy()
+    if indice is None:
+        indice = IndiceNombres.desde_registro(df_municipios)
+
+    # Cruzar cada fila de demanda con su municipio por la clave canónica del nombre
+    cruce = indice.cruzar(df_demanda['NOMBRE_ACTUAL'], df_demanda['PROVINCIA'])
+    resumen_cruce(cruce, df_demanda['NOMBRE_ACTUAL'], 'demanda')
+
+    # Convertir DENSIDADMM a numérico si es necesario (parece tener coma decimal)
+    densidad = df_demanda['DENSIDADMM'].astype(str).str.replace(',', '.').astype(float)
+
+    # Valores por fila del registro (si un municipio aparece dos veces se queda la primera)
+    filas = cruce['Fila'].to_numpy()
+    valores = pd.DataFrame({'DENSIDADMM': densidad.to_numpy(), '4G': df_demanda['4G'].to_numpy()})
+    valores = valores[filas >= 0].set_axis(filas[filas >= 0])
+    valores = valores[~valores.index.duplicated()]
+    posiciones = pd.RangeIndex(len(df_municipios))
+    for col in ['DENSIDADMM', '4G']:
+        df_municipios[col] = valores[col].reindex(posiciones).to_numpy()
+    return df_municipios
+
+
+def main():
+    # Cargar los archivos
+    df_municipios = pd.read_csv('registro-de-municipios-de-castilla-y-leon.csv')
+    df_demanda = pd.read_csv('datos_demanda_final_scaled.csv')
+
+    df_final = unir_densidad_4g(df_municipios, df_demanda)
+
+    # Guardar el resultado
+    df_final.to_csv('registro-de-municipios-de-castilla-y-leon.csv', index=False)
+
+    # Mostrar las primeras filas para verificar
+    print(df_final.head())
+    print(df_final.info())
+
+
+if __name__ == "__main__":
+    main()
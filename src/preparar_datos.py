@@ -0,0 +1,235 @@
+"""
+Preparación del registro de municipios como un grafo de etapas con caché.
+
+Sustituye a ejecutar a mano y en orden procesar_transplates_hospitales_dificil_acceso.py,
+procesar_accidentes.py, procesar_cp_centros_sanitarios.py y
+juntar_densidad_cobertura_al_csv_global.py, que leían y sobrescribían uno tras
+otro el mismo csv. Aquí cada etapa calcula sus propias columnas a partir de la
+etapa 'base' (el registro sin limpiar) y de sus archivos fuente. La etapa
+'nombres' construye una sola vez el índice de nombres del registro
+(helipuertos/nombres.py), que usan las etapas que cruzan por nombre de
+municipio. Las cuatro etapas de variables no dependen unas de otras, así que
+se calculan a la vez en un pool de procesos, y al final sus columnas se unen
+por Cod_Municipio y Cod_Provincia en el csv final.
+
+El registro se guarda en Parquet con tipos (helipuertos/registro.py) y se
+exporta también a csv, el formato que leían los scripts.
+
+Con --cache los resultados de cada etapa se guardan por hash de su contenido
+(helipuertos/etl.py): al volver a ejecutar solo se recalculan las etapas cuyas
+entradas han cambiado.
+
+Uso (desde src/):
+
+    python preparar_datos.py --datos ../data --cache ../data/cache_etl
+
+La etapa 'conteo_centros' cuenta los centros sanitarios de cada municipio por
+tipo; de ella sale 'tiene_centro' y los conteos se guardan aparte en
+centros-por-municipio.csv, como hacía procesar_cp_centros_sanitarios.py.
+
+Los archivos de centros sanitarios y de códigos postales no están en data/; con
+--conservar centros las columnas de esa etapa se toman de una copia fija del
+registro (ARCHIVO_CONSERVADO, que se crea a partir del csv actual la primera vez)
+y no se escriben los conteos. La copia no la sobrescribe ninguna ejecución, así
+que el resultado no depende de lo que dejó la anterior.
+"""
+import argparse
+import os
+import shutil
+import time
+
+import pandas as pd
+
+from helipuertos.etl import CLAVES, Etapa, ejecutar_etapas, unir_etapas
+from helipuertos.nombres import IndiceNombres
+from helipuertos.registro import guardar_registro
+from juntar_densidad_cobertura_al_csv_global import unir_densidad_4g
+from procesar_accidentes import asignar_accidentes_por_bloques
+from procesar_cp_centros_sanitarios import centros_por_municipio
+from procesar_transplates_hospitales_dificil_acceso import calcular_hospitales_dificultad
+
+ARCHIVO_REGISTRO_SIN_LIMPIAR = 'registro-de-municipios_sin-limpiar.csv'
+ARCHIVOS_ACCIDENTES = ['accidentalidad-por-carreteras.csv']
+ARCHIVO_CENTROS = 'centros-sanitarios-cyl.csv'
+ARCHIVO_CODIGOS_POSTALES = 'codigos_postales_municipales.csv'
+ARCHIVO_DEMANDA = 'datos_demanda_final_densidad_4g_scaled.csv'
+ARCHIVO_SALIDA = 'registro-de-municipios-de-castilla-y-leon.parquet'
+ARCHIVO_CSV = 'registro-de-municipios-de-castilla-y-leon.csv'
+#Copia fija del registro de la que salen las columnas de las etapas conservadas.
+ARCHIVO_CONSERVADO = 'registro-de-municipios-conservado.csv'
+ARCHIVO_CENTROS_POR_MUNICIPIO = 'centros-por-municipio.csv'
+
+#Columnas del registro sin limpiar que pasan tal cual al registro final.
+COLUMNAS_BASE = ['Municipio', 'Cod_Municipio', 'Provincia', 'Cod_Provincia', 'Población',
+                 'Longitud', 'Latitud', 'CoordenadaX', 'CoordenadaY', 'Posición',
+                 'presencia_de_comercio']
+COLUMNAS_HOSPITALES = ['Tiene_Hospital', 'Transplantes', 'Dificultad_Acceso']
+COLUMNAS_ACCIDENTES = ['Accidentes_Raw', 'Accidentes_Por_Carretera']
+COLUMNAS_CENTROS = ['tiene_centro']
+COLUMNAS_DENSIDAD = ['DENSIDADMM', '4G']
+#Módulos con el código de cada etapa: si cambian, la etapa se recalcula aunque esté en caché.
+MODULOS_ETAPAS = {
+    'nombres': ['helipuertos.nombres'],
+    'hospitales': ['procesar_transplates_hospitales_dificil_acceso', 'helipuertos.nombres',
+                   'helipuertos.orografia'],
+    'accidentes': ['procesar_accidentes', 'helipuertos.texto'],
+    'conteo_centros': ['procesar_cp_centros_sanitarios', 'helipuertos.nombres'],
+    'centros': [],
+    'densidad': ['juntar_densidad_cobertura_al_csv_global', 'helipuertos.nombres'],
+    'conservada': [],
+}
+#Orden de las columnas del registro final (el mismo que dejaban los scripts).
+COLUMNAS_REGISTRO = (COLUMNAS_BASE + COLUMNAS_HOSPITALES + COLUMNAS_ACCIDENTES +
+                     COLUMNAS_CENTROS + COLUMNAS_DENSIDAD)
+
+
+def etapa_base(registro):
+    """Registro sin limpiar: columnas base con las coordenadas ya numéricas."""
+    try:
+        df = pd.read_csv(registro, sep=";", encoding="utf-8")
+    except UnicodeDecodeError:
+        df = pd.read_csv(registro, sep=";", encoding="latin-1")
+    #Las coordenadas se limpian en la etapa de hospitales; aquí solo se conservan las columnas.
+    return df[COLUMNAS_BASE]
+
+
+def etapa_nombres(base):
+    """Índice de nombres del registro, con el índice de trigramas ya construido."""
+    return IndiceNombres.desde_registro(base).preparar_difuso()
+
+
+def etapa_hospitales(base, zonas=None, altitud=None):
+    return calcular_hospitales_dificultad(base, zonas, altitud)
+
+
+def etapa_accidentes(base, accidentes):
+    municipios, _ = asignar_accidentes_por_bloques(base, accidentes)
+    return municipios
+
+
+def etapa_conteo_centros(base, nombres, centros, codigos_postales):
+    """Centros de cada municipio en total ('num_centros_cp') y por tipo ('num_centros_<tipo>')."""
+    conteos = centros_por_municipio(base, pd.read_csv(centros, sep=";"), pd.read_csv(codigos_postales),
+                                    indice=nombres)
+    return pd.concat([base[CLAVES + ['Municipio', 'Provincia']], conteos], axis=1)
+
+
+def etapa_centros(conteo_centros):
+    return conteo_centros.assign(tiene_centro=(conteo_centros['num_centros_cp'] > 0).astype(int))
+
+
+def etapa_densidad(base, nombres, demanda):
+    return unir_densidad_4g(base, pd.read_csv(demanda), indice=nombres)
+
+
+def etapa_conservada(registro, columnas):
+    """Columnas tomadas tal cual de la copia fija del registro (para fuentes que no están disponibles)."""
+    return pd.read_csv(registro, usecols=CLAVES + list(columnas))
+
+
+def crear_registro_conservado(datos):
+    """
+    Crea ARCHIVO_CONSERVADO copiando el registro csv actual si aún no existe.
+
+    Devuelve su ruta. Una vez creado no se vuelve a tocar: para tomar las
+    columnas de otro registro hay que borrarlo o sustituirlo a mano.
+    """
+    destino = os.path.join(datos, ARCHIVO_CONSERVADO)
+    if not os.path.exists(destino):
+        shutil.copyfile(os.path.join(datos, ARCHIVO_CSV), destino)
+        print(f"Copia fija de las columnas conservadas creada en: {destino}")
+    return destino
+
+
+def definir_etapas(datos, conservar=(), zonas=None, altitud=None):
+    """
+    Etapas de la preparación con sus archivos dentro de la carpeta 'datos'.
+
+    conservar: etapas ('centros', 'densidad', ...) cuyas columnas se toman de
+        ARCHIVO_CONSERVADO en lugar de recalcularse.
+    zonas, altitud: GeoJSON de zonas montañosas y ráster .asc para la dificultad.
+    """
+    ruta = lambda nombre: os.path.join(datos, nombre)
+    etapas = {
+        'base': Etapa('base', etapa_base, COLUMNAS_BASE,
+                      archivos={'registro': ruta(ARCHIVO_REGISTRO_SIN_LIMPIAR)}),
+        #Sin columnas: su resultado es el IndiceNombres que usan centros y densidad.
+        'nombres': Etapa('nombres', etapa_nombres, None, depende_de=['base'],
+                         modulos=MODULOS_ETAPAS['nombres']),
+        'hospitales': Etapa('hospitales', etapa_hospitales, ['Longitud', 'Latitud'] + COLUMNAS_HOSPITALES,
+                            depende_de=['base'], archivos={'zonas': zonas, 'altitud': altitud},
+                            modulos=MODULOS_ETAPAS['hospitales']),
+        'accidentes': Etapa('accidentes', etapa_accidentes, COLUMNAS_ACCIDENTES, depende_de=['base'],
+                            archivos={'accidentes': [ruta(a) for a in ARCHIVOS_ACCIDENTES]},
+                            modulos=MODULOS_ETAPAS['accidentes']),
+        #Sin columnas: los tipos de centro dependen de los datos, así que sus conteos no van al
+        #registro sino a ARCHIVO_CENTROS_POR_MUNICIPIO.
+        'conteo_centros': Etapa('conteo_centros', etapa_conteo_centros, None, depende_de=['base', 'nombres'],
+                                archivos={'centros': ruta(ARCHIVO_CENTROS),
+                                          'codigos_postales': ruta(ARCHIVO_CODIGOS_POSTALES)},
+                                modulos=MODULOS_ETAPAS['conteo_centros']),
+        'centros': Etapa('centros', etapa_centros, COLUMNAS_CENTROS, depende_de=['conteo_centros'],
+                         modulos=MODULOS_ETAPAS['centros']),
+        'densidad': Etapa('densidad', etapa_densidad, COLUMNAS_DENSIDAD, depende_de=['base', 'nombres'],
+                          archivos={'demanda': ruta(ARCHIVO_DEMANDA)}, modulos=MODULOS_ETAPAS['densidad']),
+    }
+    if 'centros' in conservar:
+        del etapas['conteo_centros']
+    for nombre in conservar:
+        etapas[nombre] = Etapa(nombre, etapa_conservada, etapas[nombre].columnas,
+                               archivos={'registro': ruta(ARCHIVO_CONSERVADO)},
+                               parametros={'columnas': etapas[nombre].columnas},
+                               modulos=MODULOS_ETAPAS['conservada'])
+    return list(etapas.values())
+
+
+def construir_registro(resultados):
+    """Une las columnas de todas las etapas por Cod_Municipio y Cod_Provincia."""
+    #Las coordenadas de 'hospitales' (ya limpias) sustituyen a las de 'base'.
+    registro = unir_etapas(resultados, ['base', 'hospitales', 'accidentes', 'centros', 'densidad'])
+    return registro[COLUMNAS_REGISTRO]
+
+
+def _argumentos():
+    parser = argparse.ArgumentParser(description="Genera el registro de municipios por etapas con caché.")
+    parser.add_argument('--datos', default='../data', help="carpeta con los archivos fuente")
+    parser.add_argument('--salida', default=None,
+                        help=f"registro en Parquet (por defecto DATOS/{ARCHIVO_SALIDA})")
+    parser.add_argument('--csv', default=None,
+                        help=f"csv de exportación (por defecto DATOS/{ARCHIVO_CSV})")
+    parser.add_argument('--sin-csv', action='store_true', help="no exportar el registro a csv")
+    parser.add_argument('--cache', default=None, help="carpeta de la caché de etapas")
+    parser.add_argument('--forzar', nargs='*', default=[], help="etapas que se recalculan siempre")
+    parser.add_argument('--conservar', nargs='*', default=[], choices=['hospitales', 'accidentes',
+                                                                       'centros', 'densidad'],
+                        help=f"etapas cuyas columnas se toman de DATOS/{ARCHIVO_CONSERVADO}")
+    parser.add_argument('--procesos', type=int, default=None,
+                        help="procesos del pool (por defecto, uno por núcleo; 1 = sin pool)")
+    parser.add_argument('--zonas', default=None, help="GeoJSON de zonas montañosas")
+    parser.add_argument('--altitud', default=None, help="ráster de altitudes (.asc)")
+    return parser.parse_args()
+
+
+def main():
+    args = _argumentos()
+    if args.conservar:
+        crear_registro_conservado(args.datos)
+    etapas = definir_etapas(args.datos, args.conservar, args.zonas, args.altitud)
+    inicio = time.perf_counter()
+    resultados, informe = ejecutar_etapas(etapas, args.cache, forzar=args.forzar, n_procesos=args.procesos)
+    registro = construir_registro(resultados)
+    for nombre, estado, segundos in informe:
+        print(f"{nombre:<15} {estado:<10} {segundos:7.2f} s")
+    print(f"Total: {time.perf_counter() - inicio:.2f} s")
+    salida = guardar_registro(registro, args.salida or os.path.join(args.datos, ARCHIVO_SALIDA))
+    print(f"Registro guardado en: {salida} ({len(registro)} municipios)")
+    if not args.sin_csv:
+        print(f"Exportado a csv: {guardar_registro(registro, args.csv or os.path.join(args.datos, ARCHIVO_CSV))}")
+    if 'conteo_centros' in resultados:
+        ruta_conteos = os.path.join(args.datos, ARCHIVO_CENTROS_POR_MUNICIPIO)
+        resultados['conteo_centros'].to_csv(ruta_conteos, index=False)
+        print(f"Centros por municipio y tipo guardados en: {ruta_conteos}")
+
+
+if __name__ == '__main__':
+    main()
@@ -2,6 +2,8 @@ import pandas as pd
 import numpy as np
 from sklearn.preprocessing import MinMaxScaler
 
+from helipuertos.texto import BuscadorSubcadenas
+
 """
 INFORME SOBRE EL PROCESADO DE LA COLUMNA ACCIDENTES:
 
@@ -9,7 +11,8 @@ Hemos sacado el dataset de accidentalidad-por-carreteras de
 https://datosabiertos.jcyl.es/web/jcyl/set/es/transporte/accidentalidad-carreteras/1284967604431
 Para cada accidente registrado, el programa analiza la descripción textual del tramo 
 (por ejemplo, "DE BU-550 A MEDINA DE POMAR (N-629)") y busca coincidencias con los nombres 
-de municipios mediante comparación de cadenas de texto en mayúsculas.
+de municipios mediante comparación de cadenas de texto en mayúsculas. La búsqueda usa un
+autómata de Aho-Corasick con todos los nombres, que recorre cada descripción una sola vez.
 
 Cuando encuentra uno o varios municipios mencionados en la descripción del accidente, 
 calcula un "peso de gravedad" basado en una fórmula que pondera diferentes variables: 
@@ -31,89 +34,88 @@ integrado en modelos predictivos de demanda hospitalaria
 
 """
 
-def cargar_datos():
-    """Carga los archivos CSV"""
-    try:
-        municipios = pd.read_csv(
-            'registro-de-municipios-de-castilla-y-leon.csv', 
-            sep=';'
-        )
-        accidentes = pd.read_csv(
-            'data/accidentalidad-por-carreteras.csv', 
-            sep=';',
-            decimal=','
-        )
-        return municipios, accidentes
-    except FileNotFoundError as e:
-        print(f"Error: {e}")
-        print("Asegúrate de que los archivos están en la carpeta 'data/'")
-        return None, None
+# Accidentes: solo las columnas que se usan; los conteos se leen ya como números
+# (todas las exportaciones usan punto decimal en ellos)
+COLUMNAS_ACCIDENTES = ['NOMBRE', 'DESCRIPCIÓN', 'ACV', 'MUERTOS', 'HERIDOS']
+TIPOS_ACCIDENTES = {'NOMBRE': str, 'DESCRIPCIÓN': str, 'ACV': 'float64', 'MUERTOS': 'float64',
+                    'HERIDOS': 'float64'}
+# Archivos de accidentes que se procesan por bloques (uno por año o por región)
+ARCHIVOS_ACCIDENTES = ['data/accidentalidad-por-carreteras.csv']
+TAM_BLOQUE_ACCIDENTES = 50000
 
-def asignar_accidentes_a_municipios(municipios_df, accidentes_df):
+# Mapeo de códigos de carretera a provincias
+CODIGO_A_PROVINCIA = {
+    'BU': 'BURGOS', 'LE': 'LEÓN', 'SA': 'SALAMANCA',
+    'ZA': 'ZAMORA', 'VA': 'VALLADOLID', 'SO': 'SORIA',
+    'SG': 'SEGOVIA', 'AV': 'ÁVILA', 'P': 'PALENCIA'
+}
+
+def calcular_pesos_accidentes(accidentes_df):
     """
-    Asigna accidentes a municipios basándose en coincidencias de nombres
-    y normaliza el resultado entre 0 y 1
+    Peso de gravedad de cada accidente: heridos*0.5 + muertos*1.0 + ACV*0.3,
+    con 0.1 como mínimo para los accidentes sin víctimas.
     """
-    # Hacer copia para no modificar el original
-    municipios = municipios_df.copy()
-    
-    # Inicializar la columna de accidentes
-    municipios['Accidentes_Raw'] = 0.0
-    
-    # Crear diccionario de búsqueda (municipio en mayúsculas)
+    heridos = accidentes_df['HERIDOS'].fillna(0).to_numpy(dtype=float)
+    muertos = accidentes_df['MUERTOS'].fillna(0).to_numpy(dtype=float)
+    acv = accidentes_df['ACV'].fillna(0).to_numpy(dtype=float)
+
+    peso = heridos * 0.5 + muertos * 1.0 + acv * 0.3
+    peso[peso == 0] = 0.1  # Valor mínimo
+    return peso
+
+def preparar_busqueda(municipios):
+    """
+    Estructuras de búsqueda que no dependen de los accidentes: el autómata con los
+    nombres de municipio y, por provincia, las posiciones de sus municipios.
+    """
+    # Diccionario de búsqueda (municipio en mayúsculas); con nombres repetidos gana el último
     municipios_upper = {muni.upper(): idx 
                        for idx, muni in enumerate(municipios['Municipio'])}
-    
-    # Procesar cada accidente
-    for _, acc in accidentes_df.iterrows():
-        descripcion = str(acc['DESCRIPCIÓN']).upper()
-        
-        # Calcular peso del accidente
-        heridos = float(acc['HERIDOS']) if pd.notna(acc['HERIDOS']) else 0
-        muertos = float(acc['MUERTOS']) if pd.notna(acc['MUERTOS']) else 0
-        acv = float(acc['ACV']) if pd.notna(acc['ACV']) else 0
-        
-        peso_accidente = (heridos * 0.5 + muertos * 1.0 + acv * 0.3)
-        if peso_accidente == 0:
-            peso_accidente = 0.1  # Valor mínimo
-        
-        # Buscar municipios en la descripción
-        municipios_encontrados = []
-        
-        for muni_nombre, muni_idx in municipios_upper.items():
-            if muni_nombre in descripcion:
-                municipios_encontrados.append(muni_idx)
-        
-        # Si encontramos municipios, distribuir el peso
-        if municipios_encontrados:
-            peso_por_municipio = peso_accidente / len(municipios_encontrados)
-            for idx in municipios_encontrados:
-                municipios.at[idx, 'Accidentes_Raw'] += peso_por_municipio
-        else:
-            # Si no encontramos, intentar por código de provincia
-            codigo_carretera = str(acc['NOMBRE'])
-            if '-' in codigo_carretera:
-                cod_prov = codigo_carretera.split('-')[0]
-                
-                # Mapeo de códigos a provincias
-                codigo_a_provincia = {
-                    'BU': 'BURGOS', 'LE': 'LEÓN', 'SA': 'SALAMANCA',
-                    'ZA': 'ZAMORA', 'VA': 'VALLADOLID', 'SO': 'SORIA',
-                    'SG': 'SEGOVIA', 'AV': 'ÁVILA', 'P': 'PALENCIA'
-                }
-                
-                if cod_prov in codigo_a_provincia:
-                    provincia_nombre = codigo_a_provincia[cod_prov]
-                    # Obtener índices de municipios de esa provincia
-                    idxs_provincia = municipios[
-                        municipios['Provincia'] == provincia_nombre
-                    ].index.tolist()
-                    
-                    if idxs_provincia:
-                        peso_por_municipio = peso_accidente / len(idxs_provincia)
-                        for idx in idxs_provincia:
-                            municipios.at[idx, 'Accidentes_Raw'] += peso_por_municipio
-    
+    # Autómata con todos los nombres: encuentra en una sola pasada por la descripción
+    # todos los municipios que aparecen en ella (igual que 'muni_nombre in descripcion').
+    buscador = BuscadorSubcadenas(municipios_upper)
+    provincias = municipios['Provincia'].to_numpy()
+    indices_provincia = {prov: np.flatnonzero(provincias == prov)
+                         for prov in CODIGO_A_PROVINCIA.values()}
+    return buscador, indices_provincia
+
+def acumular_pesos_accidentes(accidentes_df, buscador, indices_provincia, acumulado):
+    """
+    Suma al array 'acumulado' (uno por municipio) el peso de un bloque de accidentes.
+
+    Cada accidente reparte su peso a partes iguales entre los municipios que aparecen en
+    su descripción o, si no aparece ninguno, entre los de la provincia de la carretera.
+    Los repartos por descripción se expanden a pares (accidente, municipio, parte) y se
+    suman de una vez; los de provincia se suman por provincia (bincount) y cada total
+    se reparte una sola vez entre sus municipios, así que la memoria es del orden de
+    accidentes + municipios. Devuelve 'acumulado', modificado en el sitio.
+    """
+    peso = calcular_pesos_accidentes(accidentes_df)
+
+    # Buscar municipios en la descripción
+    encontrados = [buscador.buscar(str(d).upper()) for d in accidentes_df['DESCRIPCIÓN']]
+    n_encontrados = np.fromiter((len(e) for e in encontrados), dtype=np.int64, count=len(encontrados))
+    acc_desc = np.repeat(np.arange(len(peso)), n_encontrados)
+    muni_desc = np.fromiter((idx for e in encontrados for idx in e), dtype=np.int64,
+                            count=int(n_encontrados.sum()))
+    np.add.at(acumulado, muni_desc, peso[acc_desc] / n_encontrados[acc_desc])
+
+    # Si no encontramos, por código de provincia de la carretera (p. ej. "BU" de "BU-551")
+    codigos = accidentes_df['NOMBRE'].map(str)
+    provincia = codigos.str.split('-').str[0].map(CODIGO_A_PROVINCIA)
+    provincia = provincia.where(codigos.str.contains('-', regex=False).to_numpy() & (n_encontrados == 0))
+    # Posición de la provincia de cada accidente en indices_provincia (-1 si no tiene)
+    posicion = pd.Categorical(provincia, categories=list(indices_provincia)).codes
+    con_provincia = posicion >= 0
+    totales = np.bincount(posicion[con_provincia], weights=peso[con_provincia],
+                          minlength=len(indices_provincia))
+    for total, idxs_provincia in zip(totales, indices_provincia.values()):
+        if len(idxs_provincia):
+            acumulado[idxs_provincia] += total / len(idxs_provincia)
+    return acumulado
+
+def _normalizar_accidentes(municipios):
+    """Añade 'Accidentes_Por_Carretera': 'Accidentes_Raw' normalizado entre 0 y 1."""
     # Normalizar a rango 0-1
     scaler = MinMaxScaler()
     valores_accidentes = municipios['Accidentes_Raw'].values.reshape(-1, 1)
@@ -126,19 +128,58 @@ def asignar_accidentes_a_municipios(municipios_df, accidentes_df):
     
     return municipios
 
+def asignar_accidentes_a_municipios(municipios_df, accidentes_df):
+    """
+    Asigna accidentes a municipios basándose en coincidencias de nombres
+    y normaliza el resultado entre 0 y 1
+    """
+    # Hacer copia para no modificar el original
+    municipios = municipios_df.copy()
+    
+    buscador, indices_provincia = preparar_busqueda(municipios)
+    municipios['Accidentes_Raw'] = acumular_pesos_accidentes(
+        accidentes_df, buscador, indices_provincia, np.zeros(len(municipios)))
+    return _normalizar_accidentes(municipios)
+
+def asignar_accidentes_por_bloques(municipios_df, rutas_accidentes, tam_bloque=TAM_BLOQUE_ACCIDENTES):
+    """
+    Igual que asignar_accidentes_a_municipios, pero leyendo los accidentes por bloques.
+
+    rutas_accidentes: lista de csv de accidentes (por ejemplo, uno por año o región).
+    Solo se guarda en memoria un bloque de tam_bloque filas y el peso acumulado por
+    municipio; la normalización se aplica al final. El resultado es el de cargar
+    todos los accidentes de una vez salvo el redondeo del orden de las sumas en
+    'Accidentes_Raw' (del orden de 1e-15 relativo; 'Accidentes_Por_Carretera', con
+    4 decimales, no cambia). Devuelve (municipios, n_accidentes).
+    """
+    municipios = municipios_df.copy()
+    buscador, indices_provincia = preparar_busqueda(municipios)
+    acumulado = np.zeros(len(municipios))
+    n_accidentes = 0
+    for ruta in rutas_accidentes:
+        for bloque in pd.read_csv(ruta, sep=';', usecols=COLUMNAS_ACCIDENTES,
+                                  dtype=TIPOS_ACCIDENTES, chunksize=tam_bloque):
+            acumular_pesos_accidentes(bloque, buscador, indices_provincia, acumulado)
+            n_accidentes += len(bloque)
+    municipios['Accidentes_Raw'] = acumulado
+    return _normalizar_accidentes(municipios), n_accidentes
+
 def main():
     """Función principal"""
     print("Cargando datos...")
-    municipios, accidentes = cargar_datos()
-    
-    if municipios is None or accidentes is None:
+    try:
+        municipios = pd.read_csv('registro-de-municipios-de-castilla-y-leon.csv', sep=';')
+        print(f"Municipios cargados: {len(municipios)}")
+        
+        # Los accidentes se leen por bloques: la memoria no crece con el número de años
+        print("\nProcesando asignación de accidentes...")
+        municipios_con_accidentes, n_accidentes = asignar_accidentes_por_bloques(
+            municipios, ARCHIVOS_ACCIDENTES)
+    except FileNotFoundError as e:
+        print(f"Error: {e}")
+        print("Asegúrate de que los archivos están en la carpeta 'data/'")
         return
-    
-    print(f"Municipios cargados: {len(municipios)}")
-    print(f"Registros de accidentes: {len(accidentes)}")
-    
-    print("\nProcesando asignación de accidentes...")
-    municipios_con_accidentes = asignar_accidentes_a_municipios(municipios, accidentes)
+    print(f"Registros de accidentes: {n_accidentes}")
     
     # Mostrar algunos resultados
     print("\nPrimeros 10 municipios con índice de accidentes:")
@@ -5,80 +5,140 @@ Created on Mon Dec  8 17:06:16 2025
 @author: Usuario
 """
 
+import numpy as np
 import pandas as pd
 
-centros = pd.read_csv("centros-sanitarios-cyl.csv", sep=";")
-municipios = pd.read_csv("registro-de-municipios-de-castilla-y-leon.csv", sep=";")
-CP = pd.read_csv("codigos_postales_municipales.csv")
-
-
-centros_por_cp = centros.groupby("Código postal").size().reset_index(name="num_centros_cp")
-#print(centros_por_cp)
-
-centros_por_cp = centros_por_cp.rename(columns={"Código postal": "codigo_postal"})
-
-# En la tabla de centros
-centros_por_cp["codigo_postal"] = (
-    centros_por_cp["codigo_postal"]
-    .astype(float)      # por si viene mezclado
-    .astype(int)        # quita los decimales
-    .astype(str)        # lo pasa a texto
-    .str.zfill(5)       # asegura formato 5 dígitos (opcional pero recomendado)
-)
-
-CP["codigo_postal"] = (
-    CP["codigo_postal"]
-    .astype(str)
-    .str.strip()
-    .str.zfill(5)
-)
-
-
-centros_cp_muni = centros_por_cp.merge(CP, on="codigo_postal", how="left")
-
-#print(centros_cp_muni)
-
-centros_cp_muni = centros_cp_muni.dropna(subset=["nombre"])
-
-#centros_por_muni = centros_cp_muni.groupby("nombre")["num_centros_cp"].sum().reset_index()
-
-centros_por_muni = centros_cp_muni[["nombre", "num_centros_cp"]].copy()
-
-centros_por_muni = (
-    centros_por_muni
-    .groupby("nombre", as_index=False)["num_centros_cp"]
-    .sum()
-)
-
-#print(centros_por_muni.head())
-
-import unidecode
-
-def normalizar(nombre):
-    if pd.isna(nombre):
-        return ""
-    nombre = nombre.lower()                 # minúsculas
-    nombre = unidecode.unidecode(nombre)    # quitar acentos
-    nombre = nombre.replace(",", " ")       # quitar comas
-    nombre = nombre.replace(".", " ")
-    nombre = nombre.replace("(", "").replace(")", "")
-    nombre = " ".join(nombre.split())       # quitar dobles espacios
-    return nombre
-
-centros_por_muni["muni_norm"] = centros_por_muni["nombre"].apply(normalizar)
-municipios["muni_norm"] = municipios["Municipio"].apply(normalizar)
-
-municipios_merge = municipios.merge(
-    centros_por_muni[["muni_norm", "num_centros_cp"]],
-    on="muni_norm",
-    how="left"
-)
-
-municipios_merge["num_centros_cp"] = municipios_merge["num_centros_cp"].fillna(0).astype(int)
-
-municipios_merge["tiene_centro"] = (municipios_merge["num_centros_cp"] > 0).astype(int)
-
-municipios_merge = municipios_merge.drop(columns=["Cod_INE", "Mancomunidades", "Entidades_Locales_Menores", "Comarca", "num_centros_cp", "muni_norm"])
-
-municipios_merge.to_csv("registro-de-municipios-de-castilla-y-leon.csv", index=False)
-
+from helipuertos.nombres import IndiceNombres, clave_nombre, resumen_cruce
+
+# Columna de la tabla de centros con el tipo de centro (si no está, solo se cuenta el total)
+COLUMNA_TIPO_CENTRO = "Tipo de centro"
+# Los códigos postales tienen 5 cifras: sirven directamente de índice de un array
+N_CODIGOS_POSTALES = 100000
+
+
+def codigos_postales_enteros(serie):
+    """Códigos postales como enteros (acepta 5430, 5430.0, "05430"); -1 si no son un código válido."""
+    codigos = pd.to_numeric(pd.Series(serie), errors="coerce")
+    codigos = codigos.where((codigos >= 0) & (codigos < N_CODIGOS_POSTALES))
+    return codigos.fillna(-1).to_numpy().astype(np.int64)
+
+
+def columna_tipo(tipo):
+    """Nombre de la columna con el número de centros de un tipo."""
+    return "num_centros_" + clave_nombre(tipo).lower().replace(" ", "_")
+
+
+def columnas_tipos(tipos):
+    """
+    columna_tipo de cada tipo, sin repetir nombres.
+
+    Dos tipos distintos pueden dar la misma clave ("Consultorio" y "CONSULTORIO ");
+    el segundo y siguientes llevan un sufijo (_2, _3...) para no sobrescribirse.
+    """
+    columnas = []
+    for tipo in tipos:
+        columna, k = columna_tipo(tipo), 2
+        while columna in columnas:
+            columna, k = f"{columna_tipo(tipo)}_{k}", k + 1
+        columnas.append(columna)
+    return columnas
+
+
+def centros_por_municipio(municipios, centros, CP, indice=None):
+    """
+    Número de centros sanitarios de cada municipio, en total y por tipo.
+
+    Cada nombre de la tabla de códigos postales se cruza una vez con el registro
+    (IndiceNombres); después todo se hace con códigos postales enteros, que
+    indexan un array: los centros se cuentan por código y tipo en una sola
+    pasada (bincount) y cada par código-municipio suma los centros de su
+    código. Un código compartido por varios municipios cuenta para todos ellos,
+    como antes. Un nombre que está en dos provincias (ambiguo sin provincia) se
+    resuelve con la provincia del código postal, sus dos primeras cifras.
+    Imprime cuántos centros se quedan sin municipio.
+
+    Devuelve un DataFrame alineado con 'municipios' con 'num_centros_cp' y una
+    columna 'num_centros_<tipo>' por tipo de centro (si hay COLUMNA_TIPO_CENTRO).
+    """
+    if indice is None:
+        indice = IndiceNombres.desde_registro(municipios)
+
+    # Pares (código postal, fila del registro), sin repetir
+    nombres = CP["nombre"].drop_duplicates()
+    cruce = indice.cruzar(nombres)
+    resumen_cruce(cruce, nombres, "códigos postales")
+    fila_por_nombre = pd.Series(cruce["Fila"].to_numpy(), index=nombres.to_numpy())
+    pares = pd.DataFrame({"codigo": codigos_postales_enteros(CP["codigo_postal"]),
+                          "fila": fila_por_nombre.reindex(CP["nombre"]).fillna(-1).to_numpy().astype(np.int64)})
+
+    # Los nombres ambiguos se vuelven a cruzar con la provincia de su código postal
+    ambiguos = (CP["nombre"].isin(nombres[(cruce["Cruce"] == "ambiguo").to_numpy()]).to_numpy()
+                & (pares["codigo"].to_numpy() >= 0))
+    if ambiguos.any():
+        provincia_por_codigo = pd.Series(dict(zip(indice.cod_provincia, indice.claves_provincia)))
+        provincias = provincia_por_codigo.reindex(pares["codigo"].to_numpy()[ambiguos] // 1000).to_numpy()
+        cruce_provincia = indice.cruzar(CP["nombre"][ambiguos], provincias, difuso=False)
+        pares.loc[ambiguos, "fila"] = cruce_provincia["Fila"].to_numpy()
+        print(f"  ambiguos resueltos por código postal: {int((cruce_provincia['Fila'] >= 0).sum())} "
+              f"de {int(ambiguos.sum())}")
+    pares = pares[(pares["codigo"] >= 0) & (pares["fila"] >= 0)].drop_duplicates()
+
+    # Centros por código postal y tipo en una sola pasada: los códigos (5 cifras) indexan el array
+    codigo_centro = codigos_postales_enteros(centros["Código postal"])
+    if COLUMNA_TIPO_CENTRO in centros.columns:
+        tipo_centro, tipos = pd.factorize(centros[COLUMNA_TIPO_CENTRO].fillna("Sin tipo"))
+    else:
+        tipo_centro, tipos = np.zeros(len(centros), dtype=np.int64), []
+    n_tipos = max(len(tipos), 1)
+    validos = codigo_centro >= 0
+    sin_municipio = int((~np.isin(codigo_centro, pares["codigo"].to_numpy())).sum())
+    if sin_municipio:
+        print(f"Centros sin municipio (código postal no válido o sin municipio del registro): "
+              f"{sin_municipio} de {len(centros)}")
+    por_codigo = np.bincount(codigo_centro[validos] * n_tipos + tipo_centro[validos],
+                             minlength=N_CODIGOS_POSTALES * n_tipos).reshape(N_CODIGOS_POSTALES, n_tipos)
+
+    # Cada par suma los centros de su código a su municipio
+    por_municipio = np.zeros((len(municipios), n_tipos), dtype=np.int64)
+    np.add.at(por_municipio, pares["fila"].to_numpy(), por_codigo[pares["codigo"].to_numpy()])
+
+    resultado = pd.DataFrame({"num_centros_cp": por_municipio.sum(axis=1)}, index=municipios.index)
+    for k, columna in enumerate(columnas_tipos(tipos)):
+        resultado[columna] = por_municipio[:, k]
+    return resultado
+
+
+def marcar_municipios_con_centro(municipios, centros, CP, indice=None):
+    """
+    Añade a los municipios 'num_centros_cp', los centros por tipo ('num_centros_<tipo>')
+    y 'tiene_centro' (1 si tienen algún centro).
+
+    indice: IndiceNombres del registro (se construye con 'municipios' si no se pasa).
+    Un nombre que se repite en dos provincias se asigna con la provincia de su
+    código postal (centros_por_municipio).
+    """
+    conteos = centros_por_municipio(municipios, centros, CP, indice)
+    municipios = pd.concat([municipios, conteos], axis=1)
+    municipios["tiene_centro"] = (municipios["num_centros_cp"] > 0).astype(int)
+    return municipios
+
+
+def main():
+    centros = pd.read_csv("centros-sanitarios-cyl.csv", sep=";")
+    municipios = pd.read_csv("registro-de-municipios-de-castilla-y-leon.csv", sep=";")
+    CP = pd.read_csv("codigos_postales_municipales.csv")
+
+    municipios_merge = marcar_municipios_con_centro(municipios, centros, CP)
+
+    # Los conteos por tipo se guardan aparte; el registro solo lleva tiene_centro
+    columnas_conteo = [c for c in municipios_merge.columns if c.startswith("num_centros_")]
+    municipios_merge[["Cod_Municipio", "Cod_Provincia", "Municipio", "Provincia"] + columnas_conteo].to_csv(
+        "centros-por-municipio.csv", index=False)
+
+    municipios_merge = municipios_merge.drop(columns=["Cod_INE", "Mancomunidades", "Entidades_Locales_Menores", "Comarca"] + columnas_conteo)
+
+    municipios_merge.to_csv("registro-de-municipios-de-castilla-y-leon.csv", index=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,10 @@
+import json
+
 import pandas as pd
 import numpy as np
-import unicodedata
+
+from helipuertos.nombres import claves_nombres
+from helipuertos.orografia import dificultad_orografica
 
 
 # Municipios con Hospital sacado de la junta dde castilla y león
@@ -26,66 +30,135 @@ capitales = {
     "SORIA": (41.76, -2.47), "VALLADOLID": (41.65, -4.72), "ZAMORA": (41.50, -5.75)
 }
 
-def normalize_text(text):
-    if not isinstance(text, str): return ""
-    return unicodedata.normalize('NFD', text.upper()).encode('ascii', 'ignore').decode("utf-8").strip()
-
 def haversine(lat1, lon1, lat2, lon2):
     R = 6371 
     dlat, dlon = np.radians(lat2 - lat1), np.radians(lon2 - lon1)
     a = np.sin(dlat/2)**2 + np.cos(np.radians(lat1)) * np.cos(np.radians(lat2)) * np.sin(dlon/2)**2
     return R * 2 * np.arctan2(np.sqrt(a), np.sqrt(1-a))
     
+# Principales zonas montañosas: (zona, lat_min, lat_max, lon_min, lon_max, dificultad).
+# Los límites son exclusivos y se evalúan en este orden: cada municipio toma la
+# dificultad de la primera zona en la que cae (Sanabria no necesita lat_max
+# porque lo que está por encima de 42.2 ya es Bierzo o Ancares).
+ZONAS_MONTANOSAS = [
+    ("Cordillera Cantábrica", 42.8, np.inf, -np.inf, np.inf, 1.0),
+    ("Bierzo o Ancares", 42.2, np.inf, -np.inf, -6.2, 1.0),
+    ("Sanabria", 41.8, np.inf, -np.inf, -6.2, 0.9),
+    ("Gredos o Francia", -np.inf, 40.6, -np.inf, np.inf, 1.0),
+    ("Sistema Ibérico", 41.7, np.inf, -3.0, np.inf, 0.9),
+    ("Arribes", -np.inf, np.inf, -np.inf, -6.5, 0.8),
+]
+# Meseta o Llano
+DIFICULTAD_LLANO = 0.1
+
+# Zonas montañosas como polígonos (GeoJSON con la propiedad 'dificultad', en orden
+# de prioridad) y ráster de altitudes opcional (ASCII grid .asc). Con alguno de los
+# dos se usan en lugar de ZONAS_MONTANOSAS. La tabla es la referencia:
+# data/zonas_montanosas.geojson se genera a partir de ella con escribir_zonas_geojson
+# y da la misma dificultad en toda EXTENSION_ZONAS, límites incluidos.
+ARCHIVO_ZONAS_MONTANOSAS = None
+ARCHIVO_ALTITUD = None
+# Caja (lon_min, lat_min, lon_max, lat_max) a la que se recortan los límites infinitos
+# de ZONAS_MONTANOSAS al pasarlas a polígonos; cubre Castilla y León con margen.
+EXTENSION_ZONAS = (-7.5, 39.8, -1.5, 43.5)
+
 #comparacion con principales zonas montañosas
-def get_geo_difficulty(row):
-    lat, lon = row['Latitud'], row['Longitud']
-    
-    # Cordillera Cantábrica
-    if lat > 42.8: return 1.0
-    # Bierzo o Ancares
-    if lon < -6.2 and lat > 42.2: return 1.0
-    # Sanabria
-    if lon < -6.2 and 41.8 < lat <= 42.2: return 0.9
-    # Gredos o Francia
-    if lat < 40.6: return 1.0
-    # Sistema Ibérico
-    if lon > -3.0 and lat > 41.7: return 0.9
-    # Arribes
-    if lon < -6.5: return 0.8
-    # Meseta o Llano
-    return 0.1 
-#calcula distancia a capital de provincia
-def get_dist_score(row):
-    prov = normalize_text(row['Provincia'])
-    if prov in capitales:
-        d = haversine(row['Latitud'], row['Longitud'], *capitales[prov])
-        return min(d / 120.0, 1.0) 
-    return 0
-
-
-
-# Cargar el csv basico
-try:
-    df = pd.read_csv("registro-de-municipios-de-castilla-y-leon.csv", sep=";", encoding="utf-8")
-except:
-    df = pd.read_csv("registro-de-municipios-de-castilla-y-leon.csv", sep=";", encoding="latin-1")
-
-# Limpiar Coordenadas
-df['Latitud'] = df['Latitud'].apply(lambda x: float(str(x).replace(',', '.')))
-df['Longitud'] = df['Longitud'].apply(lambda x: float(str(x).replace(',', '.')))
-
-# Crear Columnas Lógicas
-df['Municipio_Norm'] = df['Municipio'].apply(normalize_text)
-df['Tiene_Hospital'] = df['Municipio_Norm'].apply(lambda x: 1 if x in municipios_con_hospital else 0)
-df['Transplantes'] = df['Municipio_Norm'].apply(lambda x: 1 if x in municipios_con_transplante else 0)
-df.drop(columns=['Municipio_Norm'], inplace=True)
-
-# Crear Columnas de Dificultad
-# Fórmula: 70% Orografía + 30% Distancia Capital
-df['Dificultad_Acceso'] = (df.apply(get_geo_difficulty, axis=1) * 0.7) + \
-                          (df.apply(get_dist_score, axis=1) * 0.3)
-df['Dificultad_Acceso'] = df['Dificultad_Acceso'].round(2)
-
-# Guardar en el nuevo csv
-output_file = "registro-de-municipios-de-castilla-y-leon.csv"
-df.to_csv(output_file, sep=";", index=False, encoding="utf-8")
+def get_geo_difficulty(lat, lon):
+    lat, lon = np.asarray(lat, dtype=float), np.asarray(lon, dtype=float)
+    condiciones = [(lat > lat_min) & (lat < lat_max) & (lon > lon_min) & (lon < lon_max)
+                   for _, lat_min, lat_max, lon_min, lon_max, _ in ZONAS_MONTANOSAS]
+    return np.select(condiciones, [zona[-1] for zona in ZONAS_MONTANOSAS], default=DIFICULTAD_LLANO)
+
+def zonas_geojson(zonas=ZONAS_MONTANOSAS, extension=EXTENSION_ZONAS):
+    """
+    FeatureCollection con las cajas de 'zonas' como polígonos, en el mismo orden.
+
+    El test punto-en-polígono de helipuertos/orografia.py deja dentro los puntos
+    sobre el borde izquierdo e inferior de una caja y la tabla los deja fuera, así
+    que esos dos bordes se mueven al siguiente float: los puntos sobre un límite
+    caen del mismo lado con las dos vías.
+    """
+    ext_lon_min, ext_lat_min, ext_lon_max, ext_lat_max = extension
+    features = []
+    for nombre, lat_min, lat_max, lon_min, lon_max, dificultad in zonas:
+        x_min = ext_lon_min if np.isinf(lon_min) else float(np.nextafter(lon_min, np.inf))
+        y_min = ext_lat_min if np.isinf(lat_min) else float(np.nextafter(lat_min, np.inf))
+        x_max = min(lon_max, ext_lon_max)
+        y_max = min(lat_max, ext_lat_max)
+        anillo = [[x_min, y_min], [x_max, y_min], [x_max, y_max], [x_min, y_max], [x_min, y_min]]
+        features.append({"type": "Feature", "properties": {"nombre": nombre, "dificultad": dificultad},
+                         "geometry": {"type": "Polygon", "coordinates": [anillo]}})
+    return {"type": "FeatureCollection", "features": features}
+
+def escribir_zonas_geojson(ruta="../data/zonas_montanosas.geojson", zonas=ZONAS_MONTANOSAS,
+                           extension=EXTENSION_ZONAS):
+    """Escribe zonas_geojson en 'ruta' (una feature por línea)."""
+    geojson = zonas_geojson(zonas, extension)
+    lineas = [json.dumps(feature, ensure_ascii=False) for feature in geojson["features"]]
+    with open(ruta, "w", encoding="utf-8") as f:
+        f.write('{"type": "FeatureCollection", "features": [\n  ' + ",\n  ".join(lineas) + "\n]}\n")
+    return ruta
+
+#calcula distancia a capital de provincia (0 si la provincia no tiene capital conocida)
+def get_dist_score(provincia_norm, lat, lon):
+    cap_lat = provincia_norm.map({prov: c[0] for prov, c in capitales.items()}).to_numpy(dtype=float)
+    cap_lon = provincia_norm.map({prov: c[1] for prov, c in capitales.items()}).to_numpy(dtype=float)
+    con_capital = provincia_norm.isin(list(capitales)).to_numpy()
+    d = haversine(np.asarray(lat, dtype=float), np.asarray(lon, dtype=float), cap_lat, cap_lon)
+    return np.where(con_capital, np.minimum(d / 120.0, 1.0), 0.0)
+
+def limpiar_coordenada(serie):
+    """Coordenada en grados; si el csv trae coma decimal la columna llega como texto."""
+    if pd.api.types.is_numeric_dtype(serie):
+        return serie.astype(float)
+    return serie.astype(str).str.replace(',', '.', regex=False).astype(float)
+
+
+def calcular_hospitales_dificultad(df, archivo_zonas=None, archivo_altitud=None):
+    """
+    Limpia las coordenadas y añade 'Tiene_Hospital', 'Transplantes' y 'Dificultad_Acceso'.
+
+    archivo_zonas / archivo_altitud: GeoJSON de zonas montañosas y ráster .asc de
+    altitudes; sin ninguno de los dos se usa la tabla ZONAS_MONTANOSAS.
+    """
+    df = df.copy()
+
+    # Limpiar Coordenadas
+    df['Latitud'] = limpiar_coordenada(df['Latitud'])
+    df['Longitud'] = limpiar_coordenada(df['Longitud'])
+
+    # Crear Columnas Lógicas (las listas ya están en la forma de clave_nombre)
+    municipio_norm = claves_nombres(df['Municipio'])
+    df['Tiene_Hospital'] = municipio_norm.isin(municipios_con_hospital).astype(int)
+    df['Transplantes'] = municipio_norm.isin(municipios_con_transplante).astype(int)
+
+    # Crear Columnas de Dificultad
+    # Fórmula: 70% Orografía + 30% Distancia Capital
+    lat, lon = df['Latitud'].to_numpy(), df['Longitud'].to_numpy()
+    if archivo_zonas or archivo_altitud:
+        geo = dificultad_orografica(lon, lat, archivo_zonas, archivo_altitud,
+                                    valor_defecto=DIFICULTAD_LLANO)
+    else:
+        geo = get_geo_difficulty(lat, lon)
+    df['Dificultad_Acceso'] = (geo * 0.7) + \
+                              (get_dist_score(claves_nombres(df['Provincia']), lat, lon) * 0.3)
+    df['Dificultad_Acceso'] = df['Dificultad_Acceso'].round(2)
+    return df
+
+
+def main():
+    # Cargar el csv basico (las coordenadas con punto decimal ya llegan como float)
+    try:
+        df = pd.read_csv("registro-de-municipios-de-castilla-y-leon.csv", sep=";", encoding="utf-8")
+    except:
+        df = pd.read_csv("registro-de-municipios-de-castilla-y-leon.csv", sep=";", encoding="latin-1")
+
+    df = calcular_hospitales_dificultad(df, ARCHIVO_ZONAS_MONTANOSAS, ARCHIVO_ALTITUD)
+
+    # Guardar en el nuevo csv
+    output_file = "registro-de-municipios-de-castilla-y-leon.csv"
+    df.to_csv(output_file, sep=";", index=False, encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,10 @@
+"""
+Configuración común de los tests: los módulos se importan desde src/, igual que
+al ejecutar los scripts desde esa carpeta.
+"""
+import os
+import sys
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src')
+if SRC not in sys.path:
+    sys.path.insert(0, SRC)
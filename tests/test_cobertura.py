@@ -0,0 +1,88 @@
+"""
+La cobertura dispersa (KD-tree) y la de cuerdas deben coincidir exactamente con
+aplicar el umbral sobre la matriz densa de haversine, empates en el borde incluidos.
+"""
+import numpy as np
+import pytest
+
+from helipuertos.cobertura import (CoberturaCuerda, matriz_cobertura, matriz_distancias_radio,
+                                   matriz_tiempos_vuelo, minimo_por_fila, puntos_cubiertos)
+from helipuertos.distancias import haversine_vectorizado
+
+VELOCIDAD = 240
+
+
+def puntos(n, semilla):
+    """Coordenadas aleatorias en una caja del tamaño de Castilla y León."""
+    rng = np.random.default_rng(semilla)
+    return rng.uniform(-7.1, -1.8, n), rng.uniform(40.1, 43.2, n)
+
+
+def tiempos_densos(lon_dem, lat_dem, lon_cand, lat_cand):
+    dists = haversine_vectorizado(lon_dem[:, None], lat_dem[:, None], lon_cand[None, :], lat_cand[None, :])
+    return (dists / VELOCIDAD) * 60
+
+
+@pytest.fixture
+def instancia():
+    lon_dem, lat_dem = puntos(400, 1)
+    lon_cand, lat_cand = puntos(60, 2)
+    #Un candidato sobre un punto de demanda (distancia 0) y otro repetido.
+    lon_cand[0], lat_cand[0] = lon_dem[0], lat_dem[0]
+    lon_cand[1], lat_cand[1] = lon_cand[2], lat_cand[2]
+    return lon_dem, lat_dem, lon_cand, lat_cand
+
+
+def umbral_en_empate(tiempos):
+    """Un tiempo máximo igual al tiempo exacto de un par: ese par queda justo en el borde."""
+    return float(np.sort(tiempos.ravel())[tiempos.size // 10])
+
+
+def test_matriz_tiempos_vuelo_igual_a_densa(instancia):
+    densa = tiempos_densos(*instancia)
+    for tmax in (15, 30, umbral_en_empate(densa)):
+        dispersa = matriz_tiempos_vuelo(*instancia, VELOCIDAD, tmax)
+        esperada = densa <= tmax
+        np.testing.assert_array_equal(matriz_cobertura(dispersa).toarray() == 1, esperada)
+        np.testing.assert_array_equal(dispersa.toarray()[esperada], densa[esperada])
+        #Umbral más bajo sobre la misma matriz.
+        np.testing.assert_array_equal(matriz_cobertura(dispersa, umbral=tmax / 2).toarray() == 1,
+                                      densa <= tmax / 2)
+
+
+def test_empate_en_el_borde_se_cubre(instancia):
+    densa = tiempos_densos(*instancia)
+    tmax = umbral_en_empate(densa)
+    fila, columna = np.argwhere(densa == tmax)[0]
+    assert matriz_tiempos_vuelo(*instancia, VELOCIDAD, tmax)[fila, columna] == tmax
+    assert CoberturaCuerda(*instancia, VELOCIDAD).matriz(tmax)[fila, columna] == 1
+
+
+@pytest.mark.parametrize('precision', [np.float64, np.float32])
+def test_cobertura_cuerda_igual_a_densa(instancia, precision):
+    densa = tiempos_densos(*instancia)
+    cuerda = CoberturaCuerda(*instancia, VELOCIDAD, precision=precision)
+    for tmax in (15, 30, umbral_en_empate(densa)):
+        np.testing.assert_array_equal(cuerda.matriz(tmax).toarray() == 1, densa <= tmax)
+
+
+def test_matriz_distancias_radio_conserva_ceros(instancia):
+    lon_dem, lat_dem, lon_cand, lat_cand = instancia
+    dists = haversine_vectorizado(lon_dem[:, None], lat_dem[:, None], lon_cand[None, :], lat_cand[None, :])
+    radio = float(np.sort(dists.ravel())[dists.size // 20])
+    matriz = matriz_distancias_radio(lon_dem, lat_dem, lon_cand, lat_cand, radio)
+    estructura = np.zeros(matriz.shape, dtype=bool)
+    filas = np.repeat(np.arange(matriz.shape[0]), np.diff(matriz.indptr))
+    estructura[filas, matriz.indices] = True
+    np.testing.assert_array_equal(estructura, dists <= radio)
+    assert matriz[0, 0] == 0 and estructura[0, 0]
+    #Mínimo por fila de los pares en radio (inf en las filas sin pares).
+    esperado = np.where(dists <= radio, dists, np.inf).min(axis=1)
+    np.testing.assert_array_equal(minimo_por_fila(matriz), esperado)
+
+
+def test_puntos_cubiertos(instancia):
+    densa = tiempos_densos(*instancia)
+    cobertura = matriz_cobertura(matriz_tiempos_vuelo(*instancia, VELOCIDAD, 30))
+    solucion = [3, 17, 42]
+    np.testing.assert_array_equal(puntos_cubiertos(cobertura, solucion), (densa[:, solucion] <= 30).any(axis=1))
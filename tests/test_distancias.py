@@ -0,0 +1,55 @@
+"""
+reducir_distancias debe dar el mismo mínimo, índice y cobertura que la matriz
+densa de haversine_vectorizado, sea cual sea el tamaño de bloque.
+"""
+import numpy as np
+import pytest
+
+from helipuertos.distancias import haversine_vectorizado, reducir_distancias
+
+
+@pytest.fixture
+def instancia():
+    rng = np.random.default_rng(7)
+    lon_a, lat_a = rng.uniform(-7.1, -1.8, 300), rng.uniform(40.1, 43.2, 300)
+    lon_b, lat_b = rng.uniform(-7.1, -1.8, 45), rng.uniform(40.1, 43.2, 45)
+    #Dos puntos de B iguales: el empate se resuelve con el primero, como np.argmin.
+    lon_b[10], lat_b[10] = lon_b[20], lat_b[20]
+    return lon_a, lat_a, lon_b, lat_b
+
+
+@pytest.mark.parametrize('elementos_bloque', [1, 100, 2**16])
+def test_minimo_e_indice_iguales_a_densa(instancia, elementos_bloque):
+    lon_a, lat_a, lon_b, lat_b = instancia
+    densa = haversine_vectorizado(lon_a[:, None], lat_a[:, None], lon_b[None, :], lat_b[None, :])
+    res = reducir_distancias(*instancia, reducciones=('minimo', 'indice'), elementos_bloque=elementos_bloque)
+    np.testing.assert_array_equal(res['minimo'], densa.min(axis=1))
+    np.testing.assert_array_equal(res['indice'], densa.argmin(axis=1))
+    solo_minimo = reducir_distancias(*instancia, elementos_bloque=elementos_bloque)
+    np.testing.assert_array_equal(solo_minimo['minimo'], densa.min(axis=1))
+
+
+def test_tiempos_y_cobertura_iguales_a_densa(instancia):
+    lon_a, lat_a, lon_b, lat_b = instancia
+    tiempos = (haversine_vectorizado(lon_a[:, None], lat_a[:, None], lon_b[None, :], lat_b[None, :]) / 240) * 60
+    #Umbral igual al tiempo de un par (empate en el borde).
+    umbral = float(np.sort(tiempos.ravel())[tiempos.size // 8])
+    res = reducir_distancias(*instancia, reducciones=('minimo', 'cobertura'), velocidad_kmh=240,
+                             umbral=umbral, elementos_bloque=500)
+    np.testing.assert_array_equal(res['minimo'], tiempos.min(axis=1))
+    cobertura = np.unpackbits(res['cobertura'], axis=1, count=len(lon_b), bitorder='little').astype(bool)
+    np.testing.assert_array_equal(cobertura, tiempos <= umbral)
+
+
+def test_float32_cerca_de_float64(instancia):
+    exacta = reducir_distancias(*instancia)['minimo']
+    aproximada = reducir_distancias(*instancia, precision=np.float32)['minimo']
+    assert aproximada.dtype == np.float32
+    np.testing.assert_allclose(aproximada, exacta, atol=0.01)
+
+
+def test_reducciones_no_validas(instancia):
+    with pytest.raises(ValueError):
+        reducir_distancias(*instancia, reducciones=('maximo',))
+    with pytest.raises(ValueError):
+        reducir_distancias(*instancia, reducciones=('cobertura',))
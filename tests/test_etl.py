@@ -0,0 +1,88 @@
+"""
+La clave de caché de una etapa cambia con su código, sus módulos, sus parámetros,
+sus archivos fuente y sus dependencias, y con nada más.
+"""
+import pandas as pd
+import pytest
+
+from helipuertos.etl import Etapa, ejecutar_etapas
+
+
+def etapa_prueba(datos, factor):
+    df = pd.read_csv(datos)
+    return df.assign(Valor=df['Valor'] * factor)
+
+
+def etapa_dependiente(prueba):
+    return prueba.assign(Doble=prueba['Valor'] * 2)
+
+
+@pytest.fixture
+def entorno(tmp_path, monkeypatch):
+    datos = tmp_path / 'datos.csv'
+    datos.write_text("Cod_Municipio,Cod_Provincia,Valor\n1,5,1.5\n2,5,2.5\n", encoding='utf-8')
+    modulo = tmp_path / 'modulo_auxiliar_etl.py'
+    modulo.write_text("CONSTANTE = 1\n", encoding='utf-8')
+    monkeypatch.syspath_prepend(str(tmp_path))
+    return datos, modulo
+
+
+def etapas(datos, factor=2):
+    return [Etapa('prueba', etapa_prueba, ['Valor'], archivos={'datos': str(datos)},
+                  parametros={'factor': factor}, modulos=['modulo_auxiliar_etl']),
+            Etapa('dependiente', etapa_dependiente, ['Doble'], depende_de=['prueba'])]
+
+
+def estados(informe):
+    return {nombre: estado for nombre, estado, _ in informe}
+
+
+def test_clave_estable(entorno):
+    datos, _ = entorno
+    assert etapas(datos)[0].clave({}) == etapas(datos)[0].clave({})
+
+
+def test_clave_cambia_con_cada_entrada(entorno):
+    datos, modulo = entorno
+    clave = etapas(datos)[0].clave({})
+    assert etapas(datos, factor=3)[0].clave({}) != clave
+    assert Etapa('prueba', etapa_prueba, ['Valor'], archivos={'datos': str(datos)}, parametros={'factor': 2},
+                 modulos=['modulo_auxiliar_etl'], version=2).clave({}) != clave
+    modulo.write_text("CONSTANTE = 2\n", encoding='utf-8')
+    assert etapas(datos)[0].clave({}) != clave
+    modulo.write_text("CONSTANTE = 1\n", encoding='utf-8')
+    assert etapas(datos)[0].clave({}) == clave
+    datos.write_text(datos.read_text(encoding='utf-8') + "3,5,0.5\n", encoding='utf-8')
+    assert etapas(datos)[0].clave({}) != clave
+    dependiente = etapas(datos)[1]
+    assert dependiente.clave({'prueba': 'a'}) != dependiente.clave({'prueba': 'b'})
+
+
+def test_invalidacion_en_ejecucion(entorno, tmp_path):
+    datos, modulo = entorno
+    cache = tmp_path / 'cache'
+    resultados, informe = ejecutar_etapas(etapas(datos), cache, n_procesos=1)
+    assert estados(informe) == {'prueba': 'calculada', 'dependiente': 'calculada'}
+    assert resultados['dependiente']['Doble'].tolist() == [6.0, 10.0]
+
+    _, informe = ejecutar_etapas(etapas(datos), cache, n_procesos=1)
+    assert estados(informe) == {'prueba': 'caché', 'dependiente': 'caché'}
+
+    #Cambia el módulo pero no el resultado: la etapa dependiente sigue saliendo de la caché.
+    modulo.write_text("CONSTANTE = 2\n", encoding='utf-8')
+    _, informe = ejecutar_etapas(etapas(datos), cache, n_procesos=1)
+    assert estados(informe) == {'prueba': 'calculada', 'dependiente': 'caché'}
+
+    #Cambia el archivo fuente y con él el resultado: se recalculan las dos.
+    datos.write_text("Cod_Municipio,Cod_Provincia,Valor\n1,5,1.0\n2,5,2.5\n", encoding='utf-8')
+    resultados, informe = ejecutar_etapas(etapas(datos), cache, n_procesos=1)
+    assert estados(informe) == {'prueba': 'calculada', 'dependiente': 'calculada'}
+    assert resultados['dependiente']['Doble'].tolist() == [4.0, 10.0]
+
+    _, informe = ejecutar_etapas(etapas(datos), cache, n_procesos=1, forzar=('dependiente',))
+    assert estados(informe) == {'prueba': 'caché', 'dependiente': 'calculada'}
+
+
+def test_archivo_fuente_inexistente(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        etapas(tmp_path / 'no_existe.csv')[0].clave({})
@@ -0,0 +1,59 @@
+"""
+Cruce de nombres de municipio: clave canónica, cruce exacto, difuso y ambiguo.
+"""
+import pandas as pd
+import pytest
+
+from helipuertos.nombres import IndiceNombres, clave_nombre, claves_nombres
+
+
+@pytest.fixture
+def indice():
+    registro = pd.DataFrame({
+        'Municipio': ['LA ADRADA', 'SALAS DE LOS INFANTES', 'VILLANUEVA DEL CAMPO', 'CASTRILLO', 'CASTRILLO'],
+        'Provincia': ['ÁVILA', 'BURGOS', 'ZAMORA', 'BURGOS', 'SORIA'],
+        'Cod_Municipio': [1, 330, 261, 70, 55],
+        'Cod_Provincia': [5, 9, 49, 9, 42],
+    })
+    return IndiceNombres.desde_registro(registro).preparar_difuso()
+
+
+@pytest.mark.parametrize('texto, clave', [
+    ('Adrada (La)', 'LA ADRADA'),
+    ('Adrada, La', 'LA ADRADA'),
+    ('ÁVILA', 'AVILA'),
+    ('Villanueva-del  Campo', 'VILLANUEVA DEL CAMPO'),
+    (None, ''),
+])
+def test_clave_nombre(texto, clave):
+    assert clave_nombre(texto) == clave
+
+
+def test_claves_nombres_conserva_indice():
+    serie = pd.Series(['Adrada (La)', None, 'Adrada (La)'], index=[10, 20, 30])
+    claves = claves_nombres(serie)
+    assert claves.tolist() == ['LA ADRADA', '', 'LA ADRADA']
+    assert claves.index.tolist() == [10, 20, 30]
+
+
+def test_cruce_exacto_y_difuso(indice):
+    cruce = indice.cruzar(['Adrada (La)', 'Salas de los Infantes', 'Villanueba del Campo', 'Madrid'])
+    assert cruce['Cruce'].tolist() == ['exacto', 'exacto', 'difuso', 'sin_cruce']
+    assert cruce['Cod_Municipio'].tolist()[:3] == [1, 330, 261]
+    assert cruce['Cod_Provincia'].tolist()[:3] == [5, 9, 49]
+    assert cruce['Fila'].tolist() == [0, 1, 2, -1]
+    assert pd.isna(cruce['Cod_Municipio'].iloc[3])
+    assert cruce['Similitud'].iloc[0] == 1
+    assert 0.8 <= cruce['Similitud'].iloc[2] < 1
+
+
+def test_sin_difuso(indice):
+    cruce = indice.cruzar(['Villanueba del Campo'], difuso=False)
+    assert cruce['Cruce'].tolist() == ['sin_cruce']
+
+
+def test_ambiguo_se_resuelve_con_provincia(indice):
+    assert indice.cruzar(['Castrillo'])['Cruce'].tolist() == ['ambiguo']
+    cruce = indice.cruzar(['Castrillo', 'Castrillo', 'Castrillo'], provincias=['Soria', 'BURGOS', 'Ávila'])
+    assert cruce['Cruce'].tolist() == ['exacto', 'exacto', 'sin_cruce']
+    assert cruce['Cod_Municipio'].tolist()[:2] == [55, 70]
@@ -0,0 +1,74 @@
+"""
+mejora_iterativa (cobertura incremental) debe llegar a la misma solución que la
+búsqueda por intercambios original, que recalculaba la cobertura completa.
+"""
+import numpy as np
+import pytest
+from scipy import sparse
+
+from helipuertos.optimizacion import alternativas_por_region, mejora_iterativa, score_cubierto
+
+
+def mejora_iterativa_original(matriz, scores, solucion, regiones):
+    """Bucle de intercambios de codigo_a_entregar.py antes de optimizarlo."""
+    def calcular_score_total_cubierto(indices_solucion):
+        cubierto_bool = np.any(matriz[:, indices_solucion] == 1, axis=1)
+        return np.sum(scores[cubierto_bool])
+
+    solucion = list(solucion)
+    score_actual = calcular_score_total_cubierto(solucion)
+    mejora = True
+    while mejora:
+        mejora = False
+        for i in range(len(solucion)):
+            idx_actual = solucion[i]
+            alternativas = np.flatnonzero(regiones == regiones[idx_actual])
+            mejor_idx_local = idx_actual
+            mejor_score_local = score_actual
+            for alt in alternativas:
+                if alt == idx_actual:
+                    continue
+                solucion_temp = solucion.copy()
+                solucion_temp[i] = alt
+                nuevo_score = calcular_score_total_cubierto(solucion_temp)
+                if nuevo_score > mejor_score_local:
+                    mejor_score_local = nuevo_score
+                    mejor_idx_local = alt
+            if mejor_idx_local != idx_actual:
+                solucion[i] = mejor_idx_local
+                score_actual = mejor_score_local
+                mejora = True
+    return solucion, score_actual
+
+
+def instancia(semilla, n_demanda=300, n_candidatos=80, n_regiones=6):
+    rng = np.random.default_rng(semilla)
+    matriz = (rng.random((n_demanda, n_candidatos)) < 0.08).astype(np.int8)
+    scores = rng.random(n_demanda)
+    regiones = np.array([f"R{r}" for r in rng.integers(0, n_regiones, n_candidatos)])
+    return matriz, scores, regiones
+
+
+@pytest.mark.parametrize('semilla', range(8))
+@pytest.mark.parametrize('dispersa', [False, True])
+def test_igual_que_busqueda_original(semilla, dispersa):
+    matriz, scores, regiones = instancia(semilla)
+    por_region = alternativas_por_region(regiones)
+    #Como solucion_inicial: el primer candidato de cada región.
+    inicial = [int(alts[0]) for alts in por_region.values()]
+    esperada, score_esperado = mejora_iterativa_original(matriz, scores, inicial, regiones)
+
+    entrada = sparse.csr_matrix(matriz) if dispersa else matriz
+    estadisticas = []
+    solucion, score = mejora_iterativa(entrada, scores, inicial, list(por_region.values()),
+                                       estadisticas=estadisticas)
+    assert solucion == esperada
+    assert score == pytest.approx(score_esperado, rel=1e-12)
+    assert score_cubierto(entrada, scores, solucion) == pytest.approx(score_esperado, rel=1e-12)
+    assert estadisticas[0]['pasada'] == 0 and estadisticas[-1]['mejoras'] == 0
+
+
+def test_alternativas_por_region_en_orden_de_aparicion():
+    alternativas = alternativas_por_region(['B', 'A', 'B', 'C', 'A'])
+    assert list(alternativas) == ['B', 'A', 'C']
+    np.testing.assert_array_equal(alternativas['A'], [1, 4])
@@ -0,0 +1,41 @@
+"""
+data/zonas_montanosas.geojson se genera de ZONAS_MONTANOSAS y debe dar la misma
+dificultad que la tabla, también en los puntos sobre un límite.
+"""
+import json
+import os
+
+import numpy as np
+
+import procesar_transplates_hospitales_dificil_acceso as dificultad
+from helipuertos.orografia import ZonasOrograficas, dificultad_orografica
+
+GEOJSON = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                       'data', 'zonas_montanosas.geojson')
+
+
+def rejilla_con_limites():
+    """Puntos de EXTENSION_ZONAS con todas las latitudes y longitudes límite de la tabla."""
+    lon_min, lat_min, lon_max, lat_max = dificultad.EXTENSION_ZONAS
+    lats = [lat_min + 0.05, lat_max - 0.05] + list(np.linspace(lat_min + 0.05, lat_max - 0.05, 40))
+    lons = [lon_min + 0.05, lon_max - 0.05] + list(np.linspace(lon_min + 0.05, lon_max - 0.05, 40))
+    for _, z_lat_min, z_lat_max, z_lon_min, z_lon_max, _ in dificultad.ZONAS_MONTANOSAS:
+        lats += [v for v in (z_lat_min, z_lat_max) if np.isfinite(v)]
+        lons += [v for v in (z_lon_min, z_lon_max) if np.isfinite(v)]
+    lon, lat = np.meshgrid(lons, lats)
+    return lon.ravel(), lat.ravel()
+
+
+def test_geojson_generado_de_la_tabla():
+    with open(GEOJSON, encoding='utf-8') as f:
+        assert json.load(f) == dificultad.zonas_geojson()
+
+
+def test_misma_dificultad_con_tabla_y_geojson():
+    lon, lat = rejilla_con_limites()
+    tabla = dificultad.get_geo_difficulty(lat, lon)
+    poligonos = dificultad_orografica(lon, lat, GEOJSON, valor_defecto=dificultad.DIFICULTAD_LLANO)
+    np.testing.assert_array_equal(poligonos, tabla)
+    #Sobre el límite sur de la Cordillera Cantábrica: fuera con las dos vías.
+    assert dificultad.get_geo_difficulty(42.8, -4.0) == dificultad.DIFICULTAD_LLANO
+    assert ZonasOrograficas.desde_geojson(GEOJSON).zona([-4.0], [42.8])[0] == -1
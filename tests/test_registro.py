@@ -0,0 +1,75 @@
+"""
+El registro tipado debe ir y volver de Parquet sin cambios y exportarse a csv
+con los mismos valores que el csv original.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from helipuertos.registro import (DECIMALES_FLOAT32, a_tipos_numericos, guardar_registro, leer_registro,
+                                  tipar_registro)
+
+CSV = """Municipio,Cod_Municipio,Provincia,Cod_Provincia,Población,Tiene_Hospital,tiene_centro,Dificultad_Acceso,Accidentes_Por_Carretera,DENSIDADMM,4G,Longitud
+RUBLACEDO DE ABAJO,327,BURGOS,9,33,0,1,0.14,0.0012,0.0001595300416,0.7844,-3.50256
+SALAS DE LOS INFANTES,330,BURGOS,9,1984,0,1,0.19,0.123,0.01722252793,0.9961,-3.282137
+LA ADRADA,1,ÁVILA,5,2800,1,0,0.57,0.3333,0.01271675911,1.0,-4.63
+"""
+
+
+#Columnas float32 sin decimales fijos: se recuperan con la tolerancia de float32.
+APROXIMADAS = ['DENSIDADMM', '4G']
+
+
+def comprobar_exportado(exportado, original):
+    """Iguales salvo APROXIMADAS, que difieren menos de 6e-8 relativo."""
+    pd.testing.assert_frame_equal(exportado.drop(columns=APROXIMADAS), original.drop(columns=APROXIMADAS),
+                                  check_dtype=False, check_exact=True)
+    np.testing.assert_allclose(exportado[APROXIMADAS], original[APROXIMADAS], rtol=6e-8, atol=0)
+
+
+@pytest.fixture
+def original(tmp_path):
+    ruta = tmp_path / 'registro.csv'
+    ruta.write_text(CSV, encoding='utf-8')
+    return pd.read_csv(ruta)
+
+
+def test_tipos(original):
+    tipado = tipar_registro(original)
+    assert tipado['Provincia'].dtype == 'category'
+    assert tipado['Tiene_Hospital'].dtype == bool
+    assert tipado['Cod_Provincia'].dtype == 'int16'
+    assert tipado['DENSIDADMM'].dtype == 'float32'
+    #Las columnas fuera del esquema no se tocan.
+    assert tipado['Longitud'].dtype == 'float64'
+
+
+def test_ida_y_vuelta_parquet(original, tmp_path):
+    pytest.importorskip('pyarrow')
+    ruta = tmp_path / 'registro.parquet'
+    guardar_registro(original, ruta)
+    leido = leer_registro(ruta)
+    pd.testing.assert_frame_equal(leido, tipar_registro(original), check_exact=True)
+    comprobar_exportado(a_tipos_numericos(leido), original)
+    for col in DECIMALES_FLOAT32:
+        assert a_tipos_numericos(leido)[col].tolist() == original[col].tolist()
+    #Solo las columnas pedidas.
+    assert list(leer_registro(ruta, ['Municipio', '4G']).columns) == ['Municipio', '4G']
+
+
+def test_ida_y_vuelta_csv(original, tmp_path):
+    ruta = tmp_path / 'exportado.csv'
+    guardar_registro(tipar_registro(original), ruta)
+    exportado = pd.read_csv(ruta)
+    comprobar_exportado(exportado, original)
+    #La representación más corta en float32: volver a tiparla da el mismo float32.
+    pd.testing.assert_frame_equal(tipar_registro(exportado), tipar_registro(original), check_exact=True)
+
+
+def test_booleanos_con_nulos(original):
+    original.loc[1, 'Tiene_Hospital'] = None
+    tipado = tipar_registro(original)
+    assert tipado['Tiene_Hospital'].dtype == 'boolean'
+    exportado = a_tipos_numericos(tipado, ['Tiene_Hospital'])
+    assert exportado['Tiene_Hospital'].tolist()[::2] == [0, 1]
+    assert exportado['Tiene_Hospital'].isna().tolist() == [False, True, False]
@@ -0,0 +1,30 @@
+"""
+BuscadorSubcadenas debe encontrar lo mismo que comprobar cada nombre con 'in'
+(str.contains sin expresiones regulares).
+"""
+import numpy as np
+import pandas as pd
+
+from helipuertos.texto import BuscadorSubcadenas
+
+
+def test_igual_que_str_contains():
+    rng = np.random.default_rng(3)
+    alfabeto = list("ABCDE ")
+    #Patrones cortos sobre un alfabeto pequeño: muchos solapados y contenidos unos en otros.
+    nombres = list(dict.fromkeys(''.join(rng.choice(alfabeto, rng.integers(1, 5))).strip() or 'A'
+                                 for _ in range(60)))
+    textos = pd.Series([''.join(rng.choice(alfabeto, rng.integers(0, 40))) for _ in range(300)])
+    buscador = BuscadorSubcadenas({nombre: i for i, nombre in enumerate(nombres)})
+    esperado = np.column_stack([textos.str.contains(nombre, regex=False) for nombre in nombres])
+    for fila, texto in enumerate(textos):
+        assert buscador.buscar(texto) == list(np.flatnonzero(esperado[fila]))
+
+
+def test_nombres_de_municipio():
+    buscador = BuscadorSubcadenas({'LEÓN': 0, 'LEÓN (RESTO)': 1, 'ÓN': 2, 'BURGOS': 3})
+    assert len(buscador) == 4
+    assert buscador.buscar('DE LEÓN A BURGOS') == [0, 2, 3]
+    assert buscador.buscar('LEÓN (RESTO)') == [0, 1, 2]
+    assert buscador.buscar('') == []
+    assert buscador.buscar('PALENCIA') == []